@@ -1,14 +1,40 @@
 import streamlit as st
 import pandas as pd
-import base64
-from xml.sax.saxutils import escape
-from io import BytesIO
+import os
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import functools
+from collections import Counter, deque
+from contextlib import nullcontext
 from datetime import datetime
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image as RLPlatypusImage
+
+from etiquetado.checklist import CATEGORIAS, APLICA, ID_ITEM
+from etiquetado.reglas import (
+    NORMATIVA, df_tabla17, leer_tabla, normalizar_tabla,
+    COLUMNAS_SELLOS, determinar_sellos, describir_sellos,
+    COLUMNAS_CALORIAS, verificar_calorias,
+    COLUMNAS_TAMANO, evaluar_tamano_sellos,
+    COLUMNAS_APROXIMACION, NUTRIENTES_TABLA, validar_aproximacion, a_formato_largo, describir_aproximacion,
+    verificar_unidades, verificar_obligatorios, describir_unidades, describir_obligatorios,
+    consistencia_bromatologica, describir_bromatologico,
+    COLUMNAS_PORCIONES, REDONDEO_PORCIONES, verificar_porciones, describir_porciones,
+)
+from etiquetado.artes import analizar_arte, analizar_lote, evaluar_tamano_artes
+from etiquetado.evidencia import AlmacenEvidencia, ReferenciasSQLite, EVIDENCIA_DIR, EVIDENCIA_CUOTA_MB
+from etiquetado.informe import generar_pdf, huella_auditoria
+from etiquetado.espacio import EspacioTrabajo, compactar, expandir
+from etiquetado.estado import crear_estado, verificar_despliegue, EscrituraDiferida, EstadoNoDisponible, ESTADO_BACKEND
+from etiquetado.instantanea import (
+    exportar_instantanea, leer_instantanea, abrir_miembro, guardar_en_disco, InstantaneaInvalida,
+)
+from etiquetado.persistencia import BaseAuditorias, AUDITORIAS_DB, CAMPOS_AUDITORIA
+from etiquetado.exportacion import exportar_resultados, FORMATOS_EXPORTACION, ESTADO_HUMANO, EXPORTACION_DESCARGA_MAX_MB
+from etiquetado.instrumentacion import tramo, recolectar, cronometrado, estimar_bytes_sesion
+
+INICIO_RERUN = time.perf_counter()
 
 # ------------------------------------------------------------
 # CONFIGURACIÓN INICIAL
@@ -23,99 +49,193 @@ st.markdown(
     "en alimentos y bebidas envasadas destinados al consumo humano en Colombia."
 )
 
+# ------------------------------------------------------------
+# ESTADO COMPARTIDO DE SESIÓN (cualquier réplica puede retomar la sesión)
+# La URL lleva ?sesion=<id>; si esta réplica no tiene la sesión en memoria,
+# se reconstruye desde el backend antes de crear los widgets.
+# ------------------------------------------------------------
+# Widgets de las herramientas que viajan en la instantánea y en el estado compartido (además de tn_formato_*)
+ENTRADAS_HERRAMIENTAS = (
+    "base_cal", "c_cal_carb", "c_cal_prot", "c_cal_grasa", "c_cal_decl",
+    "base_sellos", "sellos_kcal", "sellos_azucares_libres", "sellos_sat", "sellos_trans", "sellos_sodio",
+    "sellos_edulcorante", "bebida_sin_kcal",
+    "tipo_envase", "area_cara", "num_sellos", "lado_sello", "ubicacion_no_cilindrico", "ubicacion_cilindrico",
+    "porc_neto", "porc_porcion", "porc_declaradas", "porc_medida", "porc_redondeo",
+)
+# Tablas editables: base en sesión → clave del data_editor (sus ediciones se guardan aparte)
+TABLAS_HERRAMIENTAS = {"tabla_nutricional_base": "tabla_nutricional", "lab_base": "lab_tabla"}
+
+# Las entradas de herramientas no guardadas en el producto vuelven a su valor por defecto
+def poner_en_sesion(producto: dict):
+    st.session_state.auditoria_id = producto["auditoria_id"]
+    st.session_state.meta_guardada = producto["meta_guardada"]
+    st.session_state.status_810 = producto["status"]
+    st.session_state.note_810 = producto["notas"]
+    st.session_state.evidence_810 = producto["evidencia"]
+    st.session_state.conteo_810 = Counter(producto["status"].values())
+    for c in CAMPOS_AUDITORIA:
+        st.session_state[f"meta_{c}"] = producto["meta"][c]
+    for titulo, nota in producto["notas"].items():
+        st.session_state[f"obs_{ID_ITEM[titulo]}"] = nota
+    for clave in list(st.session_state.keys()):
+        if (clave in ENTRADAS_HERRAMIENTAS or clave in TABLAS_HERRAMIENTAS or clave in TABLAS_HERRAMIENTAS.values()
+                or str(clave).startswith("tn_formato_")):
+            del st.session_state[clave]
+    for clave in ("arte_resultado", "arte_error"):
+        st.session_state.pop(clave, None)
+    for clave, valor in producto["entradas"].items():
+        st.session_state[clave] = valor
+
+try:
+    verificar_despliegue(ESTADO_BACKEND)
+except ValueError as e:
+    st.error(f"Configuración de despliegue inválida: {e}")
+    st.stop()
+
+@st.cache_resource
+def base_auditorias() -> BaseAuditorias:
+    return BaseAuditorias(AUDITORIAS_DB)
+
+db = base_auditorias()
+
+@st.cache_resource
+def almacen_evidencia() -> AlmacenEvidencia:
+    # Con estado compartido, las referencias vivas se cuentan en el propio directorio común
+    referencias = None
+    if ESTADO_BACKEND != "memoria":
+        os.makedirs(EVIDENCIA_DIR, exist_ok=True)
+        referencias = ReferenciasSQLite(os.path.join(EVIDENCIA_DIR, "referencias.db"))
+    return AlmacenEvidencia(
+        EVIDENCIA_DIR, int(EVIDENCIA_CUOTA_MB * 1024 * 1024),
+        es_persistido=db.evidencia_persistida, referencias=referencias,
+    )
+
+almacen = almacen_evidencia()
+
+@st.cache_resource
+def estado_compartido() -> EscrituraDiferida:
+    return crear_estado(ESTADO_BACKEND)
+
+compartido = estado_compartido()
+sesion_id = st.query_params.get("sesion")
+if not sesion_id:
+    sesion_id = uuid.uuid4().hex
+    st.query_params["sesion"] = sesion_id
+if "status_810" not in st.session_state:
+    guardado = compartido.leer(sesion_id)
+    if "activo" in guardado:
+        poner_en_sesion(expandir(guardado["activo"]))
+        for evs in st.session_state.evidence_810.values():
+            for ev in evs:
+                almacen.retener(ev["sha256"])
+        st.session_state.espacio_resumen = guardado.get("espacio")
+        st.session_state.estado_escrito = {"restaurado": True}
+
 # ------------------------------------------------------------
 # SIDEBAR: Datos de la verificación
 # ------------------------------------------------------------
+vista = st.sidebar.radio("Vista", ["Checklist", "Portafolio"], horizontal=True, key="vista")
+panel_productos = st.sidebar.container()  # se llena más abajo, cuando ya existen las funciones del espacio
 st.sidebar.header("Datos de la verificación")
-producto = st.sidebar.text_input("Nombre del producto")
-proveedor = st.sidebar.text_input("Proveedor / Fabricante")
-responsable = st.sidebar.text_input("Responsable de la verificación")
-invima_registro = st.sidebar.text_input("Registro sanitario INVIMA (si aplica)")
-invima_estado_activo = st.sidebar.checkbox("Verificado en portal INVIMA como ACTIVO y coincidente", value=False)
-invima_url = st.sidebar.text_input("URL de consulta INVIMA (opcional)")
+producto = st.sidebar.text_input("Nombre del producto", key="meta_producto")
+proveedor = st.sidebar.text_input("Proveedor / Fabricante", key="meta_proveedor")
+responsable = st.sidebar.text_input("Responsable de la verificación", key="meta_responsable")
+invima_registro = st.sidebar.text_input("Registro sanitario INVIMA (si aplica)", key="meta_invima_registro")
+invima_estado_activo = st.sidebar.checkbox("Verificado en portal INVIMA como ACTIVO y coincidente", key="meta_invima_estado_activo")
+invima_url = st.sidebar.text_input("URL de consulta INVIMA (opcional)", key="meta_invima_url")
 nombre_pdf = st.sidebar.text_input("Nombre del PDF (sin .pdf)", f"informe_810_2492_{datetime.now().strftime('%Y%m%d')}")
 solo_no = st.sidebar.checkbox("Mostrar solo 'No cumple'", value=False)
+diagnostico = st.sidebar.checkbox("Panel de diagnóstico (tiempos y memoria)", key="diag_810")
+
+# Tramos de la sesión (incluye reruns de fragmentos); None = instrumentación apagada
+if "trazas_810" not in st.session_state:
+    st.session_state.trazas_810 = deque(maxlen=2000)
+
+def colector_sesion():
+    return st.session_state.trazas_810 if st.session_state.get("diag_810") else None
 
 # ------------------------------------------------------------
-# TABLA 17 — referencia (informativa en pantalla)
-# ------------------------------------------------------------
-TABLA_17 = [
-    ("< 30 cm²", "Rotular en envase secundario o incluir codigo QR o página para consultar"),
-    ("≥30 a <35 cm²", 1.7),
-    ("≥35 a <40 cm²", 1.8),
-    ("≥40 a <50 cm²", 2.0),
-    ("≥50 a <60 cm²", 2.2),
-    ("≥60 a <80 cm²", 2.5),
-    ("≥80 a <100 cm²", 2.8),
-    ("≥100 a <125 cm²", 3.1),
-    ("≥125 a <150 cm²", 3.4),
-    ("≥150 a <200 cm²", 3.9),
-    ("≥200 a <250 cm²", 4.4),
-    ("≥250 a <300 cm²", 4.8),
-    ("> 300 cm²", "15% del lado de la cara principal"),
-]
-df_tabla17 = pd.DataFrame(TABLA_17, columns=["Área de la cara principal", "Lado mínimo del sello (cm)"])
-
-# ------------------------------------------------------------
-# CHECKLIST — 810/2021 y 2492/2022 (orden completo)
-# ------------------------------------------------------------
-CATEGORIAS = {
-    "1. Principios generales de etiquetado nutricional": [
-        ("No inducir a error o confusión",
-         "Verificar que el etiquetado nutricional y cualquier información asociada no atribuyan propiedades que no posea, ni induzcan a error sobre composición, cantidad o beneficios.",
-         "Res. 810/2021, Art. 5."),
-        ("Tabla nutricional obligatoria (aplicabilidad)",
-         "Que la tabla nutricional esté diseñada con fondo contrastante y presentada cubriendo el 25% del área disponible del envase, utilizando el formato permitido vertical, simplificado, lineal o tabular.",
-         "Res. 810/2021, Art. 6."),
-    ],
-    "2. Estructura y contenido de la tabla nutricional": [
-        ("Unidades de medida (estructura general)",
-         "Que la información se declare por 100 g o 100 mL y por porción (según estado físico), incluyendo número de porciones por envase",
-         "Res. 810/2021, Art. 7 y 8."),
-        ("Nutrientes obligatorios declarados",
-         "La tabla nutricional debe incluir los macronutrientes obligatorios: Calorías, grasas totales, grasas saturadas, grasas trans, carbohidratos totales, azúcares totales, azúcares añadidos, fibra dietaria, proteínas y sodio. Micronutrientes obligatorios: Vitamina A, Vitamina D, Hierro, Calcio y Zinc (Si no se encuentra en la tabla se debe declarar como fuente no significativa de).",
-         "Res. 810/2021, Art. 8.1.1"),
-        ("Aproximación y expresión de valores nutricionales",
-        "Verificar que los valores declarados de energía y nutrientes en la tabla nutricional estén correctamente aproximados y expresados según los rangos establecidos por la normativa. "
-        "Valores ≥1000 se declaran en números enteros de cuatro cifras; valores ≥100 y <1000 en enteros de tres cifras; valores ≥10 y <100 en enteros de dos cifras; "
-        "valores ≥1 y <10 con una cifra decimal; valores <1 con dos cifras decimales para vitaminas y minerales y una cifra decimal para el resto de nutrientes.",
-        "Res. 810/2021, Art. 8."),
-        ("Unidades específicas por nutriente",
-         "Que las unidades declaradas correspondan a lo exigido por la norma: Calorías en kcal y/o kJ; Grasas totales, grasas saturadas, carbohidratos totales, fibra dietaria, azúcares totales, azúcares añadidos y proteina en g; Grasas trans y Sodio en mg; En el caso de micronutrientes: ; Vitamina A en µg ER; Vitamina D en µg; Calcio, Hierro, Vitamina C, Zinc y otros micronutrientes en mg.",
-         "Res. 810/2021, Art. 8"),
-        ("Formato, tipografía y jerarquía visual de la tabla nutricional",
-         "Verificar con mini checklist",
-         "Res. 810/2021, Art. 9.1, 9.2 y 9.5; modificado por Res. 2492/2022."),        
-         ("Declaración de porciones",
-         "Que la porción indicada en la tabla nutricional esté declarada en unidades del Sistema Internacional, acompañada de una medida casera común, y que el número de porciones por envase coincida con el contenido neto del producto. Ejemplo: si el envase contiene 150 g y la porción es 30 g, el número de porciones debe ser 5; esta porción puede expresarse como 1 onza (oz), donde 1 onza de peso equivale a 28 g.",
-         "Res. 810/2021, Art. 12."),
-        ("Verificación de calorías declaradas (±20% tolerancia)",
-         "Comprobar que las calorías declaradas coinciden con las calculadas por macronutrientes (4 kcal/g CHO, 4 kcal/g proteínas, 9 kcal/g grasas). 💡 Use la herramienta a continuación para comprobarlo.",
-         "Res. 810/2021, Art. 17 (Tolerancias)."),
-        ("Consistencia con análisis bromatológico (±20%)",
-         "Verificar que los valores declarados en la tabla nutricional coinciden con el análisis bromatológico dentro de ±20%; usar resultados de laboratorio acreditado/certificado.",
-         "Res. 810/2021, Art. 17 (Tolerancias)."),
-    ],
-    "3. Sellos frontales de advertencia": [
-        ("Características gráficas y generales de los sellos frontales de advertencia",
-         "Verificar que los sellos frontales de advertencia cumplan con las características gráficas y formales establecidas por la normativa. "
-         "Los sellos deben ser de forma octagonal regular, con fondo negro, borde blanco y texto en color blanco, en mayúsculas y con tipografía legible. "
-         "No deben incluir imágenes, logotipos, símbolos adicionales ni elementos decorativos, ni presentar alteraciones de color, proporción u orientación.",
-         "Res. 810/2021, Art. 27; modificado por Res. 2492/2022."
-        ),
-        ("Determinación de aplicabilidad de sellos",
-         "Evaluar si corresponde ‘EXCESO EN’ (azúcares, grasas saturadas, grasas trans, sodio) o ‘CONTIENE EDULCORANTE’. 💡 Use la herramienta a continuación para determinar la aplicabilidad de sellos.",
-         "Res. 810/2021, Art. 25 y tabla 3, modificado por Res. 2492/2022."),
-        ("Ubicación, distribución y tamaño de sellos (Tabla 17)",
-        "Que los sellos frontales de advertencia estén ubicados en el tercio superior de la cara principal de exhibición del empaque. En envases no cilindricos, los sellos deben colocarse en el tercio superior derecho. En envases cilíndricos, deben ubicarse en el tercio superior central. Para verificar el tamaño del sello, se debe hacer uso de la herramienta incluida en la aplicación.",
-        "Res. 810/2021, Art. 27; modificado por Res. 2492/2022."),
-    ],
-}
+# VISTA DE PORTAFOLIO (todas las auditorías guardadas)
+# Lee solo la tabla de agregados, que se mantiene al guardar cada cambio.
+# ------------------------------------------------------------
+def _tabla_cumplimiento(filas: list, nombre_clave: str) -> pd.DataFrame:
+    df = pd.DataFrame(filas, columns=["clave", "yes", "no", "na", "none", "cumplimiento_pct"])
+    return df.rename(columns={
+        "clave": nombre_clave, "yes": "Cumple", "no": "No cumple", "na": "No aplica",
+        "none": "Sin responder", "cumplimiento_pct": "Cumplimiento (%)",
+    })
+
+def render_portafolio():
+    st.header("Portafolio — cumplimiento de auditorías guardadas")
+    c1, c2 = st.columns(2)
+    with c1:
+        desde = st.date_input("Desde", value=None, key="port_desde")
+    with c2:
+        hasta = st.date_input("Hasta", value=None, key="port_hasta")
+    rango = {"desde": desde.isoformat() if desde else None, "hasta": hasta.isoformat() if hasta else None}
+
+    total = db.cumplimiento("total", **rango)
+    if not total:
+        st.info("Aún no hay auditorías guardadas.")
+        return
+    pct = total[0]["cumplimiento_pct"]
+    st.metric("Cumplimiento global (sobre ítems contestados)", f"{pct if pct is not None else 0.0}%")
+
+    tendencia = pd.DataFrame(db.cumplimiento("total", por_periodo=True, **rango))
+    st.subheader("Tendencia mensual")
+    st.line_chart(tendencia.set_index("periodo")[["cumplimiento_pct"]].rename(columns={"cumplimiento_pct": "Cumplimiento (%)"}))
+
+    st.subheader("Por proveedor")
+    st.dataframe(
+        _tabla_cumplimiento(db.cumplimiento("proveedor", **rango), "Proveedor")
+        .sort_values("Cumplimiento (%)", na_position="last"),
+        hide_index=True
+    )
+    st.subheader("Por categoría del checklist")
+    st.dataframe(_tabla_cumplimiento(db.cumplimiento("categoria", **rango), "Categoría"), hide_index=True)
+    st.subheader("Por referencia normativa")
+    st.dataframe(_tabla_cumplimiento(db.cumplimiento("articulo", **rango), "Artículo"), hide_index=True)
+
+    # Las filas se leen por páginas y se escriben a un temporal en disco a medida que llegan.
+    # La descarga de Streamlit pasa el archivo por memoria: hasta EXPORTACION_DESCARGA_MAX_MB;
+    # más grande, se pide acotar el filtro o usar la CLI (python -m etiquetado.exportacion).
+    st.subheader("Exportar resultados por ítem")
+    e1, e2 = st.columns(2)
+    with e1:
+        formato = st.radio("Formato", FORMATOS_EXPORTACION, format_func=str.upper, horizontal=True, key="exp_formato")
+    with e2:
+        solo_estado = st.selectbox(
+            "Estado", [None, "no", "yes", "na", "none"],
+            format_func=lambda e: "Todos" if e is None else ESTADO_HUMANO[e],
+            key="exp_estado"
+        )
+    if st.button("Preparar exportación", key="btn_exportar"):
+        with st.spinner("Exportando…"), tramo("exportacion", colector_sesion()), tempfile.TemporaryFile() as tmp:
+            filas = exportar_resultados(db, tmp, formato, estado=solo_estado, **rango)
+            megas = os.fstat(tmp.fileno()).st_size / 1024 / 1024
+            if megas > EXPORTACION_DESCARGA_MAX_MB:
+                st.error(
+                    f"La exportación ocupa {megas:.0f} MB y la descarga desde la app admite hasta "
+                    f"{EXPORTACION_DESCARGA_MAX_MB:.0f} MB. Acote el rango o el estado, o use "
+                    f"`python -m etiquetado.exportacion SALIDA.{formato}` en el servidor."
+                )
+            else:
+                tmp.seek(0)
+                st.download_button(
+                    f"Descargar {filas} fila(s) ({formato.upper()})",
+                    data=tmp.read(),
+                    file_name=f"resultados_810_{datetime.now().strftime('%Y%m%d')}.{formato}",
+                    mime="text/csv" if formato == "csv" else
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="dl_exportacion"
+                )
 
-APLICA = {k: "Producto terminado" for cat in CATEGORIAS.values() for (k,_,_) in cat}
+if vista == "Portafolio":
+    render_portafolio()
+    st.stop()
 
 # ------------------------------------------------------------
-# ESTADO, NOTAS Y EVIDENCIA (persistente con base64)
+# ESTADO, NOTAS Y EVIDENCIA (referencias al almacén en disco)
 # ------------------------------------------------------------
 if "status_810" not in st.session_state:
     st.session_state.status_810 = {i[0]: "none" for c in CATEGORIAS.values() for i in c}
@@ -123,6 +243,312 @@ if "note_810" not in st.session_state:
     st.session_state.note_810 = {i[0]: "" for c in CATEGORIAS.values() for i in c}
 if "evidence_810" not in st.session_state:
     st.session_state.evidence_810 = {i[0]: [] for c in CATEGORIAS.values() for i in c}
+# Contadores por estado, mantenidos en cada cambio (las métricas no recorren status_810)
+if "conteo_810" not in st.session_state:
+    st.session_state.conteo_810 = Counter(st.session_state.status_810.values())
+
+def cambiar_estado(titulo: str, nuevo: str):
+    anterior = st.session_state.status_810.get(titulo, "none")
+    if anterior == nuevo:
+        return
+    st.session_state.status_810[titulo] = nuevo
+    st.session_state.conteo_810[anterior] -= 1
+    st.session_state.conteo_810[nuevo] += 1
+    st.session_state.metricas_pendientes = True
+    db.guardar_resultado(auditoria_actual(), titulo, estado=nuevo)
+
+# Resultado de una verificación automática → estado del ítem y, si hay fallas, su observación
+def aplicar_verificacion(titulo: str, cumple: bool, detalle: str = ""):
+    cambiar_estado(titulo, "yes" if cumple else "no")
+    if detalle and detalle != st.session_state.note_810.get(titulo, ""):
+        st.session_state.note_810[titulo] = detalle
+        st.session_state[f"obs_{ID_ITEM[titulo]}"] = detalle
+        db.guardar_resultado(auditoria_actual(), titulo, nota=detalle)
+
+# ------------------------------------------------------------
+# PERSISTENCIA (SQLite): la auditoría se crea con el primer cambio y
+# cada cambio posterior escribe solo la fila afectada.
+# ------------------------------------------------------------
+def metadatos_actuales() -> dict:
+    return {c: st.session_state.get(f"meta_{c}", False if c == "invima_estado_activo" else "") for c in CAMPOS_AUDITORIA}
+
+def auditoria_actual() -> int:
+    if st.session_state.get("auditoria_id") is None:
+        meta = metadatos_actuales()
+        st.session_state.auditoria_id = db.crear_auditoria(**meta)
+        st.session_state.meta_guardada = meta
+    return st.session_state.auditoria_id
+
+def retomar_auditoria(auditoria_id: int):
+    cargar_en_sesion(auditoria_id, db.cargar_auditoria(auditoria_id))
+
+def cargar_en_sesion(auditoria_id: int, registro: dict):
+    for evs in st.session_state.evidence_810.values():
+        for ev in evs:
+            almacen.liberar(ev["sha256"])
+    for evs in registro["evidencia"].values():
+        for ev in evs:
+            almacen.retener(ev["sha256"])
+    st.session_state.auditoria_id = auditoria_id
+    st.session_state.status_810 = registro["status"]
+    st.session_state.note_810 = registro["notas"]
+    st.session_state.evidence_810 = registro["evidencia"]
+    st.session_state.conteo_810 = Counter(registro["status"].values())
+    st.session_state.meta_guardada = {c: registro[c] for c in CAMPOS_AUDITORIA}
+    for c in CAMPOS_AUDITORIA:
+        st.session_state[f"meta_{c}"] = registro[c]
+    for titulo, nota in registro["notas"].items():
+        st.session_state[f"obs_{ID_ITEM[titulo]}"] = nota
+
+def nueva_auditoria():
+    for evs in st.session_state.evidence_810.values():
+        for ev in evs:
+            almacen.liberar(ev["sha256"])
+    st.session_state.auditoria_id = None
+    st.session_state.status_810 = {i[0]: "none" for c in CATEGORIAS.values() for i in c}
+    st.session_state.note_810 = {i[0]: "" for c in CATEGORIAS.values() for i in c}
+    st.session_state.evidence_810 = {i[0]: [] for c in CATEGORIAS.values() for i in c}
+    st.session_state.conteo_810 = Counter(st.session_state.status_810.values())
+    for titulo in st.session_state.note_810:
+        st.session_state[f"obs_{ID_ITEM[titulo]}"] = ""
+
+# ------------------------------------------------------------
+# INSTANTÁNEA (.zip): auditoría + entradas de las herramientas + evidencia en binario
+# ------------------------------------------------------------
+# Base de un data_editor con las ediciones del usuario aplicadas
+def tabla_editada(base: pd.DataFrame, ediciones: dict) -> pd.DataFrame:
+    df = base.reset_index(drop=True).copy()
+    for fila, cambios in (ediciones or {}).get("edited_rows", {}).items():
+        for columna, valor in cambios.items():
+            df.loc[int(fila), columna] = valor
+    df = df.drop(index=(ediciones or {}).get("deleted_rows", []))
+    agregadas = pd.DataFrame((ediciones or {}).get("added_rows", []), columns=df.columns)
+    return pd.concat([df, agregadas], ignore_index=True) if len(agregadas) else df.reset_index(drop=True)
+
+def entradas_actuales() -> dict:
+    entradas = {k: st.session_state[k] for k in ENTRADAS_HERRAMIENTAS if k in st.session_state}
+    entradas.update({k: v for k, v in st.session_state.items() if str(k).startswith("tn_formato_")})
+    for base, editor in TABLAS_HERRAMIENTAS.items():
+        if base in st.session_state:
+            entradas[base] = tabla_editada(st.session_state[base], st.session_state.get(editor))
+    return entradas
+
+# on_click de "Abrir instantánea": el zip se copia a disco y solo se lee el
+# manifiesto; cada imagen se extrae al almacén la primera vez que se muestra.
+def abrir_instantanea():
+    clave = f"upl_instantanea_{st.session_state.get('instantanea_gen', 0)}"
+    archivo = st.session_state.get(clave)
+    if archivo is None:
+        st.session_state.instantanea_error = "Cargue primero el archivo .zip de la instantánea."
+        return
+    ruta = guardar_en_disco(archivo)
+    try:
+        manifiesto = leer_instantanea(ruta)
+    except InstantaneaInvalida as e:
+        os.remove(ruta)
+        st.session_state.instantanea_error = f"No fue posible abrir la instantánea: {e}"
+        return
+    for sha256, miembro in manifiesto["evidencia"].items():
+        almacen.registrar_pendiente(sha256, lambda m=miembro: abrir_miembro(ruta, m))
+    # Con su fecha original; la misma instantánea abierta otra vez retoma la auditoría ya importada
+    previa = db.auditoria_importada(manifiesto["huella"])
+    auditoria_id = db.importar_auditoria(
+        manifiesto["registro"], fecha=manifiesto["fecha_auditoria"], huella=manifiesto["huella"]
+    )
+    cargar_en_sesion(auditoria_id, db.cargar_auditoria(auditoria_id))
+    for editor in TABLAS_HERRAMIENTAS.values():
+        st.session_state.pop(editor, None)
+    for clave_entrada, valor in manifiesto["entradas"].items():
+        st.session_state[clave_entrada] = valor
+    # Nueva clave del uploader: suelta el zip que Streamlit retiene en memoria
+    st.session_state.instantanea_gen = st.session_state.get("instantanea_gen", 0) + 1
+    faltantes = len(manifiesto.get("faltantes", []))
+    st.session_state.instantanea_error = None
+    st.session_state.instantanea_aviso = (
+        (f"Instantánea ya importada: se retoma la auditoría #{auditoria_id}" if previa is not None
+         else f"Instantánea abierta como auditoría #{auditoria_id}")
+        + (f" ({faltantes} imagen(es) no venían en el archivo)." if faltantes else ".")
+    )
+
+# ------------------------------------------------------------
+# ESPACIO DE TRABAJO: varios productos abiertos en la misma sesión
+# El activo usa el estado de siempre; los demás quedan como registros compactos
+# en EspacioTrabajo (LRU en memoria, el resto en disco).
+# ------------------------------------------------------------
+if "espacio_810" not in st.session_state:
+    st.session_state.espacio_810 = EspacioTrabajo(estado=compartido, sesion=sesion_id)
+    resumen = st.session_state.pop("espacio_resumen", None)
+    if resumen:
+        st.session_state.espacio_810.restaurar_resumen(resumen)
+    else:
+        st.session_state.espacio_810.activa = st.session_state.espacio_810.nueva_clave("Producto 1")
+espacio = st.session_state.espacio_810
+
+def producto_en_sesion() -> dict:
+    return {
+        "auditoria_id": st.session_state.get("auditoria_id"),
+        "meta": metadatos_actuales(),
+        "meta_guardada": st.session_state.get("meta_guardada"),
+        "status": st.session_state.status_810,
+        "notas": st.session_state.note_810,
+        "evidencia": st.session_state.evidence_810,
+        "entradas": entradas_actuales(),
+    }
+
+def guardar_producto_activo():
+    meta = metadatos_actuales()
+    espacio.guardar(espacio.activa, producto_en_sesion(), meta["producto"].strip() or espacio.etiquetas[espacio.activa])
+
+# on_change del selector de producto
+def activar_producto():
+    destino = st.session_state.producto_activo
+    if destino == espacio.activa:
+        return
+    guardar_producto_activo()
+    poner_en_sesion(espacio.tomar(destino))
+    espacio.activa = destino
+
+# Producto nuevo del mismo proveedor y responsable; el resto empieza en blanco
+def agregar_producto():
+    guardar_producto_activo()
+    meta = {c: False if c == "invima_estado_activo" else "" for c in CAMPOS_AUDITORIA}
+    meta.update({c: st.session_state.get(f"meta_{c}", "") for c in ("proveedor", "responsable")})
+    espacio.activa = espacio.nueva_clave(f"Producto {len(espacio.etiquetas) + 1}")
+    poner_en_sesion({
+        "auditoria_id": None,
+        "meta": meta,
+        "meta_guardada": {},
+        "status": {t: "none" for t in st.session_state.status_810},
+        "notas": {t: "" for t in st.session_state.note_810},
+        "evidencia": {t: [] for t in st.session_state.evidence_810},
+        "entradas": {},
+    })
+    st.session_state.producto_activo = espacio.activa
+
+# Cierra el producto activo (sigue guardado en la base) y activa el más reciente
+def cerrar_producto():
+    for evs in st.session_state.evidence_810.values():
+        for ev in evs:
+            almacen.liberar(ev["sha256"])
+    espacio.etiquetas.pop(espacio.activa)
+    espacio.activa = list(espacio.etiquetas)[-1]
+    poner_en_sesion(espacio.tomar(espacio.activa))
+    st.session_state.producto_activo = espacio.activa
+
+# Huella barata del producto activo: estados, notas, evidencia, metadatos, entradas
+# escalares y, de las tablas editables, el hash de la base y el delta del data_editor
+# (sin reconstruir la tabla editada ni volcar el producto completo).
+def huella_producto() -> str:
+    entradas = {k: st.session_state[k] for k in ENTRADAS_HERRAMIENTAS if k in st.session_state}
+    entradas.update({k: v for k, v in st.session_state.items() if str(k).startswith("tn_formato_")})
+    for base, editor in TABLAS_HERRAMIENTAS.items():
+        if base in st.session_state:
+            entradas[base] = [
+                int(pd.util.hash_pandas_object(st.session_state[base], index=False).sum()),
+                st.session_state.get(editor),
+            ]
+    texto = json.dumps(
+        [st.session_state.get("auditoria_id"), metadatos_actuales(), st.session_state.get("meta_guardada"),
+         st.session_state.status_810, st.session_state.note_810, st.session_state.evidence_810, entradas],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+# Escribe en el estado compartido solo lo que cambió desde la última vez (por huella:
+# el producto se compacta y se escribe únicamente si la huella es otra); el búfer
+# diferido agrupa las escrituras. Se llama al final de cada rerun completo y al
+# cerrar cada rerun de fragmento.
+def sincronizar_estado():
+    escrito = st.session_state.setdefault("estado_escrito", {})
+    huella = huella_producto()
+    if escrito.pop("restaurado", False):
+        escrito["activo"] = huella  # la sesión es justo lo que se leyó del estado compartido
+    cambios, huellas = {}, {}
+    if escrito.get("activo") != huella:
+        cambios["activo"] = compactar(producto_en_sesion())
+        huellas["activo"] = huella
+    resumen = espacio.resumen()
+    texto = json.dumps(resumen, ensure_ascii=False, sort_keys=True)
+    if escrito.get("espacio") != texto:
+        cambios["espacio"] = resumen
+        huellas["espacio"] = texto
+    if cambios:
+        # Sin registrar las huellas, lo rechazado se vuelve a intentar en el próximo rerun
+        try:
+            compartido.escribir(sesion_id, cambios)
+        except EstadoNoDisponible as e:
+            st.warning(f"Los cambios no se están respaldando en el estado compartido: {e}")
+            return
+        escrito.update(huellas)
+
+# Marcador de las métricas; None mientras el rerun completo no llega a ellas
+marcador_metricas = None
+
+# Cierre de un rerun de fragmento (que no llega al final del script): repinta las
+# métricas si algún estado cambió y sincroniza el estado compartido. En el rerun
+# completo no hace nada; de eso se encarga el final del script.
+def cerrar_fragmento():
+    if marcador_metricas is None:
+        return
+    if st.session_state.get("metricas_pendientes"):
+        pintar_metricas()
+    sincronizar_estado()
+
+# @st.fragment que además llama a cerrar_fragmento() al terminar
+def fragmento(fn):
+    @functools.wraps(fn)
+    def envoltura(*args, **kwargs):
+        resultado = fn(*args, **kwargs)
+        cerrar_fragmento()
+        return resultado
+    return st.fragment(envoltura)
+
+with panel_productos:
+    espacio.etiquetas[espacio.activa] = producto.strip() or espacio.etiquetas[espacio.activa]
+    st.session_state.setdefault("producto_activo", espacio.activa)
+    st.selectbox(
+        "Producto activo",
+        list(espacio.etiquetas),
+        format_func=lambda c: espacio.etiquetas.get(c, c),
+        key="producto_activo",
+        on_change=activar_producto
+    )
+    p1, p2 = st.columns(2)
+    p1.button("Agregar producto", on_click=agregar_producto, key="btn_agregar_producto")
+    p2.button("Cerrar producto", on_click=cerrar_producto, key="btn_cerrar_producto", disabled=len(espacio.etiquetas) < 2)
+    st.caption(f"{len(espacio.etiquetas)} producto(s) abiertos — {espacio.en_disco()} en disco")
+
+# Metadatos del sidebar: solo se escriben los campos que cambiaron
+if st.session_state.get("auditoria_id") is not None:
+    meta = metadatos_actuales()
+    cambios = {c: v for c, v in meta.items() if st.session_state.meta_guardada.get(c) != v}
+    if cambios:
+        db.actualizar_metadatos(st.session_state.auditoria_id, **cambios)
+        st.session_state.meta_guardada = meta
+
+with st.sidebar.expander("Auditorías guardadas", expanded=False):
+    if st.session_state.get("auditoria_id") is not None:
+        st.caption(f"Auditoría en curso: #{st.session_state.auditoria_id} (se guarda automáticamente)")
+    guardadas = db.listar_auditorias(limite=50, proveedor=proveedor.strip() or None)
+    if guardadas:
+        elegida = st.selectbox(
+            "Retomar auditoría",
+            guardadas,
+            format_func=lambda a: f"#{a['id']} — {a['fecha']} — {a['producto'] or '-'} ({a['proveedor'] or '-'})",
+            key="auditoria_elegida"
+        )
+        st.button("Retomar", on_click=retomar_auditoria, args=(elegida["id"],), key="btn_retomar")
+    else:
+        st.caption("No hay auditorías guardadas" + (" para este proveedor." if proveedor.strip() else "."))
+    st.button("Nueva auditoría", on_click=nueva_auditoria, key="btn_nueva_auditoria")
+    st.file_uploader(
+        "Abrir instantánea (.zip)", type=["zip"], key=f"upl_instantanea_{st.session_state.get('instantanea_gen', 0)}"
+    )
+    st.button("Abrir instantánea", on_click=abrir_instantanea, key="btn_abrir_instantanea")
+    if st.session_state.get("instantanea_error"):
+        st.error(st.session_state.instantanea_error)
+    elif st.session_state.get("instantanea_aviso"):
+        st.success(st.session_state.instantanea_aviso)
 
 def split_observation_text(text: str, chunk: int = 100) -> str:
     if not text:
@@ -136,595 +562,1100 @@ def split_observation_text(text: str, chunk: int = 100) -> str:
 # ------------------------------------------------------------
 # RENDER DEL CHECKLIST (con herramientas integradas por ítem)
 # ------------------------------------------------------------
+# ------------------------------------------------------------
+# TABLA NUTRICIONAL DECLARADA (entrada común de las verificaciones automáticas)
+# Fuera de los fragmentos: al editarla se recalculan todos los ítems que la usan.
+# ------------------------------------------------------------
+with st.expander("Tabla nutricional declarada (verificaciones automáticas)", expanded=False):
+    st.caption(
+        "Transcriba la tabla tal como está impresa: el valor con su separador decimal y la unidad "
+        "(en su columna o junto al valor, p. ej. `12 mg`). Para los micronutrientes ausentes agregue "
+        "una fila `Fuente no significativa de …`. La usan los ítems de nutrientes obligatorios, "
+        "aproximación y unidades."
+    )
+    if "tabla_nutricional_base" not in st.session_state:
+        st.session_state.tabla_nutricional_base = pd.DataFrame({
+            "nutriente": NUTRIENTES_TABLA,
+            "valor": [""] * len(NUTRIENTES_TABLA),
+            "unidad": [""] * len(NUTRIENTES_TABLA),
+        })
+    tabla_declarada = st.data_editor(
+        st.session_state.tabla_nutricional_base,
+        num_rows="dynamic",
+        column_config={
+            "nutriente": st.column_config.TextColumn(COLUMNAS_APROXIMACION["nutriente"]),
+            "valor": st.column_config.TextColumn(COLUMNAS_APROXIMACION["valor"]),
+            "unidad": st.column_config.TextColumn("Unidad"),
+        },
+        key="tabla_nutricional"
+    )
+# Solo filas con algo escrito en valor o unidad (la plantilla trae los nombres precargados)
+tabla_declarada = tabla_declarada[
+    tabla_declarada[["valor", "unidad"]].fillna("").astype(str).apply(lambda c: c.str.strip()).ne("").any(axis=1)
+    | ~tabla_declarada["nutriente"].fillna("").astype(str).isin(NUTRIENTES_TABLA)
+]
+st.session_state.tabla_declarada = tabla_declarada
+
 st.header("Checklist")
 st.markdown("Responde con ✅ Cumple / ❌ No cumple / ⚪ No aplica. Si marcas **No cumple**, podrás **adjuntar evidencia**.")
 
-for categoria, items in CATEGORIAS.items():
-    st.subheader(categoria)
-    for (titulo, que_verificar, referencia) in items:
-        estado = st.session_state.status_810.get(titulo, "none")
-        if solo_no and estado != "no":
-            continue
-
-        st.markdown(f"### {titulo}")
-        st.markdown(f"**Qué verificar:** {que_verificar}")
-        st.markdown(f"**Referencia normativa:** {referencia}")
-        st.markdown(f"**Aplica a:** {APLICA.get(titulo, 'Producto terminado')}")
-        
-        if titulo == "Formato, tipografía y jerarquía visual de la tabla nutricional":
-           
-           with st.expander("Desglose técnico — Formato y tipografía de la tabla nutricional", expanded=False):
-               
-               checklist_formato = [
-                   "La tabla nutricional utiliza tipografía Arial o Helvetica y su texto es de color negro sobre fondo contrastante",
-                   "Título declarado como “Información Nutricional”, “Datos de Nutrición” o “Información Nutrimental” y tiene un tamaño mínimo de 10 pt",
-                   "Los nombres de calorías, grasa saturada, grasas trans, azúcares añadidos y sodio están en negrilla, tienen un tamaño de letra ≥ 1,3 veces el del resto de nutrientes",
-                   "Las grasas y carhohidratos totales están alineados a la izquierda, mientras que sus componentes (como grasas saturadas, grasas trans, fibra dietaria y azúcares) deben ir un poco más hacia la derecha. Los azúcares añadidos deben ir aún más desplazados, mostrando que hacen parte de los azúcares totales.",
-                   "La tabla conserva márgenes, proporciones y estructura, no se incluyen imágenes, logotipos o elementos gráficos dentro del recuadro ",
-               ]
-               
-               for item in checklist_formato:
-                   st.checkbox(
-                       item,
-                       key=f"tn_formato_{item}"
-                   )
-
-        # Botonera de estado
-        c1, c2, c3, _ = st.columns([0.12, 0.12, 0.12, 0.64])
-        with c1:
-            if st.button("✅ Cumple", key=f"{titulo}_yes"):
-                st.session_state.status_810[titulo] = "yes"
-        with c2:
-            if st.button("❌ No cumple", key=f"{titulo}_no"):
-                st.session_state.status_810[titulo] = "no"
-        with c3:
-            if st.button("⚪ No aplica", key=f"{titulo}_na"):
-                st.session_state.status_810[titulo] = "na"
-
-        # Estado visual
-        estado = st.session_state.status_810[titulo]
-        if estado == "yes":
-            st.markdown("<div style='background:#e6ffed;padding:6px;border-radius:5px;'>✅ Cumple</div>", unsafe_allow_html=True)
-        elif estado == "no":
-            st.markdown("<div style='background:#ffe6e6;padding:6px;border-radius:5px;'>❌ No cumple</div>", unsafe_allow_html=True)
-        elif estado == "na":
-            st.markdown("<div style='background:#f2f2f2;padding:6px;border-radius:5px;'>⚪ No aplica</div>", unsafe_allow_html=True)
+# Fecha de evaluación de las cargas masivas: se aplica la versión de la
+# normativa vigente ese día (reglamentos.json), p. ej. para re-evaluar un
+# portafolio histórico con las reglas de su momento.
+def fecha_normativa(clave: str):
+    fecha = st.date_input(
+        "Evaluar con la normativa vigente al",
+        value=datetime.now().date(),
+        min_value=NORMATIVA.vigencias[0].item(),
+        key=clave
+    )
+    vigente = NORMATIVA.vigente(fecha)
+    st.caption(f"Versión aplicada: **{vigente['version']}** — {vigente['fuente']}")
+    return fecha
+
+# Las herramientas y cada ítem son fragmentos: un clic, una nota o un valor
+# dentro de ellos vuelve a ejecutar solo ese fragmento, no todo el checklist.
+@fragmento
+@cronometrado("herramienta.calorias", colector_sesion)
+def herramienta_calorias():
+    st.markdown("<div style='background:#e6f0ff;padding:10px;border-radius:8px;'><b>Herramienta:</b> Verifique el valor energético declarado vs calculado.</div>", unsafe_allow_html=True)
+    colA  = st.columns(2)
+    colA, colB = st.columns(2)
+    with colA:
+        base = st.radio("Base de declaración", ["Por 100 g", "Por 100 mL"], index=0, key="base_cal")
+        carb_g = st.number_input("Carbohidratos (g)", min_value=0.0, value=20.0, step=0.1, key="c_cal_carb")
+        prot_g = st.number_input("Proteínas (g)", min_value=0.0, value=5.0, step=0.1, key="c_cal_prot")
+        grasa_g = st.number_input("Grasas (g)", min_value=0.0, value=7.0, step=0.1, key="c_cal_grasa")
+        kcal_decl = st.number_input("Calorías declaradas en la etiqueta (kcal)", min_value=0.0, value=200.0, step=1.0, key="c_cal_decl")
+    with colB:
+        res_cal = verificar_calorias(pd.DataFrame([{
+            "kcal_declaradas": kcal_decl,
+            "carbohidratos_g": carb_g,
+            "proteinas_g": prot_g,
+            "grasas_g": grasa_g,
+        }])).iloc[0]
+        st.write(f"**Calorías calculadas:** {res_cal['kcal_calculadas']:.1f} kcal")
+        if not pd.isna(res_cal["cumple"]):
+            st.write(f"**Diferencia:** {res_cal['diferencia_abs_kcal']:.1f} kcal ({abs(res_cal['diferencia_pct']):.1f}%)")
+            tolerancia = NORMATIVA.vigente()["calorias"]["tolerancia_pct"]
+            if res_cal["cumple"]:
+                st.success(f"✅ Consistente: dentro de ±{tolerancia:g}% de tolerancia (Res. 810/2021 art. 14).")
+            else:
+                st.error(f"⚠️ Inconsistente: excede ±{tolerancia:g}% de tolerancia (Res. 810/2021 art. 14).")
         else:
-            st.markdown("<div style='background:#fff;padding:6px;border-radius:5px;'>Sin responder</div>", unsafe_allow_html=True)
-
-        # Herramientas integradas (cuadros azul #e6f0ff)
-        if titulo == "Verificación de calorías declaradas (±20% tolerancia)":
-            st.markdown("<div style='background:#e6f0ff;padding:10px;border-radius:8px;'><b>Herramienta:</b> Verifique el valor energético declarado vs calculado.</div>", unsafe_allow_html=True)
-            colA  = st.columns(2)
-            colA, colB = st.columns(2)
-            with colA:
-                base = st.radio("Base de declaración", ["Por 100 g", "Por 100 mL"], index=0, key="base_cal")
-                carb_g = st.number_input("Carbohidratos (g)", min_value=0.0, value=20.0, step=0.1, key="c_cal_carb")
-                prot_g = st.number_input("Proteínas (g)", min_value=0.0, value=5.0, step=0.1, key="c_cal_prot")
-                grasa_g = st.number_input("Grasas (g)", min_value=0.0, value=7.0, step=0.1, key="c_cal_grasa")
-                kcal_decl = st.number_input("Calorías declaradas en la etiqueta (kcal)", min_value=0.0, value=200.0, step=1.0, key="c_cal_decl")
-            with colB:
-                kcal_calc = 4.0 * carb_g + 4.0 * prot_g + 9.0 * grasa_g
-                diff_abs = abs(kcal_calc - kcal_decl)
-                diff_pct = (diff_abs / kcal_decl * 100.0) if kcal_decl > 0 else None
-                st.write(f"**Calorías calculadas:** {kcal_calc:.1f} kcal")
-                if diff_pct is not None:
-                    st.write(f"**Diferencia:** {diff_abs:.1f} kcal ({diff_pct:.1f}%)")
-                    if diff_pct <= 20.0:
-                        st.success("✅ Consistente: dentro de ±20% de tolerancia (Res. 810/2021 art. 14).")
-                    else:
-                        st.error("⚠️ Inconsistente: excede ±20% de tolerancia (Res. 810/2021 art. 14).")
-                else:
-                    st.info("Ingrese calorías declaradas para evaluar la diferencia.")
-        
-        if titulo == "Determinación de aplicabilidad de sellos":
-            st.markdown(
-                "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
-                "<b>Herramienta:</b> Determinación de aplicabilidad de sellos según Res. 810/2021 Art. 25 y Tabla 3 "
-                "(modificada por Res. 2492/2022)."
-                "</div>",
-                unsafe_allow_html=True
-            )
-
-            col1, col2 = st.columns(2)
-
-            # -------------------------------
-            # ENTRADAS
-            # -------------------------------
-            with col1:
-                base = st.radio(
-                    "Base de evaluación",
-                    ["Por 100 g", "Por 100 mL"],
-                    index=0,
-                    key="base_sellos"
-                )
-
-                kcal_totales = st.number_input(
-                    "Calorías totales (kcal)",
-                    min_value=0.0,
-                    step=1.0,
-                    key="sellos_kcal"
-                )
-
-                azucares_para_sellos_g = st.number_input(
-                    "Azúcares añadidos (g)",
-                    help=(
-                        "Corresponde a los AZÚCARES LIBRES según Res. 3803 de 2016: "
-                        "azúcares añadidos + azúcares provenientes de jugos, concentrados o purés. "
-                        "No usar azúcares totales si el producto contiene fruta entera o lactosa natural."
-                    ),
-                    min_value=0.0,
-                    step=0.1,
-                    key="sellos_azucares_libres"
-                )
+            st.info("Ingrese calorías declaradas para evaluar la diferencia.")
 
-                grasas_saturadas = st.number_input(
-                    "Grasas saturadas (g)",
-                    min_value=0.0,
-                    step=0.1,
-                    key="sellos_sat"
-                )
-
-                grasas_trans_mg = st.number_input(
-                    "Grasas trans (mg)",
-                    min_value=0.0,
-                    step=0.01,
-                    key="sellos_trans"
+    with st.expander("Verificación masiva de calorías (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Cargue la exportación de laboratorio o fichas técnicas con una fila por producto "
+            "(valores por 100 g o 100 mL) y las columnas: "
+            + ", ".join(f"`{c}`" for c in COLUMNAS_CALORIAS) + "."
+        )
+        archivo_cal = st.file_uploader(
+            "Archivo de calorías y macronutrientes",
+            type=["csv", "xlsx"],
+            key="upl_cal_masivo"
+        )
+        fecha_cal = fecha_normativa("fecha_cal_masivo")
+        if archivo_cal is not None:
+            try:
+                res_cal_masivo = verificar_calorias(leer_tabla(archivo_cal), fecha=fecha_cal)
+            except ValueError as e:
+                st.error(f"No fue posible evaluar el archivo: {e}")
+            else:
+                fuera = ~res_cal_masivo["cumple"].fillna(True)
+                dentro = res_cal_masivo["cumple"].fillna(False)
+                invalidas_cal = res_cal_masivo["error"].ne("")
+                n_no = int(fuera.sum())
+                st.write(
+                    f"**Productos evaluados:** {len(res_cal_masivo)} — "
+                    f"**fuera de tolerancia:** {n_no} — "
+                    f"**sin calorías declaradas:** {int((res_cal_masivo['cumple'].isna() & ~invalidas_cal).sum())} — "
+                    f"**sin evaluar por datos vacíos o ilegibles:** {int(invalidas_cal.sum())}"
                 )
-
-                sodio_mg = st.number_input(
-                    "Sodio (mg)",
-                    min_value=0.0,
-                    step=1.0,
-                    key="sellos_sodio"
+                filtro_cal = st.radio(
+                    "Mostrar",
+                    ["Todos", "Solo inconsistentes", "Solo consistentes"],
+                    horizontal=True,
+                    key="filtro_cal_masivo"
                 )
-
-                contiene_edulcorante = st.checkbox(
-                    "¿Contiene edulcorantes (calóricos o no calóricos)?",
-                    key="sellos_edulcorante"
+                vista_cal = res_cal_masivo
+                if filtro_cal == "Solo inconsistentes":
+                    vista_cal = res_cal_masivo[fuera]
+                elif filtro_cal == "Solo consistentes":
+                    vista_cal = res_cal_masivo[dentro]
+                st.dataframe(vista_cal)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=vista_cal.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="calorias_verificacion.csv",
+                    mime="text/csv",
+                    key="dl_cal_masivo"
                 )
 
-                bebida_sin_calorias = st.checkbox(
-                    "¿Es bebida sin aporte energético?",
-                    key="bebida_sin_kcal"
-                )
+@fragmento
+@cronometrado("herramienta.sellos", colector_sesion)
+def herramienta_sellos():
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Determinación de aplicabilidad de sellos según Res. 810/2021 Art. 25 y Tabla 3 "
+        "(modificada por Res. 2492/2022)."
+        "</div>",
+        unsafe_allow_html=True
+    )
 
-            # -------------------------------
-            # CÁLCULOS SEGÚN RES. 810 / 2492
-            # -------------------------------
-            # Conversión de mg a g para grasas trans
-            grasas_trans_g = grasas_trans_mg / 1000  # mg → g
-            
-            # Azúcares
-            pct_azucar = (azucares_para_sellos_g * 4 / kcal_totales * 100) if kcal_totales > 0 else 0
+    col1, col2 = st.columns(2)
+
+    # -------------------------------
+    # ENTRADAS
+    # -------------------------------
+    with col1:
+        base = st.radio(
+            "Base de evaluación",
+            ["Por 100 g", "Por 100 mL"],
+            index=0,
+            key="base_sellos"
+        )
 
-            # Grasas saturadas
-            pct_sat = (grasas_saturadas * 9 / kcal_totales * 100) if kcal_totales > 0 else 0
+        kcal_totales = st.number_input(
+            "Calorías totales (kcal)",
+            min_value=0.0,
+            step=1.0,
+            key="sellos_kcal"
+        )
 
-            # Grasas trans
-            pct_trans = (grasas_trans_g * 9 / kcal_totales * 100) if kcal_totales > 0 else 0
+        azucares_para_sellos_g = st.number_input(
+            "Azúcares añadidos (g)",
+            help=(
+                "Corresponde a los AZÚCARES LIBRES según Res. 3803 de 2016: "
+                "azúcares añadidos + azúcares provenientes de jugos, concentrados o purés. "
+                "No usar azúcares totales si el producto contiene fruta entera o lactosa natural."
+            ),
+            min_value=0.0,
+            step=0.1,
+            key="sellos_azucares_libres"
+        )
 
-            # Sodio – cálculo 1 (relación sodio/kcal)
-            rel_sodio_kcal = (sodio_mg / kcal_totales) if kcal_totales > 0 else 0
+        grasas_saturadas = st.number_input(
+            "Grasas saturadas (g)",
+            min_value=0.0,
+            step=0.1,
+            key="sellos_sat"
+        )
 
-            # -------------------------------
-            # RESULTADO
-            # -------------------------------
-            with col2:
-                st.markdown("### Resultado normativo (Res. 810/2021 – Res. 2492/2022)")
+        grasas_trans_mg = st.number_input(
+            "Grasas trans (mg)",
+            min_value=0.0,
+            step=0.01,
+            key="sellos_trans"
+        )
 
-                aplica_sellos = []
+        sodio_mg = st.number_input(
+            "Sodio (mg)",
+            min_value=0.0,
+            step=1.0,
+            key="sellos_sodio"
+        )
 
-                # AZÚCARES
-                if pct_azucar >= 10:
-                    aplica_sellos.append(f"❗ EXCESO EN AZÚCARES ({pct_azucar:.1f}% kcal)")
+        contiene_edulcorante = st.checkbox(
+            "¿Contiene edulcorantes (calóricos o no calóricos)?",
+            key="sellos_edulcorante"
+        )
 
-                # GRASAS SATURADAS
-                if pct_sat >= 10:
-                    aplica_sellos.append(f"❗ EXCESO EN GRASAS SATURADAS ({pct_sat:.1f}% kcal)")
+        bebida_sin_calorias = st.checkbox(
+            "¿Es bebida sin aporte energético?",
+            key="bebida_sin_kcal"
+        )
 
-                # GRASAS TRANS
-                if pct_trans >= 1:
-                    aplica_sellos.append(f"❗ EXCESO EN GRASAS TRANS ({pct_trans:.1f}% kcal)")
+    # -------------------------------
+    # CÁLCULOS SEGÚN RES. 810 / 2492 (mismo motor que la evaluación masiva)
+    # -------------------------------
+    resultado_sellos = determinar_sellos(pd.DataFrame([{
+        "kcal": kcal_totales,
+        "azucares_libres_g": azucares_para_sellos_g,
+        "grasas_saturadas_g": grasas_saturadas,
+        "grasas_trans_mg": grasas_trans_mg,
+        "sodio_mg": sodio_mg,
+        "edulcorante": contiene_edulcorante,
+        "bebida_sin_kcal": bebida_sin_calorias,
+    }])).iloc[0]
+
+    # -------------------------------
+    # RESULTADO
+    # -------------------------------
+    with col2:
+        st.markdown("### Resultado normativo (Res. 810/2021 – Res. 2492/2022)")
+
+        st.caption(f"Normativa aplicada: {resultado_sellos['version_reglas']}")
+        aplica_sellos = describir_sellos(resultado_sellos)
+
+        if aplica_sellos:
+            st.error("Aplican los siguientes sellos:")
+            for s in aplica_sellos:
+                st.write(f"- {s}")
+        else:
+            st.success("✅ No aplica ningún sello frontal de advertencia")
+
+    with st.expander("Evaluación masiva de portafolio (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Cargue un archivo con una fila por producto (valores por 100 g o 100 mL) y las columnas: "
+            + ", ".join(f"`{c}`" for c in COLUMNAS_SELLOS)
+            + ". Las columnas `edulcorante` y `bebida_sin_kcal` son opcionales (sí/no, 1/0). "
+            "Se aceptan decimales con coma o punto; las celdas vacías o ilegibles se informan en la columna `error`."
+        )
+        archivo_sellos = st.file_uploader(
+            "Archivo de nutrientes",
+            type=["csv", "xlsx"],
+            key="upl_sellos_masivo"
+        )
+        fecha_sellos = fecha_normativa("fecha_sellos_masivo")
+        if archivo_sellos is not None:
+            try:
+                res_masivo = determinar_sellos(leer_tabla(archivo_sellos), fecha=fecha_sellos)
+            except ValueError as e:
+                st.error(f"No fue posible evaluar el archivo: {e}")
+            else:
+                invalidas_sellos = res_masivo["error"].ne("")
+                st.write(
+                    f"**Productos evaluados:** {int((~invalidas_sellos).sum())} — "
+                    f"**con al menos un sello:** {int(res_masivo['num_sellos'].gt(0).sum())} — "
+                    f"**sin evaluar por datos vacíos o ilegibles:** {int(invalidas_sellos.sum())}"
+                )
+                st.dataframe(res_masivo)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=res_masivo.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="sellos_portafolio.csv",
+                    mime="text/csv",
+                    key="dl_sellos_masivo"
+                )
 
-                # SODIO
-                sodio_exceso = False
+# Opciones de escala física comunes al análisis individual y masivo de artes
+def escala_arte(prefijo: str) -> dict:
+    return {
+        "ancho_cm": st.session_state.get(f"{prefijo}_ancho_cm") or None,
+        "alto_cm": st.session_state.get(f"{prefijo}_alto_cm") or None,
+        "dpi": st.session_state.get(f"{prefijo}_dpi") or None,
+    }
+
+# on_click de "Analizar arte": corre antes de pintar los number_input, así que
+# puede escribir directamente en sus claves.
+def autocompletar_desde_arte():
+    arte = st.session_state.get("arte_tam")
+    st.session_state.pop("arte_resultado", None)
+    if arte is None:
+        st.session_state.arte_error = "Cargue primero la imagen del arte."
+        return
+    cilindrico = st.session_state.get("tipo_envase") == "Cilíndrico / cónico"
+    try:
+        with tramo("artes.analisis", colector_sesion(), detalle=arte.name):
+            res = analizar_arte(
+                arte.getvalue(), tipo_envase="cilindrico" if cilindrico else "no_cilindrico", **escala_arte("arte")
+            )
+    except Exception as e:
+        st.session_state.arte_error = f"No fue posible analizar el arte: {e}"
+        return
+    st.session_state.arte_error = None
+    st.session_state.arte_resultado = res
+    st.session_state.area_cara = float(res["area_cara_cm2"])
+    st.session_state.num_sellos = max(1, res["num_sellos"])
+    st.session_state.lado_sello = float(res["lado_real_cm"])
+    st.session_state["ubicacion_cilindrico" if cilindrico else "ubicacion_no_cilindrico"] = res["ubicacion_correcta"]
+
+@fragmento
+@cronometrado("herramienta.tamano_sellos", colector_sesion)
+def herramienta_tamano_sellos():
+    st.markdown(
+        """ 
+        Para verificar la **distribución de los sellos de advertencia**, consultar la  
+        **Resolución 810 de 2021**, apartado **32.5.6 – Formas de distribución**, disponible en el siguiente enlace oficial:
+
+        🔗 https://www.alcaldiabogota.gov.co/sisjur/normas/Norma1.jsp?i=113678
+        """,
+        unsafe_allow_html=False
+    )
 
-                if not bebida_sin_calorias and rel_sodio_kcal >= 1:
-                    sodio_exceso = True
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Verificación de ubicación y tamaño de sellos "
+        "según Res. 810/2021 Art. 27 y Res. 2492/2022 Art. 32."
+        "</div>",
+        unsafe_allow_html=True
+    )
 
-                if not bebida_sin_calorias and sodio_mg >= 300:
-                    sodio_exceso = True
+    with st.expander("Completar desde la imagen del arte", expanded=False):
+        st.caption(
+            "Detecta los octágonos negros en la cara principal, mide su lado y su ubicación, y "
+            "completa las entradas de abajo. Indique las dimensiones físicas de la cara o el DPI "
+            "(si se deja en 0 se usa el DPI guardado en la imagen)."
+        )
+        st.file_uploader("Arte de la cara principal", type=["png", "jpg", "jpeg", "tif", "tiff"], key="arte_tam")
+        e1, e2, e3 = st.columns(3)
+        e1.number_input("Ancho de la cara (cm)", min_value=0.0, step=0.5, key="arte_ancho_cm")
+        e2.number_input("Alto de la cara (cm)", min_value=0.0, step=0.5, key="arte_alto_cm")
+        e3.number_input("DPI", min_value=0, step=50, key="arte_dpi")
+        st.button("Analizar arte y completar", key="arte_analizar", on_click=autocompletar_desde_arte)
+        if st.session_state.get("arte_error"):
+            st.error(st.session_state.arte_error)
+        res_arte = st.session_state.get("arte_resultado")
+        if res_arte is not None:
+            if res_arte["num_sellos"]:
+                st.success(
+                    f"Sellos detectados: {res_arte['num_sellos']} — lado menor {res_arte['lado_real_cm']:.2f} cm — "
+                    f"cara {res_arte['ancho_cm']:.1f} × {res_arte['alto_cm']:.1f} cm"
+                )
+                st.dataframe(res_arte["sellos"], hide_index=True)
+            else:
+                st.warning("No se detectaron sellos octagonales negros en el arte.")
+
+    # -------------------------------
+    # ENTRADAS
+    # -------------------------------
+    col1, col2 = st.columns(2)
+
+    with col1:
+        tipo_envase = st.selectbox(
+            "Tipo de envase",
+            ["No Cilíndrico", "Cilíndrico / cónico"],
+            key="tipo_envase"
+        )
 
-                if bebida_sin_calorias and sodio_mg >= 40:
-                    sodio_exceso = True
+        area_cara_cm2 = st.number_input(
+            "Área de la cara principal (cm²)",
+            min_value=0.0,
+            step=1.0,
+            key="area_cara"
+        )
 
-                if sodio_exceso:
-                    aplica_sellos.append("❗ EXCESO EN SODIO")
+        num_sellos = st.number_input(
+            "Número de sellos requeridos",
+            min_value=1,
+            step=1,
+            key="num_sellos"
+        )
 
-                # EDULCORANTE
-                if contiene_edulcorante:
-                    aplica_sellos.append("⚠️ CONTIENE EDULCORANTE")
+        lado_real_cm = st.number_input(
+            "Tamaño real del sello en el arte (cm)",
+            min_value=0.0,
+            step=0.1,
+            key="lado_sello"
+        )
 
-                if aplica_sellos:
-                    st.error("Aplican los siguientes sellos:")
-                    for s in aplica_sellos:
-                        st.write(f"- {s}")
-                else:
-                    st.success("✅ No aplica ningún sello frontal de advertencia")
+    # -------------------------------
+    # UBICACIÓN (VERIFICACIÓN CUALITATIVA)
+    # -------------------------------
+    with col2:
+        st.markdown("### Ubicación normativa")
 
+        if tipo_envase == "No Cilíndrico":
+            st.checkbox(
+                "¿Los o el sello se ubican en el **tercio superior derecho** de la cara principal?",
+                key="ubicacion_no_cilindrico"
+            )
+        else:
+            st.checkbox(
+                "¿Los o el sello se ubican en el **tercio superior central** del envase?",
+                key="ubicacion_cilindrico"
+            )
 
-        st.markdown("---")
+    st.markdown("---")
 
+    # -------------------------------
+    # TAMAÑO – CÁLCULO NORMATIVO
+    # -------------------------------
+    st.markdown("### Verificación de tamaño del sello")
 
-        if titulo == "Ubicación, distribución y tamaño de sellos (Tabla 17)":
-            st.markdown(
-                """ 
-                Para verificar la **distribución de los sellos de advertencia**, consultar la  
-                **Resolución 810 de 2021**, apartado **32.5.6 – Formas de distribución**, disponible en el siguiente enlace oficial:
-                
-                🔗 https://www.alcaldiabogota.gov.co/sisjur/normas/Norma1.jsp?i=113678
-                """,
-                unsafe_allow_html=False
-            )
+    with st.expander("Tabla 17 — Lado mínimo del sello según área de la cara principal", expanded=False):
+        st.table(df_tabla17)
 
-            st.markdown(
-                "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
-                "<b>Herramienta:</b> Verificación de ubicación y tamaño de sellos "
-                "según Res. 810/2021 Art. 27 y Res. 2492/2022 Art. 32."
-                "</div>",
-                unsafe_allow_html=True
-            )
+    res_tam = evaluar_tamano_sellos(area_cara_cm2, num_sellos, lado_real_cm).iloc[0]
+    cumple = bool(res_tam["cumple"])
+    reglas_tam = NORMATIVA.vigente()["tamano"]
+    st.caption(f"Normativa aplicada: {res_tam['version_reglas']}")
 
-            # -------------------------------
-            # ENTRADAS
-            # -------------------------------
-            col1, col2 = st.columns(2)
+    # 🔹 CASO 1: UN SOLO SELLO → TABLA 18
+    if res_tam["regla"] == "envase_secundario":
+        st.warning(f"Área < {reglas_tam['area_min_cm2']:g} cm² → debe rotular en envase secundario o QR.")
+    elif res_tam["regla"] in ("tabla_18", "fijo") and num_sellos == 1:
+        st.write(f"**Lado mínimo exigido:** {res_tam['lado_min_cm']:.2f} cm")
+        if cumple:
+            st.success("✅ Cumple tamaño del sello (Tabla 18)")
+        else:
+            st.error("❌ No cumple tamaño mínimo del sello")
+
+    # 🔹 CASO 2: DOS O MÁS SELLOS → ADS
+    elif res_tam["regla"] == "ads":
+        st.write(f"Área disponible para sellos (ADS): {res_tam['ads_cm2']:.2f} cm²")
+        st.write(f"Área total ocupada por sellos: {res_tam['area_total_sellos_cm2']:.2f} cm²")
+        if cumple:
+            st.success(f"✅ Cumple criterio de área disponible (ADS {reglas_tam['ads_fraccion']:.0%})")
+        else:
+            st.error("❌ No cumple: los sellos exceden el ADS permitido")
+    else:
+        lado_fijo = f"{reglas_tam['lado_fijo_cm']:g}".replace(".", ",")
+        st.write(f"Área > {reglas_tam['area_max_tabla_cm2']:g} cm² → cada sello debe medir **{lado_fijo} × {lado_fijo} cm**")
+        if cumple:
+            st.success("✅ Cumple tamaño fijo para múltiples sellos")
+        else:
+            st.error(f"❌ No cumple tamaño fijo ({lado_fijo} cm)")
 
-            with col1:
-                tipo_envase = st.selectbox(
-                    "Tipo de envase",
-                    ["No Cilíndrico", "Cilíndrico / cónico"],
-                    key="tipo_envase"
+    with st.expander("Verificación masiva de tamaño (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Cargue un archivo con una fila por cara principal / revisión de arte y las columnas: "
+            + ", ".join(f"`{c}`" for c in COLUMNAS_TAMANO) + "."
+        )
+        archivo_tam = st.file_uploader(
+            "Archivo de caras principales",
+            type=["csv", "xlsx"],
+            key="upl_tam_masivo"
+        )
+        fecha_tam = fecha_normativa("fecha_tam_masivo")
+        if archivo_tam is not None:
+            try:
+                caras = normalizar_tabla(leer_tabla(archivo_tam), COLUMNAS_TAMANO)
+            except ValueError as e:
+                st.error(f"No fue posible evaluar el archivo: {e}")
+            else:
+                # Las filas con datos vacíos o ilegibles quedan sin veredicto (no se evalúan contra 0)
+                validas = caras[caras["error"].eq("")]
+                res_tam_masivo = evaluar_tamano_sellos(
+                    validas["area_cara_cm2"], validas["num_sellos"], validas["lado_real_cm"], fecha=fecha_tam
                 )
-
-                area_cara_cm2 = st.number_input(
-                    "Área de la cara principal (cm²)",
-                    min_value=0.0,
-                    step=1.0,
-                    key="area_cara"
+                res_tam_masivo.index = validas.index
+                res_tam_masivo = caras.drop(columns=list(COLUMNAS_TAMANO)).join(res_tam_masivo)
+                st.write(
+                    f"**Caras evaluadas:** {len(validas)} — "
+                    f"**no cumplen:** {int(res_tam_masivo['cumple'].eq(False).sum())} — "
+                    f"**sin evaluar por datos vacíos o ilegibles:** {len(caras) - len(validas)}"
+                )
+                st.dataframe(res_tam_masivo)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=res_tam_masivo.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="tamano_sellos.csv",
+                    mime="text/csv",
+                    key="dl_tam_masivo"
                 )
 
-                num_sellos = st.number_input(
-                    "Número de sellos requeridos",
-                    min_value=1,
-                    step=1,
-                    key="num_sellos"
+    with st.expander("Análisis masivo de artes (imágenes)", expanded=False):
+        st.caption(
+            "Analiza en paralelo varias caras principales con la misma escala (dimensiones o DPI; "
+            "en 0 se usa el DPI de cada imagen) y evalúa el tamaño de los sellos detectados."
+        )
+        artes = st.file_uploader(
+            "Artes", type=["png", "jpg", "jpeg", "tif", "tiff"], accept_multiple_files=True, key="upl_artes_masivo"
+        )
+        m1, m2, m3 = st.columns(3)
+        m1.number_input("Ancho de la cara (cm)", min_value=0.0, step=0.5, key="artes_ancho_cm")
+        m2.number_input("Alto de la cara (cm)", min_value=0.0, step=0.5, key="artes_alto_cm")
+        m3.number_input("DPI", min_value=0, step=50, key="artes_dpi")
+        if artes and st.button("Analizar artes", key="artes_analizar"):
+            progreso = st.progress(0.0, text=f"Analizando 0/{len(artes)} arte(s)…")
+            filas, errores = [], []
+            opciones = {
+                "tipo_envase": "cilindrico" if tipo_envase == "Cilíndrico / cónico" else "no_cilindrico",
+                **escala_arte("artes"),
+            }
+            with tramo("artes.lote", colector_sesion(), artes=len(artes)):
+                for n, (nombre, res, error) in enumerate(
+                    analizar_lote([(a.name, a.getvalue()) for a in artes], **opciones), start=1
+                ):
+                    if error:
+                        errores.append((nombre, error))
+                    else:
+                        filas.append(res)
+                    progreso.progress(n / len(artes), text=f"Analizando {n}/{len(artes)} arte(s)…")
+            progreso.empty()
+            for nombre, error in errores:
+                st.error(f"{nombre}: {error}")
+            if filas:
+                res_artes = pd.DataFrame(filas).sort_values("archivo").reset_index(drop=True)
+                res_artes = res_artes.join(evaluar_tamano_artes(res_artes))
+                sin_sellos = res_artes["num_sellos"].eq(0)
+                res_artes["cumple"] = (res_artes["cumple"] & res_artes["ubicacion_correcta"]).mask(sin_sellos)
+                st.write(
+                    f"**Artes analizados:** {len(res_artes)} — "
+                    f"**no cumplen:** {int(res_artes['cumple'].eq(False).sum())} — "
+                    f"**sin sellos detectados:** {int(sin_sellos.sum())}"
+                )
+                st.dataframe(res_artes, hide_index=True)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=res_artes.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="analisis_artes.csv",
+                    mime="text/csv",
+                    key="dl_artes_masivo"
                 )
 
-                lado_real_cm = st.number_input(
-                    "Tamaño real del sello en el arte (cm)",
-                    min_value=0.0,
-                    step=0.1,
-                    key="lado_sello"
+    # -------------------------------
+    # RESULTADO FINAL
+    # -------------------------------
+    st.markdown("---")
+    if cumple:
+        st.success("✅ Cumple con ubicación, distribución y tamaño de sellos")
+    else:
+        st.error("❌ No cumple con uno o más criterios normativos")
+
+# Sin @st.fragment propio: "Aplicar al ítem" cambia el estado del ítem, así que
+# debe repintarse con el fragmento del ítem que la contiene.
+@cronometrado("herramienta.aproximacion", colector_sesion)
+def herramienta_aproximacion():
+    titulo = "Aproximación y expresión de valores nutricionales"
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Verifique la aproximación de cada valor tal como está impreso en la tabla "
+        "(Res. 810/2021 Art. 8), a partir de la <b>tabla nutricional declarada</b> (antes del checklist)."
+        "</div>",
+        unsafe_allow_html=True
+    )
+    res_aprox = validar_aproximacion(st.session_state.tabla_declarada)
+    evaluados = res_aprox["cumple"].notna()
+    if evaluados.any():
+        fallas = res_aprox[res_aprox["cumple"].eq(False)]
+        if fallas.empty:
+            st.success(f"✅ Los {int(evaluados.sum())} valores declarados están correctamente aproximados.")
+        else:
+            st.error(f"⚠️ {len(fallas)} de {int(evaluados.sum())} valores no están bien expresados.")
+            st.dataframe(fallas[["nutriente", "valor", "valor_esperado", "motivo"]], hide_index=True)
+        st.button(
+            "Aplicar resultado al ítem",
+            on_click=aplicar_verificacion,
+            args=(titulo, fallas.empty, describir_aproximacion(res_aprox)),
+            key="aprox_aplicar"
+        )
+    else:
+        st.info("Ingrese los valores en la tabla nutricional declarada para evaluarlos.")
+
+    with st.expander("Verificación masiva de aproximación (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Formato largo: columnas `nutriente` y `valor` (una fila por nutriente; `producto` y "
+            "`micronutriente` son opcionales). Formato ancho: una fila por producto, la primera columna "
+            "identifica el producto y cada columna restante es un nutriente. En Excel, guarde los valores "
+            "como texto para conservar los decimales impresos."
+        )
+        archivo_aprox = st.file_uploader(
+            "Archivo de tablas nutricionales",
+            type=["csv", "xlsx"],
+            key="upl_aprox_masivo"
+        )
+        if archivo_aprox is not None:
+            try:
+                res_aprox_masivo = validar_aproximacion(a_formato_largo(leer_tabla(archivo_aprox, como_texto=True)))
+            except ValueError as e:
+                st.error(f"No fue posible evaluar el archivo: {e}")
+            else:
+                fuera = res_aprox_masivo["cumple"].eq(False)
+                st.write(
+                    f"**Valores evaluados:** {int(res_aprox_masivo['cumple'].notna().sum())} — "
+                    f"**mal expresados:** {int(fuera.sum())}"
+                )
+                solo_fallas = st.checkbox("Mostrar solo valores mal expresados", value=True, key="filtro_aprox_masivo")
+                vista_aprox = res_aprox_masivo[fuera] if solo_fallas else res_aprox_masivo
+                st.dataframe(vista_aprox)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=vista_aprox.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="aproximacion_verificacion.csv",
+                    mime="text/csv",
+                    key="dl_aprox_masivo"
                 )
 
-            # -------------------------------
-            # UBICACIÓN (VERIFICACIÓN CUALITATIVA)
-            # -------------------------------
-            with col2:
-                st.markdown("### Ubicación normativa")
-
-                if tipo_envase == "No Cilíndrico":
-                    st.checkbox(
-                        "¿Los o el sello se ubican en el **tercio superior derecho** de la cara principal?",
-                        key="ubicacion_no_cilindrico"
-                    )
-                else:
-                    st.checkbox(
-                        "¿Los o el sello se ubican en el **tercio superior central** del envase?",
-                        key="ubicacion_cilindrico"
-                    )
-
-            st.markdown("---")
-
-            # -------------------------------
-            # TAMAÑO – CÁLCULO NORMATIVO
-            # -------------------------------
-            st.markdown("### Verificación de tamaño del sello")
-
-            cumple = True
-            observaciones = []
-
-            # 🔹 CASO 1: UN SOLO SELLO → TABLA 18
-            if num_sellos == 1:
-
-                lado_min = None
-
-                if area_cara_cm2 < 30:
-                    st.warning("Área < 30 cm² → debe rotular en envase secundario o QR.")
-                    cumple = False
-                elif area_cara_cm2 <= 300:
-                    # Tabla 18
-                    if area_cara_cm2 < 35:
-                        lado_min = 1.7
-                    elif area_cara_cm2 < 40:
-                        lado_min = 1.8
-                    elif area_cara_cm2 < 50:
-                        lado_min = 2.0
-                    elif area_cara_cm2 < 60:
-                        lado_min = 2.2
-                    elif area_cara_cm2 < 80:
-                        lado_min = 2.5
-                    elif area_cara_cm2 < 100:
-                        lado_min = 2.8
-                    elif area_cara_cm2 < 125:
-                        lado_min = 3.1
-                    elif area_cara_cm2 < 150:
-                        lado_min = 3.4
-                    elif area_cara_cm2 < 200:
-                        lado_min = 3.9
-                    elif area_cara_cm2 < 250:
-                        lado_min = 4.4
-                    else:
-                        lado_min = 4.8
-                else:
-                    lado_min = 3.9  # fijo según Res. 2492
-
-                if lado_min:
-                    st.write(f"**Lado mínimo exigido:** {lado_min:.2f} cm")
-                    if lado_real_cm >= lado_min:
-                        st.success("✅ Cumple tamaño del sello (Tabla 18)")
-                    else:
-                        st.error("❌ No cumple tamaño mínimo del sello")
-                        cumple = False
+@cronometrado("herramienta.obligatorios", colector_sesion)
+def herramienta_obligatorios():
+    titulo = "Nutrientes obligatorios declarados"
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Compara la <b>tabla nutricional declarada</b> con los nutrientes obligatorios "
+        "(Res. 810/2021 Art. 8.1.1), aceptando la leyenda «Fuente no significativa de» para los micronutrientes."
+        "</div>",
+        unsafe_allow_html=True
+    )
+    tabla = st.session_state.tabla_declarada
+    if tabla.empty:
+        st.info("Ingrese los valores en la tabla nutricional declarada para evaluarlos.")
+    else:
+        res_obl_tabla = verificar_obligatorios(tabla)
+        res_obl = res_obl_tabla.iloc[0]
+        if res_obl["cumple"]:
+            st.success("✅ Se declaran todos los nutrientes obligatorios.")
+        else:
+            st.error(f"⚠️ Faltan {res_obl['num_faltantes']}: {res_obl['faltantes']}")
+        if res_obl["no_significativos"]:
+            st.caption(f"Declarados como fuente no significativa: {res_obl['no_significativos']}")
+        st.button(
+            "Aplicar resultado al ítem",
+            on_click=aplicar_verificacion,
+            args=(titulo, bool(res_obl["cumple"]), describir_obligatorios(res_obl_tabla)),
+            key="obligatorios_aplicar"
+        )
 
-            # 🔹 CASO 2: DOS O MÁS SELLOS → ADS
+    with st.expander("Verificación masiva de nutrientes y unidades (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Exportación de fichas técnicas en formato largo (`producto`, `nutriente`, `valor`, `unidad`) o "
+            "ancho (una fila por producto, primera columna identificadora y encabezados como `Sodio (mg)`). "
+            "En una sola lectura se evalúan los nutrientes obligatorios por producto y la unidad de cada valor."
+        )
+        archivo_nut = st.file_uploader(
+            "Archivo de tablas nutricionales",
+            type=["csv", "xlsx"],
+            key="upl_nutrientes_masivo"
+        )
+        if archivo_nut is not None:
+            try:
+                tabla_masiva = a_formato_largo(leer_tabla(archivo_nut, como_texto=True))
+                res_obl_masivo = verificar_obligatorios(tabla_masiva)
+                res_uni_masivo = verificar_unidades(tabla_masiva)
+            except ValueError as e:
+                st.error(f"No fue posible evaluar el archivo: {e}")
             else:
-                if area_cara_cm2 <= 300:
-                    ADS = 0.65 * area_cara_cm2
-                    area_sello = lado_real_cm ** 2
-                    area_total_sellos = area_sello * num_sellos
+                uni_fallas = res_uni_masivo[res_uni_masivo["cumple"].eq(False)]
+                st.write(
+                    f"**Productos evaluados:** {len(res_obl_masivo)} — "
+                    f"**con nutrientes obligatorios faltantes:** {int((~res_obl_masivo['cumple']).sum())} — "
+                    f"**valores con unidad faltante o incorrecta:** {len(uni_fallas)}"
+                )
+                st.dataframe(res_obl_masivo)
+                st.download_button(
+                    "Descargar nutrientes obligatorios (CSV)",
+                    data=res_obl_masivo.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="nutrientes_obligatorios.csv",
+                    mime="text/csv",
+                    key="dl_obligatorios_masivo"
+                )
+                st.dataframe(uni_fallas)
+                st.download_button(
+                    "Descargar unidades (CSV)",
+                    data=res_uni_masivo.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="unidades_verificacion.csv",
+                    mime="text/csv",
+                    key="dl_unidades_masivo"
+                )
 
-                    st.write(f"Área disponible para sellos (ADS): {ADS:.2f} cm²")
-                    st.write(f"Área total ocupada por sellos: {area_total_sellos:.2f} cm²")
+@cronometrado("herramienta.unidades", colector_sesion)
+def herramienta_unidades():
+    titulo = "Unidades específicas por nutriente"
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Verifica la unidad de cada nutriente de la <b>tabla nutricional declarada</b>."
+        "</div>",
+        unsafe_allow_html=True
+    )
+    res_uni = verificar_unidades(st.session_state.tabla_declarada)
+    evaluados = res_uni["cumple"].notna()
+    if not evaluados.any():
+        st.info("Ingrese los valores en la tabla nutricional declarada para evaluarlos.")
+        return
+    fallas = res_uni[res_uni["cumple"].eq(False)]
+    if fallas.empty:
+        st.success(f"✅ Las unidades de los {int(evaluados.sum())} nutrientes son correctas.")
+    else:
+        st.error(f"⚠️ {len(fallas)} de {int(evaluados.sum())} nutrientes con unidad faltante, incorrecta o repetida.")
+        st.dataframe(fallas[["nutriente", "unidad_declarada", "unidades_admitidas", "estado_unidad"]], hide_index=True)
+    no_esquema = res_uni[res_uni["estado_unidad"] == "no incluido en el esquema"]
+    if not no_esquema.empty:
+        st.caption("No incluidos en el esquema (revisar manualmente): " + ", ".join(no_esquema["nutriente"].astype(str)))
+    st.button(
+        "Aplicar resultado al ítem",
+        on_click=aplicar_verificacion,
+        args=(titulo, fallas.empty, describir_unidades(res_uni)),
+        key="unidades_aplicar"
+    )
 
-                    if area_total_sellos <= ADS:
-                        st.success("✅ Cumple criterio de área disponible (ADS 65%)")
-                    else:
-                        st.error("❌ No cumple: los sellos exceden el ADS permitido")
-                        cumple = False
+@cronometrado("herramienta.bromatologico", colector_sesion)
+def herramienta_bromatologico():
+    titulo = "Consistencia con análisis bromatológico (±20%)"
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Compara la <b>tabla nutricional declarada</b> con el informe del laboratorio "
+        "acreditado. Si las unidades difieren (g / mg / µg, kcal / kJ) se convierten antes de comparar."
+        "</div>",
+        unsafe_allow_html=True
+    )
+    if "lab_base" not in st.session_state:
+        st.session_state.lab_base = pd.DataFrame({
+            "nutriente": NUTRIENTES_TABLA,
+            "valor": [""] * len(NUTRIENTES_TABLA),
+            "unidad": [""] * len(NUTRIENTES_TABLA),
+        })
+    laboratorio = st.data_editor(
+        st.session_state.lab_base,
+        num_rows="dynamic",
+        column_config={
+            "nutriente": st.column_config.TextColumn("Nutriente"),
+            "valor": st.column_config.TextColumn("Resultado de laboratorio"),
+            "unidad": st.column_config.TextColumn("Unidad"),
+        },
+        key="lab_tabla"
+    )
+    res_bro = consistencia_bromatologica(st.session_state.tabla_declarada, laboratorio)
+    evaluados = res_bro["cumple"].notna()
+    if evaluados.any():
+        fallas = res_bro[res_bro["cumple"].eq(False)]
+        tolerancia = NORMATIVA.vigente()["bromatologico"]["tolerancia_pct"]
+        if fallas.empty:
+            st.success(f"✅ Los {int(evaluados.sum())} nutrientes comparados están dentro de ±{tolerancia:g}%.")
+        else:
+            st.error(f"⚠️ {len(fallas)} de {int(evaluados.sum())} nutrientes fuera de ±{tolerancia:g}%.")
+        ilegibles = res_bro[res_bro["estado"].eq("valor ilegible")]
+        if not ilegibles.empty:
+            st.warning(f"Valor ilegible (no se comparó): {', '.join(ilegibles['nutriente'])}")
+        st.dataframe(
+            res_bro[evaluados | res_bro["estado"].isin(["unidades incompatibles", "valor ilegible"])]
+            .drop(columns=["producto", "clave"]),
+            hide_index=True
+        )
+        st.button(
+            "Aplicar resultado al ítem",
+            on_click=aplicar_verificacion,
+            args=(titulo, fallas.empty, describir_bromatologico(res_bro)),
+            key="bromatologico_aplicar"
+        )
+    else:
+        st.info("Ingrese la tabla nutricional declarada y los resultados de laboratorio para compararlos.")
+
+    with st.expander("Verificación masiva contra laboratorio (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Cargue dos archivos con las columnas `sku` (o `producto`), `nutriente`, `valor` y, opcionalmente, "
+            "`unidad`: los valores declarados en la etiqueta y los resultados del laboratorio. También se "
+            "aceptan en formato ancho (una fila por SKU, encabezados como `Sodio (mg)`)."
+        )
+        col_d, col_l = st.columns(2)
+        with col_d:
+            archivo_decl = st.file_uploader("Valores declarados", type=["csv", "xlsx"], key="upl_bro_declarado")
+        with col_l:
+            archivo_lab = st.file_uploader("Resultados de laboratorio", type=["csv", "xlsx"], key="upl_bro_laboratorio")
+        if archivo_decl is not None and archivo_lab is not None:
+            try:
+                res_bro_masivo = consistencia_bromatologica(
+                    a_formato_largo(leer_tabla(archivo_decl, como_texto=True)),
+                    a_formato_largo(leer_tabla(archivo_lab, como_texto=True)),
+                )
+            except ValueError as e:
+                st.error(f"No fue posible evaluar los archivos: {e}")
+            else:
+                fuera = res_bro_masivo["cumple"].eq(False)
+                st.write(
+                    f"**Productos:** {res_bro_masivo['producto'].nunique()} — "
+                    f"**nutrientes comparados:** {int(res_bro_masivo['cumple'].notna().sum())} — "
+                    f"**fuera de tolerancia:** {int(fuera.sum())} — "
+                    f"**productos con alguna falla:** {res_bro_masivo.loc[fuera, 'producto'].nunique()}"
+                )
+                solo_fallas = st.checkbox("Mostrar solo nutrientes fuera de tolerancia", value=True, key="filtro_bro_masivo")
+                vista_bro = res_bro_masivo[fuera] if solo_fallas else res_bro_masivo
+                st.dataframe(vista_bro)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=vista_bro.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="bromatologico_verificacion.csv",
+                    mime="text/csv",
+                    key="dl_bro_masivo"
+                )
 
-                else:
-                    st.write("Área > 300 cm² → cada sello debe medir **3,9 × 3,9 cm**")
-                    if lado_real_cm >= 3.9:
-                        st.success("✅ Cumple tamaño fijo para múltiples sellos")
-                    else:
-                        st.error("❌ No cumple tamaño fijo (3,9 cm)")
-                        cumple = False
-
-            # -------------------------------
-            # RESULTADO FINAL
-            # -------------------------------
-            st.markdown("---")
-            if cumple:
-                st.success("✅ Cumple con ubicación, distribución y tamaño de sellos")
+@cronometrado("herramienta.porciones", colector_sesion)
+def herramienta_porciones():
+    titulo = "Declaración de porciones"
+    st.markdown(
+        "<div style='background:#e6f0ff;padding:10px;border-radius:8px;'>"
+        "<b>Herramienta:</b> Porciones por envase = contenido neto / tamaño de porción, y equivalencia "
+        "de la medida casera (1 oz ≈ 28 g, 1 taza ≈ 240 mL, 1 cucharada ≈ 15 mL)."
+        "</div>",
+        unsafe_allow_html=True
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        contenido = st.text_input(COLUMNAS_PORCIONES["contenido_neto"], value="150 g", key="porc_neto")
+        porcion = st.text_input(COLUMNAS_PORCIONES["porcion"], value="30 g", key="porc_porcion")
+        declaradas = st.text_input(COLUMNAS_PORCIONES["porciones_declaradas"], value="5", key="porc_declaradas")
+        medida = st.text_input("Medida casera (opcional)", value="1 oz", key="porc_medida")
+        redondeo = st.selectbox(
+            "Redondeo del número de porciones",
+            list(REDONDEO_PORCIONES),
+            format_func=lambda r: {"entero": "Entero", "medio": "Media porción", "decimal": "Un decimal"}[r],
+            key="porc_redondeo"
+        )
+    res_porc_tabla = verificar_porciones(pd.DataFrame([{
+        "contenido_neto": contenido,
+        "porcion": porcion,
+        "porciones_declaradas": declaradas,
+        "medida_casera": medida,
+    }]), redondeo)
+    res_porc = res_porc_tabla.iloc[0]
+    with col2:
+        if pd.isna(res_porc["cumple_porciones"]):
+            st.info(res_porc["motivo"] or "Ingrese el número de porciones declarado.")
+        else:
+            st.write(
+                f"**Porciones calculadas:** {res_porc['porciones_calculadas']:.2f} "
+                f"→ **{res_porc['porciones_redondeadas']:g}** ({redondeo})"
+            )
+            if res_porc["cumple_porciones"]:
+                st.success("✅ El número de porciones por envase coincide con el contenido neto.")
             else:
-                st.error("❌ No cumple con uno o más criterios normativos")
+                st.error(f"⚠️ Se declaran {declaradas} porciones; corresponden {res_porc['porciones_redondeadas']:g}.")
+        if not pd.isna(res_porc["cumple_medida_casera"]):
+            texto = (f"Medida casera ≈ {res_porc['medida_casera_equivalente']:g} "
+                     f"({res_porc['desviacion_medida_pct']:+.0f}% frente a la porción)")
+            (st.success if res_porc["cumple_medida_casera"] else st.error)(texto)
+        elif res_porc["porcion_sin_unidad"]:
+            st.warning("Unidad no declarada en la porción: la medida casera no se puede comparar (p. ej. «30 g» en vez de «30»).")
+        elif medida.strip():
+            st.caption("La medida casera no se reconoce o no es comparable con la porción (p. ej. unidades o volumen frente a masa).")
+        if not pd.isna(res_porc["cumple"]):
+            st.button(
+                "Aplicar resultado al ítem",
+                on_click=aplicar_verificacion,
+                args=(titulo, bool(res_porc["cumple"]), describir_porciones(res_porc_tabla)),
+                key="porciones_aplicar"
+            )
 
-        # ------------------------------------------------------------
-        # OBSERVACIÓN (APLICA A TODOS LOS ÍTEMS)
-        # ------------------------------------------------------------
-        nota = st.text_area(
-            "Observación (opcional)",
-            value=st.session_state.note_810.get(titulo, ""),
-            key=f"obs_{hash(titulo)}"
+    with st.expander("Verificación masiva de porciones (CSV / Excel)", expanded=False):
+        st.markdown(
+            "Una fila por producto con las columnas "
+            + ", ".join(f"`{c}`" for c in COLUMNAS_PORCIONES)
+            + " (con unidad, p. ej. `150 g` o `1 L`) y, opcionalmente, `producto` y `medida_casera`. "
+            "Se aplica el redondeo elegido arriba."
+        )
+        archivo_porc = st.file_uploader(
+            "Archivo de porciones",
+            type=["csv", "xlsx"],
+            key="upl_porciones_masivo"
         )
+        if archivo_porc is not None:
+            try:
+                res_porc_masivo = verificar_porciones(leer_tabla(archivo_porc, como_texto=True), redondeo)
+            except ValueError as e:
+                st.error(f"No fue posible evaluar el archivo: {e}")
+            else:
+                fuera = res_porc_masivo["cumple"].eq(False)
+                st.write(
+                    f"**Productos evaluados:** {int(res_porc_masivo['cumple'].notna().sum())} — "
+                    f"**con porciones o medida casera inconsistentes:** {int(fuera.sum())}"
+                )
+                solo_fallas = st.checkbox("Mostrar solo inconsistentes", value=True, key="filtro_porc_masivo")
+                vista_porc = res_porc_masivo[fuera] if solo_fallas else res_porc_masivo
+                st.dataframe(vista_porc)
+                st.download_button(
+                    "Descargar resultados (CSV)",
+                    data=vista_porc.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="porciones_verificacion.csv",
+                    mime="text/csv",
+                    key="dl_porc_masivo"
+                )
+
+HERRAMIENTAS_ANTES = {
+    "Verificación de calorías declaradas (±20% tolerancia)": herramienta_calorias,
+    "Determinación de aplicabilidad de sellos": herramienta_sellos,
+    "Nutrientes obligatorios declarados": herramienta_obligatorios,
+    "Aproximación y expresión de valores nutricionales": herramienta_aproximacion,
+    "Unidades específicas por nutriente": herramienta_unidades,
+    "Consistencia con análisis bromatológico (±20%)": herramienta_bromatologico,
+    "Declaración de porciones": herramienta_porciones,
+}
+HERRAMIENTAS_DESPUES = {
+    "Ubicación, distribución y tamaño de sellos (Tabla 17)": herramienta_tamano_sellos,
+}
+
+@fragmento
+@cronometrado("item", colector_sesion)
+def render_item(titulo: str, que_verificar: str, referencia: str):
+    st.markdown(f"### {titulo}")
+    st.markdown(f"**Qué verificar:** {que_verificar}")
+    st.markdown(f"**Referencia normativa:** {referencia}")
+    st.markdown(f"**Aplica a:** {APLICA.get(titulo, 'Producto terminado')}")
+
+    if titulo == "Formato, tipografía y jerarquía visual de la tabla nutricional":
+
+       with st.expander("Desglose técnico — Formato y tipografía de la tabla nutricional", expanded=False):
+
+           checklist_formato = [
+               "La tabla nutricional utiliza tipografía Arial o Helvetica y su texto es de color negro sobre fondo contrastante",
+               "Título declarado como “Información Nutricional”, “Datos de Nutrición” o “Información Nutrimental” y tiene un tamaño mínimo de 10 pt",
+               "Los nombres de calorías, grasa saturada, grasas trans, azúcares añadidos y sodio están en negrilla, tienen un tamaño de letra ≥ 1,3 veces el del resto de nutrientes",
+               "Las grasas y carhohidratos totales están alineados a la izquierda, mientras que sus componentes (como grasas saturadas, grasas trans, fibra dietaria y azúcares) deben ir un poco más hacia la derecha. Los azúcares añadidos deben ir aún más desplazados, mostrando que hacen parte de los azúcares totales.",
+               "La tabla conserva márgenes, proporciones y estructura, no se incluyen imágenes, logotipos o elementos gráficos dentro del recuadro ",
+           ]
+
+           for item in checklist_formato:
+               st.checkbox(
+                   item,
+                   key=f"tn_formato_{item}"
+               )
+
+    # Botonera de estado (callbacks: actualizan estado y contadores antes de pintar)
+    c1, c2, c3, _ = st.columns([0.12, 0.12, 0.12, 0.64])
+    with c1:
+        st.button("✅ Cumple", key=f"{titulo}_yes", on_click=cambiar_estado, args=(titulo, "yes"))
+    with c2:
+        st.button("❌ No cumple", key=f"{titulo}_no", on_click=cambiar_estado, args=(titulo, "no"))
+    with c3:
+        st.button("⚪ No aplica", key=f"{titulo}_na", on_click=cambiar_estado, args=(titulo, "na"))
+
+    # Estado visual
+    estado = st.session_state.status_810[titulo]
+    if estado == "yes":
+        st.markdown("<div style='background:#e6ffed;padding:6px;border-radius:5px;'>✅ Cumple</div>", unsafe_allow_html=True)
+    elif estado == "no":
+        st.markdown("<div style='background:#ffe6e6;padding:6px;border-radius:5px;'>❌ No cumple</div>", unsafe_allow_html=True)
+    elif estado == "na":
+        st.markdown("<div style='background:#f2f2f2;padding:6px;border-radius:5px;'>⚪ No aplica</div>", unsafe_allow_html=True)
+    else:
+        st.markdown("<div style='background:#fff;padding:6px;border-radius:5px;'>Sin responder</div>", unsafe_allow_html=True)
+
+    # Herramientas integradas (cuadros azul #e6f0ff)
+    if titulo in HERRAMIENTAS_ANTES:
+        HERRAMIENTAS_ANTES[titulo]()
+
+    st.markdown("---")
+
+    if titulo in HERRAMIENTAS_DESPUES:
+        HERRAMIENTAS_DESPUES[titulo]()
+
+    # ------------------------------------------------------------
+    # OBSERVACIÓN (APLICA A TODOS LOS ÍTEMS)
+    # ------------------------------------------------------------
+    clave_obs = f"obs_{ID_ITEM[titulo]}"
+    if clave_obs not in st.session_state:
+        st.session_state[clave_obs] = st.session_state.note_810.get(titulo, "")
+    nota = st.text_area(
+        "Observación (opcional)",
+        key=clave_obs
+    )
+    if nota != st.session_state.note_810.get(titulo, ""):
         st.session_state.note_810[titulo] = nota
+        db.guardar_resultado(auditoria_actual(), titulo, nota=nota)
 
 
-        # ------------------------------------------------------------
-        # EVIDENCIA FOTOGRÁFICA (SOLO SI NO CUMPLE)
-        # ------------------------------------------------------------
-        if st.session_state.status_810[titulo] == "no":
+    # ------------------------------------------------------------
+    # EVIDENCIA FOTOGRÁFICA (SOLO SI NO CUMPLE)
+    # ------------------------------------------------------------
+    if st.session_state.status_810[titulo] == "no":
 
-            st.markdown("**Adjuntar evidencia fotográfica (JPG / PNG):**")
+        st.markdown("**Adjuntar evidencia fotográfica (JPG / PNG):**")
 
-            files = st.file_uploader(
-                "Subir imágenes",
-                type=["jpg", "jpeg", "png"],
-                accept_multiple_files=True,
-                key=f"upl_{hash(titulo)}"
-            )
+        files = st.file_uploader(
+            "Subir imágenes",
+            type=["jpg", "jpeg", "png"],
+            accept_multiple_files=True,
+            key=f"upl_{ID_ITEM[titulo]}"
+        )
 
-            if files:
-                caption = st.text_input(
-                    "Descripción breve de la evidencia (opcional)",
-                    key=f"cap_{hash(titulo)}"
-                )
+        if files:
+            caption = st.text_input(
+                "Descripción breve de la evidencia (opcional)",
+                key=f"cap_{ID_ITEM[titulo]}"
+            )
 
-                if st.button("Agregar evidencia", key=f"btn_{hash(titulo)}"):
-                    for f in files:
-                        st.session_state.evidence_810[titulo].append({
-                            "name": f.name,
-                            "base64": base64.b64encode(f.read()).decode("utf-8"),
-                            "caption": caption or ""
-                        })
-                    st.success(f"Se agregaron {len(files)} imagen(es).")
-
-            ev_list = st.session_state.evidence_810.get(titulo, [])
-            if ev_list:
+            if st.button("Agregar evidencia", key=f"btn_{ID_ITEM[titulo]}"):
+                # Validación, hash y miniaturas en paralelo; aquí solo progreso y registro
+                progreso = st.progress(0.0, text=f"Procesando 0/{len(files)} imagen(es)…")
+                aceptadas, errores = {}, []
+                with tramo("evidencia.ingesta", colector_sesion(), detalle=titulo, imagenes=len(files)):
+                    for n, (i, nombre, ref, error) in enumerate(
+                        almacen.ingerir_en_paralelo((f.name, f.getvalue()) for f in files), start=1
+                    ):
+                        if error:
+                            errores.append((nombre, error))
+                        else:
+                            aceptadas[i] = ref
+                        progreso.progress(n / len(files), text=f"Procesando {n}/{len(files)} imagen(es)…")
+                progreso.empty()
+                for i in sorted(aceptadas):
+                    ev = {**aceptadas[i], "caption": caption or ""}
+                    st.session_state.evidence_810[titulo].append(ev)
+                    db.agregar_evidencia(auditoria_actual(), titulo, ev)
+                if aceptadas:
+                    st.success(f"Se agregaron {len(aceptadas)} imagen(es).")
+                for nombre, error in errores:
+                    st.error(f"{nombre}: {error}")
+
+        ev_list = st.session_state.evidence_810.get(titulo, [])
+        if ev_list:
+            with tramo("galeria", colector_sesion(), detalle=titulo, imagenes=len(ev_list)):
                 st.markdown("**Evidencia cargada:**")
                 cols = st.columns(4)
                 for idx, ev in enumerate(ev_list):
-                    img_bytes = base64.b64decode(ev["base64"])
                     with cols[idx % 4]:
                         st.image(
-                            img_bytes,
+                            almacen.derivado(ev["sha256"], "miniatura"),
                             caption=ev["caption"] or ev["name"],
                             use_column_width=True
                         )
+                        if st.button("Quitar", key=f"rm_{ID_ITEM[titulo]}_{idx}"):
+                            quitada = ev_list.pop(idx)
+                            almacen.liberar(quitada["sha256"])
+                            db.quitar_evidencia(auditoria_actual(), titulo, quitada["sha256"])
+                            st.rerun(scope="fragment")
 
-        st.markdown("---")
+    st.markdown("---")
 
-        
+for categoria, items in CATEGORIAS.items():
+    st.subheader(categoria)
+    for (titulo, que_verificar, referencia) in items:
+        if solo_no and st.session_state.status_810.get(titulo, "none") != "no":
+            continue
+        render_item(titulo, que_verificar, referencia)
 
 # ------------------------------------------------------------
 # MÉTRICAS
 # ------------------------------------------------------------
-yes_count = sum(1 for v in st.session_state.status_810.values() if v == "yes")
-no_count = sum(1 for v in st.session_state.status_810.values() if v == "no")
-answered_count = yes_count + no_count
-percent = round((yes_count / answered_count * 100), 1) if answered_count > 0 else 0.0
-st.metric("Cumplimiento total (sobre ítems contestados)", f"{percent}%")
-st.write(
-    f"CUMPLE: {yes_count} — NO CUMPLE: {no_count} — "
-    f"NO APLICA: {sum(1 for v in st.session_state.status_810.values() if v == 'na')} — "
-    f"SIN RESPONDER: {sum(1 for v in st.session_state.status_810.values() if v == 'none')}"
-)
+# Sin refresco periódico: se pintan en un marcador fijo al final de cada rerun
+# completo y, tras un cambio de estado, desde el fragmento que lo hizo (los
+# contadores se mantienen en cambiar_estado, costo O(1)).
+@cronometrado("metricas", colector_sesion)
+def pintar_metricas():
+    st.session_state.metricas_pendientes = False
+    conteo = st.session_state.conteo_810
+    yes_count = conteo["yes"]
+    no_count = conteo["no"]
+    answered_count = yes_count + no_count
+    percent = round((yes_count / answered_count * 100), 1) if answered_count > 0 else 0.0
+    with marcador_metricas.container():
+        st.metric("Cumplimiento total (sobre ítems contestados)", f"{percent}%")
+        st.write(
+            f"CUMPLE: {yes_count} — NO CUMPLE: {no_count} — "
+            f"NO APLICA: {conteo['na']} — "
+            f"SIN RESPONDER: {conteo['none']}"
+        )
+
+marcador_metricas = st.empty()
+pintar_metricas()
 
 # ------------------------------------------------------------
-# PDF (A4 horizontal) — incluye referencias y evidencias (página nueva)
+# INFORME PDF — registro plano y caché por huella
 # ------------------------------------------------------------
-def split_observation_text_pdf(text: str, chunk: int = 100) -> str:
-    if not text:
-        return ""
-    s = str(text)
-    if len(s) <= chunk:
-        return s
-    parts = [s[i:i+chunk] for i in range(0, len(s), chunk)]
-    return "\\n".join(parts)
-
-def generar_pdf():
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf,
-        pagesize=landscape(A4),
-        leftMargin=8*mm, rightMargin=8*mm,
-        topMargin=8*mm, bottomMargin=8*mm
-    )
-    styles = getSampleStyleSheet()
-    style_header = ParagraphStyle("header", parent=styles["Normal"], fontSize=9, leading=11)
-    style_cell   = ParagraphStyle("cell",   parent=styles["Normal"], fontSize=8, leading=10)
-
-    story = []
-    fecha_str = datetime.now().strftime("%Y-%m-%d")
-    inv_str = invima_registro or "-"
-    inv_estado = "ACTIVO y coincidente" if invima_estado_activo else "No verificado / No activo / No coincide"
-    portada = (
-        f"<b>Informe de verificación — Resoluciones 810/2021, 2492/2022 y 254/2023</b><br/>"
-        f"<b>Fecha:</b> {fecha_str} &nbsp;&nbsp; "
-        f"<b>Producto:</b> {producto or '-'} &nbsp;&nbsp; "
-        f"<b>Proveedor:</b> {proveedor or '-'} &nbsp;&nbsp; "
-        f"<b>Responsable:</b> {responsable or '-'} &nbsp;&nbsp; "
-        f"<b>Registro INVIMA:</b> {inv_str} &nbsp;&nbsp; <b>Estado en portal:</b> {inv_estado}"
-    )
-    if invima_url.strip():
-        portada += f" &nbsp;&nbsp; <b>Consulta:</b> {invima_url}"
-    story.append(Paragraph(portada, style_header))
-    story.append(Spacer(1, 3*mm))
-    intro_pdf = (
-        "Este checklist se basa exclusivamente en las Resoluciones 810 de 2021, 2492 de 2022 y 254 de 2023, "
-        "que establecen los requisitos técnicos para el etiquetado nutricional y frontal de advertencia en alimentos "
-        "y bebidas envasadas destinados al consumo humano en Colombia."
-    )
-    story.append(Paragraph(intro_pdf, style_header))
-    story.append(Spacer(1, 5*mm))
-
-    yes_c = sum(1 for v in st.session_state.status_810.values() if v == "yes")
-    no_c = sum(1 for v in st.session_state.status_810.values() if v == "no")
-    ans_c = yes_c + no_c
-    pct = round((yes_c / ans_c * 100), 1) if ans_c > 0 else 0.0
-    story.append(Paragraph(f"<b>Cumplimiento (sobre ítems contestados):</b> {pct}%", style_header))
-    story.append(Spacer(1, 4*mm))
-
-    if solo_no:
-        hay_no = any(v == "no" for v in st.session_state.status_810.values())
-        if not hay_no:
-            story.append(Paragraph(
-                "<b>No se registran ítems en estado NO CUMPLE.</b>",
-                style_header
-            ))
-            doc.build(story)
-            buf.seek(0)
-            return buf
-
-    # Tabla principal (Ítem, Estado, Observación, Referencia)
-    data = [["Ítem", "Estado", "Observación", "Referencia"]]
-    for items in CATEGORIAS.values():
-        for (titulo, _, referencia) in items:
-            estado_val = st.session_state.status_810.get(titulo, "none")
-
-            if solo_no and estado_val != "no":
-                continue
-                
-            estado_humano = (
-                "Cumple" if estado_val == "yes"
-                else "No cumple" if estado_val == "no"
-                else "No aplica" if estado_val == "na"
-                else "Sin responder"
-            )
-            obs = st.session_state.note_810.get(titulo, "") or "-"
-            if obs != "-":
-                obs = split_observation_text_pdf(obs, chunk=100)
-                obs = escape(obs)  # 👈 FIX CLAVE
-                
-            data.append([
-                Paragraph(escape(str(titulo)),        style_cell),
-                Paragraph(escape(str(estado_humano)), style_cell),
-                Paragraph(obs,                        style_cell),
-                Paragraph(escape(str(referencia)),    style_cell),
-            ])
-
-
-    col_widths = [100*mm, 25*mm, 85*mm, 55*mm]
-    tbl = Table(data, colWidths=col_widths, repeatRows=1)
-    tbl.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#f2f2f2")),
-        ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
-        ("FONTSIZE",   (0,0), (-1,0), 9),
-        ("GRID",       (0,0), (-1,-1), 0.25, colors.grey),
-        ("VALIGN",     (0,0), (-1,-1), "TOP"),
-        ("LEFTPADDING",(0,0), (-1,-1), 3),
-        ("RIGHTPADDING",(0,0), (-1,-1), 3),
-    ]))
-    story.append(tbl)
-
-    # Página nueva para evidencias — FIX definitivo: BytesIO directo en RLPlatypusImage
-    any_ev = any(len(v) > 0 for v in st.session_state.evidence_810.values())
-    if any_ev:
-        story.append(PageBreak())
-        story.append(Paragraph("<b>Evidencia fotográfica</b>", style_header))
-        story.append(Spacer(1, 3*mm))
-
-        for titulo, ev_list in st.session_state.evidence_810.items():
-            if not ev_list:
-                continue
-            story.append(Paragraph(f"<b>Ítem:</b> {titulo}", style_header))
-            story.append(Paragraph("<b>Evidencia de incumplimiento:</b>", style_header))
-            story.append(Spacer(1, 2*mm))
-            for idx, ev in enumerate(ev_list):
-                try:
-                    img_bytes = base64.b64decode(ev["base64"])
-                    # 👇 FIX: pasar BytesIO(img_bytes) directo a Image (no usar ImageReader)
-                    story.append(RLPlatypusImage(BytesIO(img_bytes), width=85*mm, height=55*mm))
-                    if ev.get("caption"):
-                        story.append(Paragraph(ev["caption"], style_cell))
-                    story.append(Spacer(1, 3*mm))
-                except Exception as e:
-                    story.append(Paragraph(f"<i>⚠️ Error al cargar imagen {ev.get('name', '')}: {e}</i>", style_cell))
-            story.append(Spacer(1, 5*mm))
-
-    doc.build(story)
-    buf.seek(0)
-    return buf
+# Registro plano de la auditoría: todo lo que entra al PDF y nada más
+def registro_auditoria() -> dict:
+    return {
+        "producto": producto,
+        "proveedor": proveedor,
+        "responsable": responsable,
+        "invima_registro": invima_registro,
+        "invima_estado_activo": invima_estado_activo,
+        "invima_url": invima_url,
+        "fecha": datetime.now().strftime("%Y-%m-%d"),
+        "solo_no": solo_no,
+        "status": dict(st.session_state.status_810),
+        "notas": dict(st.session_state.note_810),
+        "evidencia": {t: [dict(ev) for ev in evs] for t, evs in st.session_state.evidence_810.items()},
+    }
+
+# Caché acotada de informes por huella del registro: repetir la descarga sin cambios
+# no reconstruye el PDF. La huella incluye la fecha, así que cambia al día siguiente.
+PDF_CACHE_ENTRADAS = int(os.environ.get("PDF_CACHE_ENTRADAS", "32"))
+
+@st.cache_data(max_entries=PDF_CACHE_ENTRADAS, show_spinner="Generando PDF…")
+def pdf_en_cache(huella: str, _registro: dict) -> bytes:
+    return generar_pdf(_registro, almacen).getvalue()
 
 # ------------------------------------------------------------
 # EXPORTAR PDF
 # ------------------------------------------------------------
 st.subheader("Generar informe PDF (A4 horizontal)")
 if st.button("Generar PDF"):
-    pdf_buffer = generar_pdf()
+    registro = registro_auditoria()
+    colector = colector_sesion()
+    with recolectar(colector) if colector is not None else nullcontext(), tramo("pdf.total", colector):
+        pdf_buffer = pdf_en_cache(huella_auditoria(registro), registro)
     file_name = (nombre_pdf.strip() or f"informe_810_2492_{datetime.now().strftime('%Y%m%d')}") + ".pdf"
     st.download_button(
         "Descargar PDF",
@@ -732,3 +1663,64 @@ if st.button("Generar PDF"):
         file_name=file_name,
         mime="application/pdf"
     )
+
+# ------------------------------------------------------------
+# GUARDAR AUDITORÍA (JSON) — insumo de `python -m etiquetado.lote_informes`
+# ------------------------------------------------------------
+st.download_button(
+    "Descargar auditoría (JSON)",
+    data=json.dumps(registro_auditoria(), ensure_ascii=False, indent=2).encode("utf-8"),
+    file_name=(nombre_pdf.strip() or f"informe_810_2492_{datetime.now().strftime('%Y%m%d')}") + ".json",
+    mime="application/json"
+)
+
+# ------------------------------------------------------------
+# INSTANTÁNEA (.zip) — para retomar la auditoría o entregarla a un colega
+# ------------------------------------------------------------
+if st.button("Preparar instantánea (.zip)"):
+    with tramo("instantanea.exportar", colector_sesion()), tempfile.TemporaryFile() as zip_tmp:
+        fecha_original = (
+            db.cargar_auditoria(st.session_state.auditoria_id)["fecha_auditoria"]
+            if st.session_state.get("auditoria_id") is not None else None
+        )
+        exportar_instantanea(zip_tmp, registro_auditoria(), entradas_actuales(), almacen, fecha_auditoria=fecha_original)
+        zip_tmp.seek(0)
+        st.download_button(
+            "Descargar instantánea",
+            data=zip_tmp.read(),
+            file_name=(nombre_pdf.strip() or f"informe_810_2492_{datetime.now().strftime('%Y%m%d')}") + ".zip",
+            mime="application/zip"
+        )
+
+# ------------------------------------------------------------
+# PANEL DE DIAGNÓSTICO (opcional)
+# ------------------------------------------------------------
+if diagnostico:
+    trazas = st.session_state.trazas_810
+    trazas.append({"tramo": "rerun", "ms": round((time.perf_counter() - INICIO_RERUN) * 1000, 3)})
+    with st.sidebar.expander("Diagnóstico", expanded=True):
+        df_trazas = pd.DataFrame(list(trazas))
+        resumen = (
+            df_trazas.groupby("tramo")["ms"]
+            .agg(llamadas="count", p50_ms="median", max_ms="max", ultimo_ms="last")
+            .sort_values("p50_ms", ascending=False)
+        )
+        st.markdown("**Tiempos por sección (ms)**")
+        st.dataframe(resumen.round(2))
+        if "detalle" in df_trazas:
+            st.markdown("**Ítems más lentos (último render)**")
+            st.dataframe(
+                df_trazas[df_trazas["tramo"] == "item"].groupby("detalle")["ms"].last()
+                .sort_values(ascending=False).head(5).round(2)
+            )
+        tamanos = estimar_bytes_sesion(st.session_state)
+        st.markdown(f"**Estado de sesión:** {sum(tamanos.values()) / 1024:.1f} KB (aprox.)")
+        st.dataframe(
+            pd.Series(tamanos, name="bytes").sort_values(ascending=False).head(8)
+        )
+        bytes_evidencia = sum(ev.get("size", 0) for evs in st.session_state.evidence_810.values() for ev in evs)
+        st.caption(f"Evidencia referenciada (en disco, fuera de la sesión): {bytes_evidencia / 1024 / 1024:.1f} MB")
+        if st.button("Limpiar tramos", key="btn_limpiar_trazas"):
+            trazas.clear()
+
+sincronizar_estado()
@@ -0,0 +1,232 @@
+# ------------------------------------------------------------
+# BENCHMARKS — motores de reglas, índice Tabla 17/18, PDF y rerun completo
+#
+#   python benchmarks/bench_etiquetado.py                    # suite completa
+#   python benchmarks/bench_etiquetado.py --rapido           # tamaños reducidos
+#   python benchmarks/bench_etiquetado.py --solo reglas,pdf  # solo algunos grupos
+#   python benchmarks/bench_etiquetado.py --salida bench.json
+#
+# Cada caso reporta latencia (p50/p90/p99/mín/máx en ms), throughput
+# (filas o elementos por segundo) y pico de memoria (tracemalloc).
+# El JSON incluye entorno y commit para comparar corridas.
+# ------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from io import BytesIO
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# La suite nunca escribe en la base, la evidencia ni los espacios del operador: todas
+# las rutas van a un directorio temporal, fijadas antes de importar `etiquetado`
+# (sus módulos leen las variables al importarse) y sin respetar valores previos.
+TMP_BENCH = tempfile.mkdtemp(prefix="bench_etiquetado_")
+for variable, nombre in (
+    ("AUDITORIAS_DB", "auditorias.db"), ("EVIDENCIA_DIR", "evidencia"),
+    ("ESPACIO_DIR", "espacios"), ("INSTANTANEAS_DIR", "instantaneas"),
+):
+    os.environ[variable] = os.path.join(TMP_BENCH, nombre)
+os.environ["ESTADO_BACKEND"] = "memoria"
+
+import numpy as np
+import pandas as pd
+
+from etiquetado.checklist import CATEGORIAS
+from etiquetado.reglas import determinar_sellos, verificar_calorias, evaluar_tamano_sellos
+from etiquetado.evidencia import AlmacenEvidencia
+from etiquetado.informe import generar_pdf
+
+# ---------------- medición ----------------
+def _percentil(muestras: list, p: float) -> float:
+    return float(np.percentile(np.asarray(muestras), p))
+
+def medir(nombre: str, fn, repeticiones: int, unidades: int = 1, calentamiento: int = 1) -> dict:
+    for _ in range(calentamiento):
+        fn()
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    # Pico de memoria en una corrida aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ms = [t * 1000 for t in tiempos]
+    mediana = _percentil(tiempos, 50)
+    resultado = {
+        "caso": nombre,
+        "repeticiones": repeticiones,
+        "unidades": unidades,
+        "p50_ms": round(_percentil(ms, 50), 4),
+        "p90_ms": round(_percentil(ms, 90), 4),
+        "p99_ms": round(_percentil(ms, 99), 4),
+        "min_ms": round(min(ms), 4),
+        "max_ms": round(max(ms), 4),
+        "throughput_por_s": round(unidades / mediana, 1) if mediana > 0 else None,
+        "pico_memoria_mb": round(pico / 1024 / 1024, 3),
+    }
+    print(
+        f"{nombre:<34} p50 {resultado['p50_ms']:>10.3f} ms  p99 {resultado['p99_ms']:>10.3f} ms  "
+        f"{resultado['throughput_por_s'] or 0:>14,.0f}/s  pico {resultado['pico_memoria_mb']:>8.2f} MB",
+        file=sys.stderr,
+    )
+    return resultado
+
+def _repeticiones(n: int) -> int:
+    return 200 if n <= 1 else 30 if n <= 1000 else 5
+
+# ---------------- datos sintéticos ----------------
+def portafolio_sellos(n: int, rng) -> pd.DataFrame:
+    return pd.DataFrame({
+        "kcal": rng.uniform(0, 600, n),
+        "azucares_libres_g": rng.uniform(0, 40, n),
+        "grasas_saturadas_g": rng.uniform(0, 20, n),
+        "grasas_trans_mg": rng.uniform(0, 800, n),
+        "sodio_mg": rng.uniform(0, 1200, n),
+        "edulcorante": rng.random(n) < 0.2,
+        "bebida_sin_kcal": rng.random(n) < 0.05,
+    })
+
+def portafolio_calorias(n: int, rng) -> pd.DataFrame:
+    return pd.DataFrame({
+        "kcal_declaradas": rng.uniform(0, 600, n),
+        "carbohidratos_g": rng.uniform(0, 80, n),
+        "proteinas_g": rng.uniform(0, 30, n),
+        "grasas_g": rng.uniform(0, 40, n),
+    })
+
+# Fotos de celular sintéticas (ruido JPEG, tamaño real en bytes); cada una con sha256 distinto
+def fotos_evidencia(n: int, tamano: tuple, rng) -> list:
+    from PIL import Image
+    base = rng.integers(0, 256, (tamano[1], tamano[0], 3), dtype=np.uint8)
+    fotos = []
+    for i in range(n):
+        base[0, 0, :] = (i % 256, i // 256 % 256, i // 65536 % 256)
+        buf = BytesIO()
+        Image.fromarray(base).save(buf, "JPEG", quality=90)
+        fotos.append(buf.getvalue())
+    return fotos
+
+def registro_con_evidencia(almacen: AlmacenEvidencia, fotos: list) -> dict:
+    titulos = [t for items in CATEGORIAS.values() for (t, _, _) in items]
+    evidencia = {t: [] for t in titulos}
+    for i, datos in enumerate(fotos):
+        sha256 = almacen.guardar(datos)
+        almacen.preparar_derivados(sha256)
+        evidencia[titulos[i % len(titulos)]].append(
+            {"name": f"foto_{i}.jpg", "sha256": sha256, "size": len(datos), "caption": f"Evidencia {i}"}
+        )
+    return {
+        "producto": "Producto de prueba", "proveedor": "Proveedor", "responsable": "Auditor",
+        "invima_registro": "RSA-000000-2026", "invima_estado_activo": True, "invima_url": "",
+        "fecha": "2026-01-01", "solo_no": False,
+        "status": {t: "no" for t in titulos},
+        "notas": {t: "Observación de prueba " * 8 for t in titulos},
+        "evidencia": evidencia,
+    }
+
+# ---------------- casos ----------------
+def casos_reglas(rapido: bool, rng) -> list:
+    resultados = []
+    tamanos = [1, 1_000, 100_000] if rapido else [1, 1_000, 1_000_000]
+    for n in tamanos:
+        df = portafolio_sellos(n, rng)
+        resultados.append(medir(f"sellos/{n}", lambda: determinar_sellos(df), _repeticiones(n), n))
+    for n in tamanos:
+        df = portafolio_calorias(n, rng)
+        resultados.append(medir(f"calorias/{n}", lambda: verificar_calorias(df), _repeticiones(n), n))
+    for n in ([1_000, 100_000] if rapido else [1_000, 1_000_000, 10_000_000]):
+        areas = rng.uniform(0, 400, n)
+        num = rng.integers(1, 5, n)
+        lados = rng.uniform(0, 6, n)
+        resultados.append(medir(
+            f"tabla18/{n}", lambda: evaluar_tamano_sellos(areas, num, lados), _repeticiones(n), n
+        ))
+    return resultados
+
+def casos_pdf(rapido: bool, rng) -> list:
+    resultados = []
+    tamano = (1600, 1200) if rapido else (4032, 3024)
+    raiz = tempfile.mkdtemp(prefix="bench_evidencia_")
+    try:
+        almacen = AlmacenEvidencia(raiz, 10 * 1024 ** 3)
+        for n in ([0, 20] if rapido else [0, 20, 200]):
+            registro = registro_con_evidencia(almacen, fotos_evidencia(n, tamano, rng))
+            rep = 10 if n == 0 else 5 if n <= 20 else 3
+            resultados.append(medir(f"pdf/{n}_imagenes", lambda: generar_pdf(registro, almacen), rep, 1))
+    finally:
+        shutil.rmtree(raiz, ignore_errors=True)
+    return resultados
+
+def casos_app(rapido: bool, rng) -> list:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(RAIZ, "App.py"), default_timeout=120)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return [medir("app/rerun_completo", lambda: at.run(), 5 if rapido else 20, 1)]
+
+GRUPOS = {"reglas": casos_reglas, "pdf": casos_pdf, "app": casos_app}
+
+def _entorno() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "-C", RAIZ, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    versiones = {}
+    for mod in ("numpy", "pandas", "reportlab", "PIL", "streamlit"):
+        try:
+            versiones[mod] = __import__(mod).__version__
+        except Exception:
+            versiones[mod] = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpu": os.cpu_count(),
+        "versiones": versiones,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del checklist de etiquetado nutricional.")
+    parser.add_argument("--salida", default=os.path.join(RAIZ, "bench_output.json"), help="archivo JSON de resultados")
+    parser.add_argument("--rapido", action="store_true", help="tamaños reducidos (CI / verificación local)")
+    parser.add_argument("--solo", default="", help="grupos separados por coma: reglas (sellos, calorías, Tabla 18), pdf, app")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    grupos = [g.strip() for g in args.solo.split(",") if g.strip()] or list(GRUPOS)
+    desconocidos = [g for g in grupos if g not in GRUPOS]
+    if desconocidos:
+        parser.error(f"grupos desconocidos: {', '.join(desconocidos)}")
+
+    rng = np.random.default_rng(args.semilla)
+    casos = []
+    try:
+        for g in grupos:
+            casos.extend(GRUPOS[g](args.rapido, rng))
+    finally:
+        shutil.rmtree(TMP_BENCH, ignore_errors=True)
+
+    with open(args.salida, "w", encoding="utf-8") as fh:
+        json.dump({"entorno": _entorno(), "rapido": args.rapido, "casos": casos}, fh, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
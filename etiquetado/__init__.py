@@ -0,0 +1,38 @@
+# Núcleo importable (sin Streamlit) del checklist de etiquetado nutricional.
+# ReportLab y Pillow se cargan de forma diferida en informe.generar_pdf,
+# evidencia.AlmacenEvidencia.derivado y artes.analizar_arte.
+from .checklist import CATEGORIAS, APLICA
+from .reglas import (
+    TABLA_17,
+    df_tabla17,
+    determinar_sellos,
+    verificar_calorias,
+    evaluar_tamano_sellos,
+    lado_minimo_tabla18,
+    validar_aproximacion,
+    verificar_unidades,
+    verificar_obligatorios,
+    consistencia_bromatologica,
+    verificar_porciones,
+)
+from .nutrientes import ESQUEMA_NUTRIENTES
+from .normativa import cargar_normativa, ReglamentoInvalido
+
+__all__ = [
+    "CATEGORIAS",
+    "APLICA",
+    "TABLA_17",
+    "df_tabla17",
+    "determinar_sellos",
+    "verificar_calorias",
+    "evaluar_tamano_sellos",
+    "lado_minimo_tabla18",
+    "validar_aproximacion",
+    "verificar_unidades",
+    "verificar_obligatorios",
+    "consistencia_bromatologica",
+    "verificar_porciones",
+    "ESQUEMA_NUTRIENTES",
+    "cargar_normativa",
+    "ReglamentoInvalido",
+]
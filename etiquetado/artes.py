@@ -0,0 +1,246 @@
+# ------------------------------------------------------------
+# ANÁLISIS DE ARTES — sellos frontales de advertencia (Res. 810/2021 Art. 27,
+# Res. 2492/2022 Art. 32)
+#
+#   python -m etiquetado.artes ARTE [ARTE ...] (--dpi N | --ancho-cm A [--alto-cm B])
+#                              [--tipo-envase no_cilindrico|cilindrico] [--procesos N] [--salida CSV]
+#
+# Detecta los octágonos negros en la imagen de la cara principal, mide su lado,
+# los cuenta y ubica en qué tercio de la cara cae cada uno. Solo NumPy + Pillow:
+# componentes conexas por corridas de píxeles (union-find), sin OpenCV ni SciPy.
+# ------------------------------------------------------------
+import io
+import os
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+UMBRAL_NEGRO = 90            # gris 0-255; por debajo se considera tinta negra
+LADO_TRABAJO_PX = 1600       # las imágenes más grandes se reducen antes de analizar
+LADO_MIN_SELLO_FRACCION = 0.03   # lado mínimo del sello respecto al lado menor de la cara
+# Octágono regular: ocupa 2/(1+√2) ≈ 0.83 de su caja y cada lado recto mide ≈ 0.41 de la caja
+RELLENO_OCTAGONO = (0.76, 0.90)
+ARISTA_OCTAGONO = (0.25, 0.60)
+PROPORCION_MAX = 1.2         # ancho/alto de la caja
+TIPOS_ENVASE = {
+    "no_cilindrico": ("superior", "derecho"),
+    "cilindrico": ("superior", "central"),
+}
+
+def _cargar_gris(origen):
+    from PIL import Image, ImageOps  # importación diferida: solo al analizar imágenes
+    with Image.open(io.BytesIO(origen) if isinstance(origen, (bytes, bytearray)) else origen) as img:
+        dpi = img.info.get("dpi")
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            fondo = Image.new("RGBA", img.size, "white")
+            fondo.alpha_composite(img)
+            img = fondo
+        img = img.convert("L")
+        tamano = img.size
+        factor = min(1.0, LADO_TRABAJO_PX / max(tamano))
+        if factor < 1.0:
+            img = img.resize((max(1, round(tamano[0] * factor)), max(1, round(tamano[1] * factor))), Image.BOX)
+        return np.asarray(img), factor, tamano, (float(dpi[0]) if dpi and dpi[0] else None)
+
+# Componentes 8-conexas de una máscara booleana. Devuelve las corridas horizontales
+# (fila, inicio, fin exclusivo) y la etiqueta de componente de cada una.
+def _componentes(mascara: np.ndarray):
+    h, w = mascara.shape
+    bordes = np.diff(np.pad(mascara, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    fila, inicio = np.nonzero(bordes == 1)
+    _, fin = np.nonzero(bordes == -1)
+    n = len(fila)
+    padre = np.arange(n)
+
+    def raiz(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    limites = np.searchsorted(fila, np.arange(h + 1))
+    ini_l, fin_l = inicio.tolist(), fin.tolist()
+    for y in range(1, h):
+        i, i_fin = limites[y - 1], limites[y]
+        j, j_fin = limites[y], limites[y + 1]
+        while i < i_fin and j < j_fin:
+            # 8-conexidad: se tocan si se solapan o se tocan en diagonal
+            if ini_l[j] <= fin_l[i] and ini_l[i] <= fin_l[j]:
+                ri, rj = raiz(i), raiz(j)
+                if ri != rj:
+                    padre[max(ri, rj)] = min(ri, rj)
+            if fin_l[i] < fin_l[j]:
+                i += 1
+            else:
+                j += 1
+    etiquetas = np.array([raiz(i) for i in range(n)], dtype=np.int64)
+    return fila, inicio, fin, etiquetas
+
+def _octagonos(gris: np.ndarray) -> pd.DataFrame:
+    fila, inicio, fin, etiqueta = _componentes(gris < UMBRAL_NEGRO)
+    corridas = pd.DataFrame({"c": etiqueta, "y": fila, "x0": inicio, "x1": fin})
+    cajas = corridas.groupby("c").agg(x0=("x0", "min"), x1=("x1", "max"), y0=("y", "min"), y1=("y", "max"))
+    cajas["ancho"] = cajas["x1"] - cajas["x0"]
+    cajas["alto"] = cajas["y1"] - cajas["y0"] + 1
+    lado_min = max(8, LADO_MIN_SELLO_FRACCION * min(gris.shape))
+    proporcion = cajas["ancho"] / cajas["alto"]
+    cajas = cajas[
+        (cajas["ancho"] >= lado_min) & (cajas["alto"] >= lado_min)
+        & (proporcion <= PROPORCION_MAX) & (proporcion >= 1 / PROPORCION_MAX)
+    ]
+    if cajas.empty:
+        return cajas
+
+    # Contorno por fila (primer y último píxel): el octágono es convexo, así que
+    # este relleno ignora el texto y el filete blancos del interior del sello.
+    por_fila = (
+        corridas[corridas["c"].isin(cajas.index)]
+        .groupby(["c", "y"]).agg(x0=("x0", "min"), x1=("x1", "max"))
+        .reset_index()
+    )
+    por_fila = por_fila.join(cajas[["x0", "x1", "y0", "ancho", "alto"]], on="c", rsuffix="_caja")
+    por_fila["tramo"] = por_fila["x1"] - por_fila["x0"]
+    tol = np.maximum(1, por_fila["ancho"] * 0.02)
+    por_fila["toca_izq"] = por_fila["x0"] <= por_fila["x0_caja"] + tol
+    por_fila["toca_der"] = por_fila["x1"] >= por_fila["x1_caja"] - tol
+    arriba = por_fila[por_fila["y"] == por_fila["y0"]].set_index("c")["tramo"]
+    stats = por_fila.groupby("c").agg(
+        relleno=("tramo", "sum"), izq=("toca_izq", "sum"), der=("toca_der", "sum"),
+    )
+    cajas = cajas.join(stats)
+    cajas["relleno"] = cajas["relleno"] / (cajas["ancho"] * cajas["alto"])
+    cajas["arista_sup"] = arriba.reindex(cajas.index) / cajas["ancho"]
+    cajas["arista_izq"] = cajas["izq"] / cajas["alto"]
+    cajas["arista_der"] = cajas["der"] / cajas["alto"]
+    en_rango = lambda s, r: (s >= r[0]) & (s <= r[1])  # noqa: E731
+    es_octagono = (
+        en_rango(cajas["relleno"], RELLENO_OCTAGONO)
+        & en_rango(cajas["arista_sup"], ARISTA_OCTAGONO)
+        & en_rango(cajas["arista_izq"], ARISTA_OCTAGONO)
+        & en_rango(cajas["arista_der"], ARISTA_OCTAGONO)
+    )
+    sellos = cajas[es_octagono].sort_values(["y0", "x0"])
+    # Un octágono dentro de otro (p. ej. el fondo negro interior del sello) no es otro sello
+    dentro = np.zeros(len(sellos), dtype=bool)
+    v = sellos[["x0", "x1", "y0", "y1"]].to_numpy()
+    for k in range(len(v)):
+        otros = np.delete(np.arange(len(v)), k)
+        dentro[k] = np.any(
+            (v[otros, 0] <= v[k, 0]) & (v[otros, 1] >= v[k, 1]) & (v[otros, 2] <= v[k, 2]) & (v[otros, 3] >= v[k, 3])
+        )
+    return sellos[~dentro]
+
+def _tercio(posicion: np.ndarray, total: float, nombres: tuple) -> np.ndarray:
+    return np.array(nombres, dtype=object)[np.clip((posicion / total * 3).astype(int), 0, 2)]
+
+# Analiza una cara principal. Escala física: ancho/alto en cm (prioridad), DPI
+# indicado o DPI guardado en la imagen. Devuelve las entradas de la herramienta
+# de tamaño (area_cara_cm2, num_sellos, lado_real_cm) y el detalle por sello.
+def analizar_arte(origen, dpi: float = None, ancho_cm: float = None, alto_cm: float = None,
+                  tipo_envase: str = "no_cilindrico") -> dict:
+    gris, factor, (ancho_px, alto_px), dpi_imagen = _cargar_gris(origen)
+    if ancho_cm:
+        px_por_cm = ancho_px / ancho_cm
+    elif alto_cm:
+        px_por_cm = alto_px / alto_cm
+    elif dpi or dpi_imagen:
+        px_por_cm = (dpi or dpi_imagen) / 2.54
+    else:
+        raise ValueError("Indique el DPI del arte o sus dimensiones físicas (cm)")
+    ancho_cm = ancho_cm or ancho_px / px_por_cm
+    alto_cm = alto_cm or alto_px / px_por_cm
+    escala = factor * px_por_cm  # píxeles de trabajo por cm
+
+    sellos = _octagonos(gris)
+    centro_x = (sellos["x0"] + sellos["x1"]).to_numpy() / 2
+    centro_y = (sellos["y0"] + sellos["y1"] + 1).to_numpy() / 2
+    detalle = pd.DataFrame({
+        "x_cm": (sellos["x0"] / escala).round(2).to_numpy(),
+        "y_cm": (sellos["y0"] / escala).round(2).to_numpy(),
+        "lado_cm": ((sellos["ancho"] + sellos["alto"]) / 2 / escala).round(2).to_numpy(),
+        "tercio_vertical": _tercio(centro_y, gris.shape[0], ("superior", "medio", "inferior")),
+        "tercio_horizontal": _tercio(centro_x, gris.shape[1], ("izquierdo", "central", "derecho")),
+    })
+    vertical, horizontal = TIPOS_ENVASE[tipo_envase]
+    return {
+        "area_cara_cm2": round(ancho_cm * alto_cm, 2),
+        "ancho_cm": round(ancho_cm, 2),
+        "alto_cm": round(alto_cm, 2),
+        "num_sellos": len(detalle),
+        # El sello más pequeño es el que decide el cumplimiento
+        "lado_real_cm": float(detalle["lado_cm"].min()) if len(detalle) else 0.0,
+        "ubicacion_correcta": bool(len(detalle)) and bool(
+            ((detalle["tercio_vertical"] == vertical) & (detalle["tercio_horizontal"] == horizontal)).all()
+        ),
+        "sellos": detalle,
+    }
+
+# Veredicto de tamaño por arte. Sin sellos detectados no hay lado que medir:
+# regla y cumple quedan vacíos en lugar de evaluar un sello de 0 cm.
+def evaluar_tamano_artes(tabla: pd.DataFrame, fecha=None) -> pd.DataFrame:
+    from .reglas import evaluar_tamano_sellos
+    con_sellos = tabla[tabla["num_sellos"] > 0]
+    res = evaluar_tamano_sellos(
+        con_sellos["area_cara_cm2"], con_sellos["num_sellos"], con_sellos["lado_real_cm"], fecha=fecha
+    )
+    res.index = con_sellos.index
+    res = res.reindex(tabla.index)
+    res["cumple"] = res["cumple"].astype("boolean")
+    return res[["regla", "lado_min_cm", "cumple", "version_reglas"]]
+
+def _analizar_archivo(nombre: str, origen, opciones: dict) -> dict:
+    res = analizar_arte(origen, **opciones)
+    res.pop("sellos")
+    return {"archivo": nombre, **res}
+
+# Lote en paralelo (procesos "spawn": seguro desde la app, que tiene hilos vivos).
+# Produce (nombre, resultado, error) a medida que termina cada arte.
+def analizar_lote(archivos, procesos: int = None, **opciones):
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, procesos or os.cpu_count() or 1), mp_context=contexto) as pool:
+        futuros = {pool.submit(_analizar_archivo, nombre, origen, opciones): nombre for nombre, origen in archivos}
+        for futuro in as_completed(futuros):
+            try:
+                yield futuros[futuro], futuro.result(), None
+            except Exception as e:
+                yield futuros[futuro], None, f"{type(e).__name__}: {e}"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m etiquetado.artes",
+        description="Detecta y mide los sellos de advertencia en imágenes de artes (cara principal)."
+    )
+    parser.add_argument("artes", nargs="+")
+    parser.add_argument("--dpi", type=float)
+    parser.add_argument("--ancho-cm", type=float, help="ancho físico de la cara principal")
+    parser.add_argument("--alto-cm", type=float, help="alto físico de la cara principal")
+    parser.add_argument("--tipo-envase", choices=list(TIPOS_ENVASE), default="no_cilindrico")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    parser.add_argument("--salida", help="CSV de resultados (por defecto: salida estándar)")
+    args = parser.parse_args(argv)
+
+    filas, errores = [], 0
+    opciones = {"dpi": args.dpi, "ancho_cm": args.ancho_cm, "alto_cm": args.alto_cm, "tipo_envase": args.tipo_envase}
+    for i, (nombre, res, error) in enumerate(
+        analizar_lote([(r, r) for r in args.artes], args.procesos, **opciones), start=1
+    ):
+        print(f"[{i}/{len(args.artes)}] {'ERROR ' + error if error else 'OK'} {nombre}", file=sys.stderr)
+        if error:
+            errores += 1
+        else:
+            filas.append(res)
+    if filas:
+        tabla = pd.DataFrame(filas).sort_values("archivo")
+        veredicto = evaluar_tamano_artes(tabla)
+        tabla = tabla.assign(regla=veredicto["regla"], cumple_tamano=veredicto["cumple"])
+        tabla.to_csv(args.salida or sys.stdout, index=False)
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
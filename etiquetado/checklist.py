@@ -0,0 +1,66 @@
+# ------------------------------------------------------------
+# CHECKLIST — 810/2021 y 2492/2022 (orden completo)
+# ------------------------------------------------------------
+import hashlib
+
+CATEGORIAS = {
+    "1. Principios generales de etiquetado nutricional": [
+        ("No inducir a error o confusión",
+         "Verificar que el etiquetado nutricional y cualquier información asociada no atribuyan propiedades que no posea, ni induzcan a error sobre composición, cantidad o beneficios.",
+         "Res. 810/2021, Art. 5."),
+        ("Tabla nutricional obligatoria (aplicabilidad)",
+         "Que la tabla nutricional esté diseñada con fondo contrastante y presentada cubriendo el 25% del área disponible del envase, utilizando el formato permitido vertical, simplificado, lineal o tabular.",
+         "Res. 810/2021, Art. 6."),
+    ],
+    "2. Estructura y contenido de la tabla nutricional": [
+        ("Unidades de medida (estructura general)",
+         "Que la información se declare por 100 g o 100 mL y por porción (según estado físico), incluyendo número de porciones por envase",
+         "Res. 810/2021, Art. 7 y 8."),
+        ("Nutrientes obligatorios declarados",
+         "La tabla nutricional debe incluir los macronutrientes obligatorios: Calorías, grasas totales, grasas saturadas, grasas trans, carbohidratos totales, azúcares totales, azúcares añadidos, fibra dietaria, proteínas y sodio. Micronutrientes obligatorios: Vitamina A, Vitamina D, Hierro, Calcio y Zinc (Si no se encuentra en la tabla se debe declarar como fuente no significativa de).",
+         "Res. 810/2021, Art. 8.1.1"),
+        ("Aproximación y expresión de valores nutricionales",
+        "Verificar que los valores declarados de energía y nutrientes en la tabla nutricional estén correctamente aproximados y expresados según los rangos establecidos por la normativa. "
+        "Valores ≥1000 se declaran en números enteros de cuatro cifras; valores ≥100 y <1000 en enteros de tres cifras; valores ≥10 y <100 en enteros de dos cifras; "
+        "valores ≥1 y <10 con una cifra decimal; valores <1 con dos cifras decimales para vitaminas y minerales y una cifra decimal para el resto de nutrientes.",
+        "Res. 810/2021, Art. 8."),
+        ("Unidades específicas por nutriente",
+         "Que las unidades declaradas correspondan a lo exigido por la norma: Calorías en kcal y/o kJ; Grasas totales, grasas saturadas, carbohidratos totales, fibra dietaria, azúcares totales, azúcares añadidos y proteina en g; Grasas trans y Sodio en mg; En el caso de micronutrientes: ; Vitamina A en µg ER; Vitamina D en µg; Calcio, Hierro, Vitamina C, Zinc y otros micronutrientes en mg.",
+         "Res. 810/2021, Art. 8"),
+        ("Formato, tipografía y jerarquía visual de la tabla nutricional",
+         "Verificar con mini checklist",
+         "Res. 810/2021, Art. 9.1, 9.2 y 9.5; modificado por Res. 2492/2022."),        
+         ("Declaración de porciones",
+         "Que la porción indicada en la tabla nutricional esté declarada en unidades del Sistema Internacional, acompañada de una medida casera común, y que el número de porciones por envase coincida con el contenido neto del producto. Ejemplo: si el envase contiene 150 g y la porción es 30 g, el número de porciones debe ser 5; esta porción puede expresarse como 1 onza (oz), donde 1 onza de peso equivale a 28 g.",
+         "Res. 810/2021, Art. 12."),
+        ("Verificación de calorías declaradas (±20% tolerancia)",
+         "Comprobar que las calorías declaradas coinciden con las calculadas por macronutrientes (4 kcal/g CHO, 4 kcal/g proteínas, 9 kcal/g grasas). 💡 Use la herramienta a continuación para comprobarlo.",
+         "Res. 810/2021, Art. 17 (Tolerancias)."),
+        ("Consistencia con análisis bromatológico (±20%)",
+         "Verificar que los valores declarados en la tabla nutricional coinciden con el análisis bromatológico dentro de ±20%; usar resultados de laboratorio acreditado/certificado.",
+         "Res. 810/2021, Art. 17 (Tolerancias)."),
+    ],
+    "3. Sellos frontales de advertencia": [
+        ("Características gráficas y generales de los sellos frontales de advertencia",
+         "Verificar que los sellos frontales de advertencia cumplan con las características gráficas y formales establecidas por la normativa. "
+         "Los sellos deben ser de forma octagonal regular, con fondo negro, borde blanco y texto en color blanco, en mayúsculas y con tipografía legible. "
+         "No deben incluir imágenes, logotipos, símbolos adicionales ni elementos decorativos, ni presentar alteraciones de color, proporción u orientación.",
+         "Res. 810/2021, Art. 27; modificado por Res. 2492/2022."
+        ),
+        ("Determinación de aplicabilidad de sellos",
+         "Evaluar si corresponde ‘EXCESO EN’ (azúcares, grasas saturadas, grasas trans, sodio) o ‘CONTIENE EDULCORANTE’. 💡 Use la herramienta a continuación para determinar la aplicabilidad de sellos.",
+         "Res. 810/2021, Art. 25 y tabla 3, modificado por Res. 2492/2022."),
+        ("Ubicación, distribución y tamaño de sellos (Tabla 17)",
+        "Que los sellos frontales de advertencia estén ubicados en el tercio superior de la cara principal de exhibición del empaque. En envases no cilindricos, los sellos deben colocarse en el tercio superior derecho. En envases cilíndricos, deben ubicarse en el tercio superior central. Para verificar el tamaño del sello, se debe hacer uso de la herramienta incluida en la aplicación.",
+        "Res. 810/2021, Art. 27; modificado por Res. 2492/2022."),
+    ],
+}
+
+APLICA = {k: "Producto terminado" for cat in CATEGORIAS.values() for (k,_,_) in cat}
+
+# Índices por ítem (persistencia y agregados por categoría / referencia normativa)
+CATEGORIA_POR_ITEM = {k: cat for cat, items in CATEGORIAS.items() for (k,_,_) in items}
+REFERENCIA_POR_ITEM = {k: ref for items in CATEGORIAS.values() for (k,_,ref) in items}
+# Identificador estable por ítem para claves de widgets y de estado compartido:
+# a diferencia de hash(), no cambia entre procesos ni réplicas.
+ID_ITEM = {k: hashlib.sha1(k.encode("utf-8")).hexdigest()[:12] for k in CATEGORIA_POR_ITEM}
@@ -0,0 +1,153 @@
+# ------------------------------------------------------------
+# ESPACIO DE TRABAJO MULTIPRODUCTO
+# Una sesión puede tener abiertos muchos productos. El activo vive en
+# st.session_state como siempre; los inactivos se guardan como registros
+# compactos (estados en una cadena de un carácter por ítem, solo notas y
+# evidencia no vacías, entradas de herramientas en JSON). Solo los
+# ESPACIO_EN_MEMORIA usados más recientemente quedan en memoria; el resto se
+# vuelca a disco y se relee al activarlos.
+# ------------------------------------------------------------
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+from collections import OrderedDict
+
+from .checklist import CATEGORIA_POR_ITEM
+from .estado import EstadoNoDisponible
+from .instantanea import codificar_entrada, decodificar_entrada
+
+ESPACIO_DIR = os.environ.get("ESPACIO_DIR", os.path.join(tempfile.gettempdir(), "espacios_810"))
+ESPACIO_EN_MEMORIA = int(os.environ.get("ESPACIO_EN_MEMORIA", "4"))
+ESPACIO_DIAS = float(os.environ.get("ESPACIO_DIAS", "2"))
+
+logger = logging.getLogger("etiquetado.espacio")
+
+ITEMS = list(CATEGORIA_POR_ITEM)
+CODIGO_ESTADO = {"none": "-", "yes": "y", "no": "n", "na": "a"}
+ESTADO_CODIGO = {v: k for k, v in CODIGO_ESTADO.items()}
+
+# producto: {"auditoria_id", "meta", "meta_guardada", "status", "notas", "evidencia", "entradas"}
+def compactar(producto: dict) -> dict:
+    return {
+        "auditoria_id": producto.get("auditoria_id"),
+        "meta": producto["meta"],
+        "meta_guardada": producto.get("meta_guardada") or {},
+        "estados": "".join(CODIGO_ESTADO[producto["status"].get(t, "none")] for t in ITEMS),
+        "notas": {i: producto["notas"][t] for i, t in enumerate(ITEMS) if producto["notas"].get(t)},
+        "evidencia": {i: producto["evidencia"][t] for i, t in enumerate(ITEMS) if producto["evidencia"].get(t)},
+        "entradas": {k: codificar_entrada(v) for k, v in producto.get("entradas", {}).items()},
+    }
+
+def expandir(compacto: dict) -> dict:
+    # Las claves enteras pasan a texto al volcar a JSON
+    notas = {int(i): n for i, n in compacto["notas"].items()}
+    evidencia = {int(i): evs for i, evs in compacto["evidencia"].items()}
+    return {
+        "auditoria_id": compacto["auditoria_id"],
+        "meta": compacto["meta"],
+        "meta_guardada": compacto["meta_guardada"],
+        "status": {t: ESTADO_CODIGO[c] for t, c in zip(ITEMS, compacto["estados"])},
+        "notas": {t: notas.get(i, "") for i, t in enumerate(ITEMS)},
+        "evidencia": {t: list(evidencia.get(i, [])) for i, t in enumerate(ITEMS)},
+        "entradas": {k: decodificar_entrada(v) for k, v in compacto["entradas"].items()},
+    }
+
+def shas_de(compacto: dict) -> list:
+    return [ev["sha256"] for evs in compacto["evidencia"].values() for ev in evs]
+
+# Con `estado` (EscrituraDiferida) y `sesion`, cada producto inactivo se respalda
+# además como "producto:<clave>" en el estado compartido, y la réplica que no lo
+# tenga en memoria ni en su disco lo lee de allí.
+class EspacioTrabajo:
+    def __init__(self, directorio: str = ESPACIO_DIR, en_memoria: int = ESPACIO_EN_MEMORIA, estado=None, sesion: str = None):
+        self.en_memoria = max(0, en_memoria)
+        self.directorio = os.path.join(directorio, uuid.uuid4().hex)
+        self.etiquetas = {}  # clave -> nombre visible, en orden de apertura (incluye el activo)
+        self.activa = None
+        self.estado = estado
+        self.sesion = sesion
+        self._memoria = OrderedDict()  # clave -> registro compacto; el último es el más reciente
+        self._limpiar_antiguos(directorio)
+
+    # El respaldo es complementario: si el estado compartido no acepta escrituras,
+    # el producto sigue en memoria o en el disco de esta réplica
+    def _respaldar(self, clave: str, compacto):
+        if self.estado is not None:
+            try:
+                self.estado.escribir(self.sesion, {f"producto:{clave}": compacto})
+            except EstadoNoDisponible as e:
+                logger.warning("Producto %s sin respaldo compartido: %s", clave, e)
+
+    # {"activa", "etiquetas"}: lo necesario para reconstruir el espacio en otra réplica
+    def resumen(self) -> dict:
+        return {"activa": self.activa, "etiquetas": dict(self.etiquetas)}
+
+    def restaurar_resumen(self, resumen: dict):
+        self.etiquetas = dict(resumen["etiquetas"])
+        self.activa = resumen["activa"]
+
+    @staticmethod
+    def _limpiar_antiguos(directorio: str):
+        if not os.path.isdir(directorio):
+            return
+        limite = time.time() - ESPACIO_DIAS * 86400
+        for d in os.scandir(directorio):
+            if d.is_dir() and d.stat().st_mtime < limite:
+                shutil.rmtree(d.path, ignore_errors=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def nueva_clave(self, etiqueta: str) -> str:
+        clave = uuid.uuid4().hex[:12]
+        self.etiquetas[clave] = etiqueta
+        return clave
+
+    # Guarda un producto inactivo como más reciente y vuelca a disco los que excedan el cupo
+    def guardar(self, clave: str, producto: dict, etiqueta: str):
+        self.etiquetas[clave] = etiqueta
+        self._memoria[clave] = compactar(producto)
+        self._memoria.move_to_end(clave)
+        self._respaldar(clave, self._memoria[clave])
+        while len(self._memoria) > self.en_memoria:
+            vieja, compacto = self._memoria.popitem(last=False)
+            os.makedirs(self.directorio, exist_ok=True)
+            tmp = self._ruta(vieja) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(compacto, fh, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self._ruta(vieja))
+
+    # Saca un producto inactivo (de memoria o de disco) para activarlo
+    def tomar(self, clave: str) -> dict:
+        compacto = self._sacar(clave)
+        if compacto is None:
+            raise KeyError(f"Producto no disponible en el espacio de trabajo: {clave}")
+        return expandir(compacto)
+
+    # Quita un producto inactivo del espacio; devuelve sus sha256 para liberar la evidencia
+    def descartar(self, clave: str) -> list:
+        self.etiquetas.pop(clave, None)
+        compacto = self._sacar(clave)
+        return shas_de(compacto) if compacto else []
+
+    # Memoria → disco local → estado compartido; el producto deja de estar respaldado como inactivo
+    def _sacar(self, clave: str):
+        compacto = self._memoria.pop(clave, None)
+        if compacto is None and os.path.exists(self._ruta(clave)):
+            with open(self._ruta(clave), encoding="utf-8") as fh:
+                compacto = json.load(fh)
+            os.remove(self._ruta(clave))
+        if compacto is None and self.estado is not None:
+            compacto = self.estado.leer(self.sesion, f"producto:{clave}")
+        self._respaldar(clave, None)
+        return compacto
+
+    def en_disco(self) -> int:
+        return sum(1 for c in self.etiquetas if c != self.activa and c not in self._memoria)
+
+    def cerrar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
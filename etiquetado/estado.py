@@ -0,0 +1,236 @@
+# ------------------------------------------------------------
+# ESTADO COMPARTIDO DE SESIÓN (respaldo fuera del proceso de Streamlit)
+# Cada sesión del navegador lleva un identificador estable en la URL
+# (?sesion=...). Su estado (producto activo, productos abiertos, entradas de
+# herramientas) se guarda como {clave: valor JSON} en un backend intercambiable,
+# de modo que cualquier réplica puede retomar la sesión tras un reinicio o un
+# cambio de balanceo.
+#
+#   ESTADO_BACKEND=memoria              en el proceso (por defecto; pruebas, una réplica)
+#   ESTADO_BACKEND=sqlite:/ruta/est.db  archivo SQLite (pruebas o volumen compartido)
+#
+# Otro backend (Redis, Postgres...) solo necesita leer / escribir_lote / purgar.
+# Fuera de "memoria", AUDITORIAS_DB y EVIDENCIA_DIR deben apuntar a un volumen
+# común (verificar_despliegue) y la evidencia cuenta sus referencias allí.
+# Las escrituras pasan por EscrituraDiferida: se agrupan en memoria y se
+# vuelcan en un solo lote cada ESTADO_DIFERIDO_S segundos o al llegar a
+# ESTADO_LOTE cambios, no una ida y vuelta por interacción. Si el backend
+# falla, los cambios se conservan y se reintentan; pasados ESTADO_MAX_PENDIENTES
+# sin poder volcarlos, escribir() lanza EstadoNoDisponible en vez de seguir
+# acumulando en memoria.
+# ------------------------------------------------------------
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+ESTADO_BACKEND = os.environ.get("ESTADO_BACKEND", "memoria")
+ESTADO_DIFERIDO_S = float(os.environ.get("ESTADO_DIFERIDO_S", "1.0"))
+ESTADO_LOTE = int(os.environ.get("ESTADO_LOTE", "200"))
+ESTADO_DIAS = float(os.environ.get("ESTADO_DIAS", "14"))
+ESTADO_PURGA_S = float(os.environ.get("ESTADO_PURGA_S", "3600"))
+ESTADO_MAX_PENDIENTES = int(os.environ.get("ESTADO_MAX_PENDIENTES", "10000"))
+
+logger = logging.getLogger("etiquetado.estado")
+
+class EstadoNoDisponible(RuntimeError):
+    pass
+
+# Con un backend compartido la sesión puede continuar en otra réplica: la base
+# de auditorías y el almacén de evidencia tienen que ser los mismos para todas.
+# Se exigen rutas absolutas explícitas (volumen compartido), no los valores por
+# defecto locales de cada réplica.
+ALMACENES_COMPARTIDOS = ("AUDITORIAS_DB", "EVIDENCIA_DIR")
+
+def verificar_despliegue(config: str = ESTADO_BACKEND, entorno=None):
+    if config == "memoria":
+        return
+    entorno = os.environ if entorno is None else entorno
+    faltan = [v for v in ALMACENES_COMPARTIDOS if not os.path.isabs(entorno.get(v, ""))]
+    if faltan:
+        raise ValueError(
+            f"ESTADO_BACKEND={config} comparte las sesiones entre réplicas; defina "
+            f"{' y '.join(faltan)} con rutas absolutas en un volumen común a todas las réplicas"
+        )
+
+class EstadoEnMemoria:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = {}  # sesion -> {clave: (json, instante)}
+
+    def leer(self, sesion: str, clave: str = None):
+        with self._lock:
+            datos = self._datos.get(sesion, {})
+            if clave is not None:
+                return json.loads(datos[clave][0]) if clave in datos else None
+            return {k: json.loads(v) for k, (v, _) in datos.items()}
+
+    # cambios: {(sesion, clave): valor}; valor None borra la clave
+    def escribir_lote(self, cambios: dict):
+        ahora = time.time()
+        with self._lock:
+            for (sesion, clave), valor in cambios.items():
+                if valor is None:
+                    self._datos.get(sesion, {}).pop(clave, None)
+                else:
+                    self._datos.setdefault(sesion, {})[clave] = (json.dumps(valor, ensure_ascii=False), ahora)
+
+    def purgar(self, dias: float = ESTADO_DIAS):
+        limite = time.time() - dias * 86400
+        with self._lock:
+            for sesion in [s for s, d in self._datos.items() if all(t < limite for _, t in d.values())]:
+                del self._datos[sesion]
+
+    def cerrar(self):
+        pass
+
+class EstadoSQLite:
+    def __init__(self, ruta: str):
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS estado_sesiones ("
+                "sesion TEXT NOT NULL, clave TEXT NOT NULL, valor TEXT NOT NULL, actualizado REAL NOT NULL, "
+                "PRIMARY KEY (sesion, clave)) WITHOUT ROWID"
+            )
+
+    def leer(self, sesion: str, clave: str = None):
+        with self._lock:
+            if clave is not None:
+                fila = self._con.execute(
+                    "SELECT valor FROM estado_sesiones WHERE sesion = ? AND clave = ?", (sesion, clave)
+                ).fetchone()
+                return json.loads(fila[0]) if fila else None
+            filas = self._con.execute("SELECT clave, valor FROM estado_sesiones WHERE sesion = ?", (sesion,)).fetchall()
+        return {k: json.loads(v) for k, v in filas}
+
+    def escribir_lote(self, cambios: dict):
+        ahora = time.time()
+        borrar = [k for k, v in cambios.items() if v is None]
+        poner = [(s, c, json.dumps(v, ensure_ascii=False), ahora) for (s, c), v in cambios.items() if v is not None]
+        with self._lock, self._con:
+            self._con.executemany("DELETE FROM estado_sesiones WHERE sesion = ? AND clave = ?", borrar)
+            self._con.executemany(
+                "INSERT INTO estado_sesiones (sesion, clave, valor, actualizado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (sesion, clave) DO UPDATE SET valor = excluded.valor, actualizado = excluded.actualizado",
+                poner,
+            )
+
+    # Borra las sesiones sin cambios en los últimos `dias`
+    def purgar(self, dias: float = ESTADO_DIAS):
+        with self._lock, self._con:
+            self._con.execute(
+                "DELETE FROM estado_sesiones WHERE sesion IN "
+                "(SELECT sesion FROM estado_sesiones GROUP BY sesion HAVING MAX(actualizado) < ?)",
+                (time.time() - dias * 86400,),
+            )
+
+    def cerrar(self):
+        self._con.close()
+
+# Búfer de escritura delante de un backend: la última escritura de cada
+# (sesión, clave) gana y las lecturas ven lo pendiente aunque no se haya volcado.
+# El mismo hilo purga el backend cada `purga_s` segundos.
+class EscrituraDiferida:
+    def __init__(self, destino, intervalo_s: float = ESTADO_DIFERIDO_S, lote: int = ESTADO_LOTE,
+                 purga_s: float = ESTADO_PURGA_S, max_pendientes: int = ESTADO_MAX_PENDIENTES):
+        self.destino = destino
+        self.intervalo_s = intervalo_s
+        self.lote = lote
+        self.purga_s = purga_s
+        self.max_pendientes = max_pendientes
+        self._error = None  # último fallo al volcar; None tras un volcado exitoso
+        self._ultima_purga = time.monotonic()
+        self._lock = threading.Lock()
+        self._pendientes = {}
+        self._despertar = threading.Event()
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle, name="estado-diferido", daemon=True)
+        self._hilo.start()
+
+    def escribir(self, sesion: str, cambios: dict):
+        with self._lock:
+            nuevos = sum(1 for clave in cambios if (sesion, clave) not in self._pendientes)
+            if self._error is not None and nuevos and len(self._pendientes) + nuevos > self.max_pendientes:
+                raise EstadoNoDisponible(
+                    f"el estado compartido no acepta escrituras ({len(self._pendientes)} cambios sin volcar): "
+                    f"{type(self._error).__name__}: {self._error}"
+                ) from self._error
+            for clave, valor in cambios.items():
+                self._pendientes[(sesion, clave)] = valor
+            lleno = len(self._pendientes) >= self.lote
+        if lleno:
+            self._despertar.set()
+
+    def leer(self, sesion: str, clave: str = None):
+        with self._lock:
+            if clave is not None and (sesion, clave) in self._pendientes:
+                return self._pendientes[(sesion, clave)]
+            propios = {c: v for (s, c), v in self._pendientes.items() if s == sesion} if clave is None else None
+        if clave is not None:
+            return self.destino.leer(sesion, clave)
+        datos = self.destino.leer(sesion)
+        for c, v in propios.items():
+            if v is None:
+                datos.pop(c, None)
+            else:
+                datos[c] = v
+        return datos
+
+    def vaciar(self):
+        with self._lock:
+            cambios, self._pendientes = self._pendientes, {}
+        if cambios:
+            try:
+                self.destino.escribir_lote(cambios)
+            except Exception as e:
+                # Se reintenta en el próximo ciclo sin pisar lo escrito mientras tanto
+                with self._lock:
+                    self._pendientes = {**cambios, **self._pendientes}
+                    self._error = e
+                raise
+            with self._lock:
+                self._error = None
+
+    # Un fallo se registra al empezar y al recuperarse, no en cada reintento
+    def _bucle(self):
+        while self._activo:
+            self._despertar.wait(self.intervalo_s)
+            self._despertar.clear()
+            fallaba = self._error is not None
+            try:
+                self.vaciar()
+            except Exception:
+                if not fallaba:
+                    logger.exception("No se pudo volcar el estado diferido; se reintentará")
+            else:
+                if fallaba:
+                    logger.warning("Estado diferido volcado de nuevo tras un fallo")
+            if time.monotonic() - self._ultima_purga >= self.purga_s:
+                self._ultima_purga = time.monotonic()
+                try:
+                    self.destino.purgar()
+                except Exception:
+                    logger.exception("No se pudo purgar el estado compartido")
+
+    def cerrar(self):
+        self._activo = False
+        self._despertar.set()
+        self._hilo.join()
+        self.vaciar()
+        self.destino.cerrar()
+
+def crear_estado(config: str = ESTADO_BACKEND) -> EscrituraDiferida:
+    if config == "memoria":
+        destino = EstadoEnMemoria()
+    elif config.startswith("sqlite:"):
+        destino = EstadoSQLite(config[len("sqlite:"):])
+    else:
+        raise ValueError(f"ESTADO_BACKEND desconocido: {config} (use 'memoria' o 'sqlite:/ruta')")
+    destino.purgar()
+    return EscrituraDiferida(destino)
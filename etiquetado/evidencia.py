@@ -0,0 +1,382 @@
+import io
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .persistencia import AUDITORIAS_DB
+
+# ------------------------------------------------------------
+# ALMACÉN DE EVIDENCIA (direccionado por contenido, en disco)
+# La sesión guarda solo referencias {name, sha256, size, caption}; las imágenes
+# viven una sola vez en disco aunque se suban en varios ítems o sesiones.
+# ------------------------------------------------------------
+# Por defecto junto a la base de auditorías: las auditorías guardadas citan estos
+# blobs, así que no pueden vivir en un temporal que se pierde al reiniciar.
+EVIDENCIA_DIR = os.environ.get("EVIDENCIA_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(AUDITORIAS_DB)), "evidencia"
+)
+EVIDENCIA_CUOTA_MB = float(os.environ.get("EVIDENCIA_CUOTA_MB", "2048"))
+
+# Derivados JPEG por imagen: miniatura para la galería y copia de impresión para el PDF
+# (caja de 85 × 55 mm a 200 dpi). Se generan una sola vez por sha256.
+PDF_EVIDENCIA_MM = (85, 55)
+PDF_EVIDENCIA_DPI = 200
+VARIANTES_EVIDENCIA = {
+    "miniatura": ((480, 480), 80),
+    "impresion": (tuple(round(d / 25.4 * PDF_EVIDENCIA_DPI) for d in PDF_EVIDENCIA_MM), 85),
+}
+
+# Ingesta: formatos aceptados (según el contenido, no la extensión) y límites.
+# Por encima de los límites la imagen se recodifica a JPEG (o se rechaza si
+# EVIDENCIA_SOBREDIMENSION=rechazar).
+FORMATOS_EVIDENCIA = {"JPEG", "MPO", "PNG"}
+EVIDENCIA_MAX_MB = float(os.environ.get("EVIDENCIA_MAX_MB", "8"))
+EVIDENCIA_MAX_LADO_PX = int(os.environ.get("EVIDENCIA_MAX_LADO_PX", "4000"))
+EVIDENCIA_SOBREDIMENSION = os.environ.get("EVIDENCIA_SOBREDIMENSION", "recodificar")
+EVIDENCIA_HILOS = int(os.environ.get("EVIDENCIA_HILOS", str(min(8, (os.cpu_count() or 1) + 2))))
+
+# Referencias vivas por sha256: retienen el blob frente al desalojo. Con varias
+# réplicas sobre el mismo EVIDENCIA_DIR el conteo tiene que ser compartido
+# (ReferenciasSQLite); si no, una réplica desalojaría blobs que las sesiones de
+# otra todavía citan. Una referencia sin uso en EVIDENCIA_REFS_DIAS se da por
+# muerta (la réplica que la tenía cayó sin liberarla).
+EVIDENCIA_REFS_DIAS = float(os.environ.get("EVIDENCIA_REFS_DIAS", "14"))
+# Con referencias compartidas el total en disco incluye lo que escriben las otras
+# réplicas: se vuelve a medir como mucho cada EVIDENCIA_RECUENTO_S segundos.
+EVIDENCIA_RECUENTO_S = float(os.environ.get("EVIDENCIA_RECUENTO_S", "60"))
+
+class EvidenciaInvalida(ValueError):
+    pass
+
+class ReferenciasEnMemoria:
+    def __init__(self):
+        self._refs = {}
+
+    def sumar(self, sha256: str, delta: int) -> int:
+        n = self._refs.get(sha256, 0) + delta
+        if n > 0:
+            self._refs[sha256] = n
+        else:
+            self._refs.pop(sha256, None)
+        return max(n, 0)
+
+    def vivas(self) -> set:
+        return set(self._refs)
+
+    def cerrar(self):
+        pass
+
+class ReferenciasSQLite:
+    def __init__(self, ruta: str, dias: float = EVIDENCIA_REFS_DIAS):
+        self.dias = dias
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA busy_timeout=5000")
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS referencias ("
+                "sha256 TEXT PRIMARY KEY, refs INTEGER NOT NULL, actualizado REAL NOT NULL) WITHOUT ROWID"
+            )
+
+    def sumar(self, sha256: str, delta: int) -> int:
+        with self._lock, self._con:
+            self._con.execute(
+                "INSERT INTO referencias (sha256, refs, actualizado) VALUES (?, MAX(?, 0), ?) "
+                "ON CONFLICT (sha256) DO UPDATE SET refs = MAX(refs + ?, 0), actualizado = excluded.actualizado",
+                (sha256, delta, time.time(), delta),
+            )
+            n = self._con.execute("SELECT refs FROM referencias WHERE sha256 = ?", (sha256,)).fetchone()[0]
+            if n == 0:
+                self._con.execute("DELETE FROM referencias WHERE sha256 = ?", (sha256,))
+        return n
+
+    def vivas(self) -> set:
+        with self._lock:
+            filas = self._con.execute(
+                "SELECT sha256 FROM referencias WHERE refs > 0 AND actualizado >= ?",
+                (time.time() - self.dias * 86400,),
+            ).fetchall()
+        return {f[0] for f in filas}
+
+    def cerrar(self):
+        self._con.close()
+
+# Orientación EXIF aplicada y transparencia sobre fondo blanco
+def _a_rgb(img):
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fondo = Image.new("RGB", img.size, "white")
+        fondo.paste(img, mask=img.getchannel("A"))
+        img = fondo
+    return img.convert("RGB")
+
+def _recodificar(img, lado_max: int) -> bytes:
+    from PIL import Image
+    img = _a_rgb(img)
+    img.thumbnail((lado_max, lado_max), Image.LANCZOS)
+    salida = io.BytesIO()
+    img.save(salida, "JPEG", quality=90, optimize=True)
+    return salida.getvalue()
+
+class AlmacenEvidencia:
+    # `es_persistido(sha256)`: opcional; protege del desalojo los blobs citados por auditorías guardadas.
+    # `referencias`: conteo de referencias vivas en sesiones (por defecto, en este proceso)
+    def __init__(self, raiz: str, cuota_bytes: int, es_persistido=None, referencias=None):
+        self.raiz = raiz
+        self.cuota_bytes = cuota_bytes
+        self.es_persistido = es_persistido
+        self.referencias = referencias if referencias is not None else ReferenciasEnMemoria()
+        self._compartido = not isinstance(self.referencias, ReferenciasEnMemoria)
+        self._ultimo_recuento = time.monotonic()
+        self._lock = threading.Lock()
+        self._pendientes = {}  # sha256 -> abridor del blob aún fuera del almacén (p. ej. dentro de un .zip)
+        self._lock_carga = threading.Lock()  # una carga diferida a la vez; las demás esperan y la reutilizan
+        self._dir_derivados = os.path.join(raiz, "derivados")
+        os.makedirs(self._dir_derivados, exist_ok=True)
+        # Blobs y derivados cuentan para la cuota
+        self._total = sum(os.path.getsize(p) for p in (*self._blobs(), *self._derivados()))
+
+    def _blobs(self):
+        for sub in os.scandir(self.raiz):
+            if sub.is_dir() and len(sub.name) == 2:
+                for f in os.scandir(sub.path):
+                    if f.is_file() and not f.name.endswith(".tmp"):
+                        yield f.path
+
+    def _derivados(self):
+        for f in os.scandir(self._dir_derivados):
+            if f.is_file() and not f.name.endswith(".tmp"):
+                yield f.path
+
+    def ruta(self, sha256: str) -> str:
+        return os.path.join(self.raiz, sha256[:2], sha256)
+
+    def guardar(self, datos: bytes) -> str:
+        sha256 = hashlib.sha256(datos).hexdigest()
+        destino = self.ruta(sha256)
+        with self._lock:
+            if os.path.exists(destino):
+                os.utime(destino)
+            else:
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                tmp = f"{destino}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as fh:
+                    fh.write(datos)
+                os.replace(tmp, destino)
+                self._total += len(datos)
+            self.referencias.sumar(sha256, 1)
+            self._desalojar()
+        return sha256
+
+    def abrir(self, sha256: str) -> str:
+        # Devuelve la ruta (st.image y ReportLab leen directo del disco) y marca el uso para LRU
+        destino = self.ruta(sha256)
+        try:
+            os.utime(destino)
+        except FileNotFoundError:
+            if sha256 in self._pendientes:
+                with self._lock_carga:
+                    if not os.path.exists(destino):
+                        self._materializar(sha256)
+        return destino
+
+    def disponible(self, sha256: str) -> bool:
+        return sha256 in self._pendientes or os.path.exists(self.ruta(sha256))
+
+    # Carga diferida: `abridor()` es un context manager que entrega el flujo binario
+    # del blob; se copia al almacén por bloques la primera vez que se abre.
+    def registrar_pendiente(self, sha256: str, abridor):
+        with self._lock:
+            if not os.path.exists(self.ruta(sha256)):
+                self._pendientes[sha256] = abridor
+
+    # Requiere self._lock_carga; descarta el blob si no coincide con su sha256
+    def _materializar(self, sha256: str):
+        abridor = self._pendientes.get(sha256)
+        if abridor is None:
+            return
+        destino = self.ruta(sha256)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        tmp = f"{destino}.{threading.get_ident()}.tmp"
+        h, tam = hashlib.sha256(), 0
+        try:
+            with abridor() as origen, open(tmp, "wb") as fh:
+                for bloque in iter(lambda: origen.read(1024 * 1024), b""):
+                    h.update(bloque)
+                    fh.write(bloque)
+                    tam += len(bloque)
+            valido = h.hexdigest() == sha256
+        except Exception:
+            valido = False
+        with self._lock:
+            self._pendientes.pop(sha256, None)
+            if not valido:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                return
+            os.replace(tmp, destino)
+            self._total += tam
+            self._desalojar()
+
+    def ruta_derivado(self, sha256: str, variante: str) -> str:
+        return os.path.join(self._dir_derivados, f"{sha256}.{variante}.jpg")
+
+    # Reducción con orientación EXIF aplicada; memoizada en disco por sha256 + variante.
+    # Si la imagen no se puede procesar se devuelve el original.
+    def derivado(self, sha256: str, variante: str) -> str:
+        try:
+            return self._generar_derivado(sha256, variante)
+        except Exception:
+            return self.abrir(sha256)
+
+    def _generar_derivado(self, sha256: str, variante: str) -> str:
+        destino = self.ruta_derivado(sha256, variante)
+        if os.path.exists(destino):
+            return destino
+        from PIL import Image  # importación diferida: solo al procesar imágenes
+        caja, calidad = VARIANTES_EVIDENCIA[variante]
+        with Image.open(self.abrir(sha256)) as img:
+            img.draft("RGB", caja)  # decodificación reducida en JPEG
+            img = _a_rgb(img)
+            img.thumbnail(caja, Image.LANCZOS)
+            tmp = f"{destino}.{threading.get_ident()}.tmp"
+            try:
+                img.save(tmp, "JPEG", quality=calidad, optimize=True)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        tam = os.path.getsize(tmp)
+        with self._lock:
+            # Otro hilo pudo generar el mismo derivado mientras tanto: se reemplaza sin contarlo dos veces
+            previo = os.path.getsize(destino) if os.path.exists(destino) else 0
+            os.replace(tmp, destino)
+            self._total += tam - previo
+            self._desalojar()
+        return destino
+
+    def preparar_derivados(self, sha256: str):
+        for variante in VARIANTES_EVIDENCIA:
+            self.derivado(sha256, variante)
+
+    # Valida el contenido (formato real, integridad, dimensiones), recodifica o rechaza
+    # lo sobredimensionado, guarda y genera los derivados. Devuelve la referencia
+    # {name, sha256, size}; un archivo inválido lanza EvidenciaInvalida sin dejar rastro.
+    def ingerir(self, nombre: str, datos: bytes) -> dict:
+        from PIL import Image  # importación diferida: solo al procesar imágenes
+        try:
+            with Image.open(io.BytesIO(datos)) as img:
+                formato, (ancho, alto) = img.format, img.size
+                img.verify()
+        except Image.DecompressionBombError:
+            raise EvidenciaInvalida("la imagen declara demasiados píxeles")
+        except Exception:
+            raise EvidenciaInvalida("no es una imagen JPG/PNG válida o está dañada")
+        if formato not in FORMATOS_EVIDENCIA:
+            raise EvidenciaInvalida(f"formato {formato} no admitido (solo JPG/PNG)")
+
+        excede = len(datos) > EVIDENCIA_MAX_MB * 1024 * 1024 or max(ancho, alto) > EVIDENCIA_MAX_LADO_PX
+        if excede and EVIDENCIA_SOBREDIMENSION == "rechazar":
+            raise EvidenciaInvalida(
+                f"excede {EVIDENCIA_MAX_MB:g} MB o {EVIDENCIA_MAX_LADO_PX} px ({len(datos) / 1e6:.1f} MB, {ancho}×{alto} px)"
+            )
+        if excede:
+            try:
+                with Image.open(io.BytesIO(datos)) as img:
+                    datos = _recodificar(img, EVIDENCIA_MAX_LADO_PX)
+            except Exception:
+                raise EvidenciaInvalida("la imagen está dañada (no se pudo decodificar)")
+
+        sha256 = self.guardar(datos)
+        try:
+            for variante in VARIANTES_EVIDENCIA:
+                self._generar_derivado(sha256, variante)
+        except Exception:
+            self._descartar(sha256)
+            raise EvidenciaInvalida("la imagen está dañada (no se pudo decodificar)")
+        return {"name": nombre, "sha256": sha256, "size": len(datos)}
+
+    # Ingesta concurrente: hash, validación, recodificación y miniaturas en un pool
+    # de hilos (Pillow y hashlib liberan el GIL). Produce (índice, nombre, ref, error)
+    # a medida que cada archivo termina, para mostrar progreso y errores por archivo.
+    def ingerir_en_paralelo(self, archivos, hilos: int = EVIDENCIA_HILOS):
+        with ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="evidencia") as pool:
+            futuros = {pool.submit(self.ingerir, nombre, datos): (i, nombre) for i, (nombre, datos) in enumerate(archivos)}
+            for futuro in as_completed(futuros):
+                i, nombre = futuros[futuro]
+                try:
+                    yield i, nombre, futuro.result(), None
+                except EvidenciaInvalida as e:
+                    yield i, nombre, None, str(e)
+                except Exception as e:
+                    yield i, nombre, None, f"{type(e).__name__}: {e}"
+
+    def leer(self, sha256: str) -> bytes:
+        with open(self.abrir(sha256), "rb") as fh:
+            return fh.read()
+
+    def retener(self, sha256: str):
+        with self._lock:
+            self.referencias.sumar(sha256, 1)
+
+    def liberar(self, sha256: str):
+        with self._lock:
+            self.referencias.sumar(sha256, -1)
+            self._desalojar()
+
+    # Deshace el guardar de una ingesta fallida: si nadie más cita el blob, se borra con sus derivados
+    def _descartar(self, sha256: str):
+        with self._lock:
+            if self.referencias.sumar(sha256, -1) > 0:
+                return
+            if self.es_persistido is not None and self.es_persistido(sha256):
+                return
+            self._borrar(self.ruta(sha256))
+
+    # Borra un blob y sus derivados descontándolos del total; requiere self._lock
+    def _borrar(self, ruta: str):
+        sha256 = os.path.basename(ruta)
+        for p in (ruta, *(self.ruta_derivado(sha256, v) for v in VARIANTES_EVIDENCIA)):
+            try:
+                tam = os.path.getsize(p)
+                os.remove(p)
+                self._total -= tam
+            except FileNotFoundError:
+                pass
+
+    # LRU (por mtime) sobre blobs huérfanos hasta volver a la cuota; requiere self._lock
+    def _desalojar(self):
+        ahora = time.monotonic()
+        recontar = self._compartido and ahora - self._ultimo_recuento >= EVIDENCIA_RECUENTO_S
+        if self._total <= self.cuota_bytes and not recontar:
+            return
+        self._ultimo_recuento = ahora
+        # El total se recalcula del disco: otras réplicas sobre el mismo directorio también agregan y desalojan
+        blobs = []
+        for p in self._blobs():
+            try:
+                info = os.stat(p)
+            except FileNotFoundError:
+                continue
+            blobs.append((info.st_mtime, info.st_size, p))
+        derivados = 0
+        for p in self._derivados():
+            try:
+                derivados += os.path.getsize(p)
+            except FileNotFoundError:
+                pass
+        self._total = sum(tam for _, tam, _ in blobs) + derivados
+        vivas = self.referencias.vivas()
+        huerfanos = sorted((mtime, p) for mtime, _, p in blobs if os.path.basename(p) not in vivas)
+        for _, p in huerfanos:
+            if self._total <= self.cuota_bytes:
+                break
+            if self.es_persistido is not None and self.es_persistido(os.path.basename(p)):
+                continue
+            self._borrar(p)
@@ -0,0 +1,121 @@
+# ------------------------------------------------------------
+# EXPORTACIÓN TABULAR DE RESULTADOS POR ÍTEM (CSV / XLSX)
+#
+#   python -m etiquetado.exportacion SALIDA.csv|SALIDA.xlsx [--db auditorias.db]
+#          [--proveedor X] [--producto X] [--invima-registro X] [--responsable X]
+#          [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD] [--estado yes|no|na|none] [--categoria "..."]
+#
+# Una fila por (auditoría, ítem). Las filas salen de la base por páginas
+# (BaseAuditorias.iterar_resultados) y se escriben a medida que llegan: ni la
+# consulta ni el archivo se arman completos en memoria. XLSX usa el modo de
+# solo escritura de openpyxl y abre otra hoja al llegar al límite de filas.
+# ------------------------------------------------------------
+import io
+import os
+import sys
+import csv
+import argparse
+
+from .persistencia import BaseAuditorias, AUDITORIAS_DB, ESTADOS
+
+# Columna de la fila → encabezado del archivo
+COLUMNAS_EXPORTACION = {
+    "auditoria_id": "Auditoría",
+    "fecha": "Fecha",
+    "producto": "Producto",
+    "proveedor": "Proveedor",
+    "invima_registro": "Registro INVIMA",
+    "responsable": "Responsable",
+    "categoria": "Categoría",
+    "titulo": "Ítem",
+    "referencia": "Referencia normativa",
+    "estado": "Estado",
+    "nota": "Observación",
+}
+ESTADO_HUMANO = {"yes": "Cumple", "no": "No cumple", "na": "No aplica", "none": "Sin responder"}
+FILAS_MAX_HOJA_XLSX = 1_048_576 - 1  # límite de Excel menos el encabezado
+FORMATOS_EXPORTACION = ("csv", "xlsx")
+# Tope de la descarga desde la app (el archivo pasa por memoria); más grande, use la CLI
+EXPORTACION_DESCARGA_MAX_MB = float(os.environ.get("EXPORTACION_DESCARGA_MAX_MB", "100"))
+# Un texto que empieza así se abriría como fórmula en Excel / LibreOffice
+INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+# Textos con inicio de fórmula (nombres, notas...) salen como texto literal, con ' adelante
+def _celda(valor):
+    return "'" + valor if isinstance(valor, str) and valor.startswith(INICIO_FORMULA) else valor
+
+def _valores(fila: dict) -> list:
+    return [_celda(ESTADO_HUMANO.get(fila[c], fila[c]) if c == "estado" else fila[c]) for c in COLUMNAS_EXPORTACION]
+
+# destino: ruta o archivo binario. Devuelve el número de filas escritas.
+def exportar_csv(filas, destino) -> int:
+    propio = isinstance(destino, (str, os.PathLike))
+    binario = open(destino, "wb") if propio else destino
+    # utf-8-sig: Excel abre el CSV con tildes correctas (como las demás descargas de la app)
+    texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="", write_through=True)
+    n = 0
+    try:
+        escritor = csv.writer(texto)
+        escritor.writerow(COLUMNAS_EXPORTACION.values())
+        for n, fila in enumerate(filas, start=1):
+            escritor.writerow(_valores(fila))
+        texto.flush()
+    finally:
+        texto.detach()
+        if propio:
+            binario.close()
+    return n
+
+def exportar_xlsx(filas, destino) -> int:
+    from openpyxl import Workbook  # importación diferida: solo al exportar a Excel
+    libro = Workbook(write_only=True)
+    hoja, en_hoja, n = None, FILAS_MAX_HOJA_XLSX, 0
+    for fila in filas:
+        if en_hoja >= FILAS_MAX_HOJA_XLSX:
+            hoja = libro.create_sheet(f"Resultados {len(libro.worksheets) + 1}" if libro.worksheets else "Resultados")
+            hoja.append(list(COLUMNAS_EXPORTACION.values()))
+            en_hoja = 0
+        hoja.append(_valores(fila))
+        en_hoja += 1
+        n += 1
+    if hoja is None:
+        libro.create_sheet("Resultados").append(list(COLUMNAS_EXPORTACION.values()))
+    libro.save(destino)
+    return n
+
+def exportar_resultados(db: BaseAuditorias, destino, formato: str = "csv", **filtros) -> int:
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato desconocido: {formato} (use csv o xlsx)")
+    filas = db.iterar_resultados(**filtros)
+    return exportar_csv(filas, destino) if formato == "csv" else exportar_xlsx(filas, destino)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m etiquetado.exportacion",
+        description="Exporta los resultados por ítem de las auditorías guardadas a CSV o XLSX."
+    )
+    parser.add_argument("salida", help="archivo .csv o .xlsx")
+    parser.add_argument("--db", default=AUDITORIAS_DB, help="base de auditorías de la app")
+    for campo in ("proveedor", "producto", "invima-registro", "responsable", "desde", "hasta", "categoria"):
+        parser.add_argument(f"--{campo}")
+    parser.add_argument("--estado", choices=ESTADOS)
+    args = parser.parse_args(argv)
+
+    formato = os.path.splitext(args.salida)[1].lower().lstrip(".")
+    if formato not in FORMATOS_EXPORTACION:
+        print("La salida debe terminar en .csv o .xlsx", file=sys.stderr)
+        return 1
+    filtros = {
+        c: getattr(args, c) for c in
+        ("proveedor", "producto", "invima_registro", "responsable", "desde", "hasta", "estado", "categoria")
+    }
+    db = BaseAuditorias(args.db)
+    try:
+        n = exportar_resultados(db, args.salida, formato, **filtros)
+    finally:
+        db.cerrar()
+    print(f"Filas exportadas: {n} → {args.salida}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import json
+import hashlib
+from xml.sax.saxutils import escape
+from io import BytesIO
+
+from .checklist import CATEGORIAS
+from .evidencia import AlmacenEvidencia, PDF_EVIDENCIA_MM
+from .instrumentacion import tramo
+
+# ------------------------------------------------------------
+# PDF (A4 horizontal) — incluye referencias y evidencias (página nueva)
+# ------------------------------------------------------------
+def split_observation_text_pdf(text: str, chunk: int = 100) -> str:
+    if not text:
+        return ""
+    s = str(text)
+    if len(s) <= chunk:
+        return s
+    parts = [s[i:i+chunk] for i in range(0, len(s), chunk)]
+    return "\\n".join(parts)
+
+def huella_auditoria(registro: dict) -> str:
+    return hashlib.sha256(json.dumps(registro, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# `registro`: ver registro_auditoria() en App.py; `almacen` resuelve las referencias de evidencia.
+# ReportLab se importa aquí y no al cargar el módulo: solo se paga cuando se pide un informe.
+def generar_pdf(registro: dict, almacen: AlmacenEvidencia):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image as RLPlatypusImage
+
+    status = registro["status"]
+    notas = registro["notas"]
+    solo_no = registro["solo_no"]
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=landscape(A4),
+        leftMargin=8*mm, rightMargin=8*mm,
+        topMargin=8*mm, bottomMargin=8*mm
+    )
+    styles = getSampleStyleSheet()
+    style_header = ParagraphStyle("header", parent=styles["Normal"], fontSize=9, leading=11)
+    style_cell   = ParagraphStyle("cell",   parent=styles["Normal"], fontSize=8, leading=10)
+
+    with tramo("pdf.historia"):
+        story = []
+        fecha_str = registro["fecha"]
+        inv_str = registro["invima_registro"] or "-"
+        inv_estado = "ACTIVO y coincidente" if registro["invima_estado_activo"] else "No verificado / No activo / No coincide"
+        portada = (
+            f"<b>Informe de verificación — Resoluciones 810/2021, 2492/2022 y 254/2023</b><br/>"
+            f"<b>Fecha:</b> {fecha_str} &nbsp;&nbsp; "
+            f"<b>Producto:</b> {registro['producto'] or '-'} &nbsp;&nbsp; "
+            f"<b>Proveedor:</b> {registro['proveedor'] or '-'} &nbsp;&nbsp; "
+            f"<b>Responsable:</b> {registro['responsable'] or '-'} &nbsp;&nbsp; "
+            f"<b>Registro INVIMA:</b> {inv_str} &nbsp;&nbsp; <b>Estado en portal:</b> {inv_estado}"
+        )
+        if registro["invima_url"].strip():
+            portada += f" &nbsp;&nbsp; <b>Consulta:</b> {registro['invima_url']}"
+        story.append(Paragraph(portada, style_header))
+        story.append(Spacer(1, 3*mm))
+        intro_pdf = (
+            "Este checklist se basa exclusivamente en las Resoluciones 810 de 2021, 2492 de 2022 y 254 de 2023, "
+            "que establecen los requisitos técnicos para el etiquetado nutricional y frontal de advertencia en alimentos "
+            "y bebidas envasadas destinados al consumo humano en Colombia."
+        )
+        story.append(Paragraph(intro_pdf, style_header))
+        story.append(Spacer(1, 5*mm))
+
+        yes_c = sum(1 for v in status.values() if v == "yes")
+        no_c = sum(1 for v in status.values() if v == "no")
+        ans_c = yes_c + no_c
+        pct = round((yes_c / ans_c * 100), 1) if ans_c > 0 else 0.0
+        story.append(Paragraph(f"<b>Cumplimiento (sobre ítems contestados):</b> {pct}%", style_header))
+        story.append(Spacer(1, 4*mm))
+
+        if solo_no:
+            hay_no = any(v == "no" for v in status.values())
+            if not hay_no:
+                story.append(Paragraph(
+                    "<b>No se registran ítems en estado NO CUMPLE.</b>",
+                    style_header
+                ))
+                with tramo("pdf.build"):
+                    doc.build(story)
+                buf.seek(0)
+                return buf
+
+        # Tabla principal (Ítem, Estado, Observación, Referencia)
+        data = [["Ítem", "Estado", "Observación", "Referencia"]]
+        for items in CATEGORIAS.values():
+            for (titulo, _, referencia) in items:
+                estado_val = status.get(titulo, "none")
+
+                if solo_no and estado_val != "no":
+                    continue
+                
+                estado_humano = (
+                    "Cumple" if estado_val == "yes"
+                    else "No cumple" if estado_val == "no"
+                    else "No aplica" if estado_val == "na"
+                    else "Sin responder"
+                )
+                obs = notas.get(titulo, "") or "-"
+                if obs != "-":
+                    obs = split_observation_text_pdf(obs, chunk=100)
+                    obs = escape(obs)  # 👈 FIX CLAVE
+                
+                data.append([
+                    Paragraph(escape(str(titulo)),        style_cell),
+                    Paragraph(escape(str(estado_humano)), style_cell),
+                    Paragraph(obs,                        style_cell),
+                    Paragraph(escape(str(referencia)),    style_cell),
+                ])
+
+
+        col_widths = [100*mm, 25*mm, 85*mm, 55*mm]
+        tbl = Table(data, colWidths=col_widths, repeatRows=1)
+        tbl.setStyle(TableStyle([
+            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#f2f2f2")),
+            ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
+            ("FONTSIZE",   (0,0), (-1,0), 9),
+            ("GRID",       (0,0), (-1,-1), 0.25, colors.grey),
+            ("VALIGN",     (0,0), (-1,-1), "TOP"),
+            ("LEFTPADDING",(0,0), (-1,-1), 3),
+            ("RIGHTPADDING",(0,0), (-1,-1), 3),
+        ]))
+        story.append(tbl)
+
+    # Página nueva para evidencias — FIX definitivo: BytesIO directo en RLPlatypusImage
+    n_imagenes = sum(len(v) for v in registro["evidencia"].values())
+    with tramo("pdf.imagenes", imagenes=n_imagenes):
+        if n_imagenes:
+            story.append(PageBreak())
+            story.append(Paragraph("<b>Evidencia fotográfica</b>", style_header))
+            story.append(Spacer(1, 3*mm))
+
+            for titulo, ev_list in registro["evidencia"].items():
+                if not ev_list:
+                    continue
+                story.append(Paragraph(f"<b>Ítem:</b> {titulo}", style_header))
+                story.append(Paragraph("<b>Evidencia de incumplimiento:</b>", style_header))
+                story.append(Spacer(1, 2*mm))
+                for idx, ev in enumerate(ev_list):
+                    try:
+                        # Copia de impresión (200 dpi) en disco; ReportLab la lee sin copias intermedias
+                        story.append(RLPlatypusImage(
+                            almacen.derivado(ev["sha256"], "impresion"),
+                            width=PDF_EVIDENCIA_MM[0]*mm, height=PDF_EVIDENCIA_MM[1]*mm
+                        ))
+                        if ev.get("caption"):
+                            story.append(Paragraph(ev["caption"], style_cell))
+                        story.append(Spacer(1, 3*mm))
+                    except Exception as e:
+                        story.append(Paragraph(f"<i>⚠️ Error al cargar imagen {ev.get('name', '')}: {e}</i>", style_cell))
+                story.append(Spacer(1, 5*mm))
+
+    with tramo("pdf.build", imagenes=n_imagenes):
+        doc.build(story)
+    buf.seek(0)
+    return buf
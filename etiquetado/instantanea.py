@@ -0,0 +1,124 @@
+# ------------------------------------------------------------
+# INSTANTÁNEA DE AUDITORÍA (.zip)
+#   manifiesto.json   metadatos, estados, notas, referencias de evidencia y
+#                     entradas de las herramientas (incluye tablas)
+#   evidencia/<sha>   cada imagen una sola vez, en binario tal cual (sin base64
+#                     ni recompresión: JPG/PNG ya están comprimidos)
+# Exportar copia los blobs por bloques desde el almacén; abrir lee solo el
+# manifiesto y deja la evidencia dentro del zip hasta que alguien la pide.
+# ------------------------------------------------------------
+import os
+import json
+import time
+import hashlib
+import uuid
+import shutil
+import zipfile
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+FORMATO_INSTANTANEA = 1
+MANIFIESTO = "manifiesto.json"
+DIR_EVIDENCIA = "evidencia/"
+BLOQUE_BYTES = 1024 * 1024
+# Instantáneas abiertas en la app: el zip queda en disco mientras su evidencia se carga bajo demanda
+INSTANTANEAS_DIR = os.environ.get("INSTANTANEAS_DIR", os.path.join(tempfile.gettempdir(), "instantaneas_810"))
+INSTANTANEAS_DIAS = float(os.environ.get("INSTANTANEAS_DIAS", "7"))
+
+class InstantaneaInvalida(ValueError):
+    pass
+
+# Entradas → JSON: las tablas (data_editor) viajan como {"__tabla__": orient="split"}
+def codificar_entrada(valor):
+    if isinstance(valor, pd.DataFrame):
+        return {"__tabla__": json.loads(valor.to_json(orient="split", index=False, force_ascii=False))}
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if hasattr(valor, "item"):  # escalares NumPy
+        return valor.item()
+    return valor
+
+def decodificar_entrada(valor):
+    if isinstance(valor, dict) and "__tabla__" in valor:
+        t = valor["__tabla__"]
+        return pd.DataFrame(t["data"], columns=t["columns"])
+    return valor
+
+# registro: formato de registro_auditoria() en App.py; entradas: {clave de widget: valor}
+# `fecha_auditoria`: la de la auditoría original (AAAA-MM-DD); al abrir la instantánea
+# se conserva esa fecha en lugar de la del día en que se abre.
+def exportar_instantanea(destino, registro: dict, entradas: dict, almacen, fecha_auditoria: str = None) -> dict:
+    shas = list(dict.fromkeys(ev["sha256"] for evs in registro["evidencia"].values() for ev in evs))
+    disponibles = [s for s in shas if almacen.disponible(s)]
+    manifiesto = {
+        "formato": FORMATO_INSTANTANEA,
+        "creada": datetime.now().isoformat(timespec="seconds"),
+        "fecha_auditoria": fecha_auditoria or registro.get("fecha_auditoria") or registro.get("fecha"),
+        "registro": registro,
+        "entradas": {k: codificar_entrada(v) for k, v in entradas.items()},
+        "evidencia": {s: DIR_EVIDENCIA + s for s in disponibles},
+        # Blobs ya desalojados del almacén: la referencia viaja, la imagen no
+        "faltantes": sorted(set(shas) - set(disponibles)),
+    }
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(MANIFIESTO, json.dumps(manifiesto, ensure_ascii=False, default=codificar_entrada))
+        for sha256 in disponibles:
+            info = zipfile.ZipInfo(DIR_EVIDENCIA + sha256, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with open(almacen.abrir(sha256), "rb") as origen, zf.open(info, "w", force_zip64=True) as salida:
+                shutil.copyfileobj(origen, salida, BLOQUE_BYTES)
+    return manifiesto
+
+def _fecha_valida(texto) -> str:
+    try:
+        return date.fromisoformat(texto).isoformat() if isinstance(texto, str) else None
+    except ValueError:
+        return None
+
+# Solo lee el directorio central del zip y el manifiesto. `huella` (sha256 del
+# manifiesto) identifica la instantánea: abrir dos veces el mismo archivo da la misma.
+def leer_instantanea(ruta) -> dict:
+    try:
+        with zipfile.ZipFile(ruta) as zf:
+            crudo = zf.read(MANIFIESTO)
+            manifiesto = json.loads(crudo)
+            miembros = set(zf.namelist())
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise InstantaneaInvalida(f"no es una instantánea de auditoría válida ({e})")
+    if not isinstance(manifiesto, dict) or manifiesto.get("formato") != FORMATO_INSTANTANEA:
+        formato = manifiesto.get("formato") if isinstance(manifiesto, dict) else None
+        raise InstantaneaInvalida(f"formato de instantánea no soportado: {formato}")
+    manifiesto["huella"] = hashlib.sha256(crudo).hexdigest()
+    # Instantáneas anteriores sin fecha_auditoria: la de emisión del registro
+    registro = manifiesto.get("registro") or {}
+    manifiesto["fecha_auditoria"] = (
+        _fecha_valida(manifiesto.get("fecha_auditoria")) or _fecha_valida(registro.get("fecha"))
+    )
+    manifiesto["entradas"] = {k: decodificar_entrada(v) for k, v in manifiesto.get("entradas", {}).items()}
+    manifiesto["evidencia"] = {s: m for s, m in manifiesto.get("evidencia", {}).items() if m in miembros}
+    return manifiesto
+
+@contextmanager
+def abrir_miembro(ruta, miembro: str):
+    with zipfile.ZipFile(ruta) as zf, zf.open(miembro) as fh:
+        yield fh
+
+# Copia por bloques un archivo subido a INSTANTANEAS_DIR y devuelve la ruta;
+# de paso borra las instantáneas de más de INSTANTANEAS_DIAS días.
+def guardar_en_disco(origen) -> str:
+    os.makedirs(INSTANTANEAS_DIR, exist_ok=True)
+    limite = time.time() - INSTANTANEAS_DIAS * 86400
+    for f in os.scandir(INSTANTANEAS_DIR):
+        if f.is_file() and f.stat().st_mtime < limite:
+            try:
+                os.remove(f.path)
+            except FileNotFoundError:
+                pass
+    ruta = os.path.join(INSTANTANEAS_DIR, f"{uuid.uuid4().hex}.zip")
+    origen.seek(0)
+    with open(ruta, "wb") as fh:
+        shutil.copyfileobj(origen, fh, BLOQUE_BYTES)
+    return ruta
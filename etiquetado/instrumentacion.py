@@ -0,0 +1,102 @@
+# ------------------------------------------------------------
+# INSTRUMENTACIÓN — tramos de tiempo para diagnóstico de lentitud
+# Un tramo se registra si hay un colector activo (panel de diagnóstico de
+# la sesión o recolectar()) o si ETIQUETADO_TRAZAS=1. Cada tramo registrado
+# se escribe además como línea JSON en el logger "etiquetado.trazas"
+# (con ETIQUETADO_TRAZAS=1 el logger escribe a stderr).
+# Sin colector ni variable de entorno, tramo() devuelve un contexto nulo
+# compartido: el costo es una búsqueda en un ContextVar.
+# ------------------------------------------------------------
+import os
+import json
+import time
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+
+TRAZAS_ENV = os.environ.get("ETIQUETADO_TRAZAS", "") == "1"
+
+logger = logging.getLogger("etiquetado.trazas")
+if TRAZAS_ENV and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+_colector = contextvars.ContextVar("colector_trazas", default=None)
+
+class _TramoNulo:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULO = _TramoNulo()
+
+class _Tramo:
+    __slots__ = ("nombre", "atributos", "colector", "inicio")
+
+    def __init__(self, nombre: str, atributos: dict, colector):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.colector = colector
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        ms = (time.perf_counter() - self.inicio) * 1000
+        evento = {"tramo": self.nombre, "ms": round(ms, 3), **self.atributos}
+        if tipo is not None:
+            evento["error"] = tipo.__name__
+        if self.colector is not None:
+            self.colector.append(evento)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(evento, ensure_ascii=False, default=str))
+        return False
+
+# `colector`: lista/deque explícita; si se omite se usa el de recolectar()
+def tramo(nombre: str, colector=None, **atributos):
+    colector = colector if colector is not None else _colector.get()
+    if colector is None and not TRAZAS_ENV:
+        return _NULO
+    return _Tramo(nombre, atributos, colector)
+
+@contextmanager
+def recolectar(colector=None):
+    colector = colector if colector is not None else []
+    token = _colector.set(colector)
+    try:
+        yield colector
+    finally:
+        _colector.reset(token)
+
+# Decorador: mide cada llamada; `obtener_colector` se evalúa en cada llamada.
+# El primer argumento posicional, si es texto, se registra como "detalle".
+def cronometrado(nombre: str, obtener_colector=None):
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            colector = obtener_colector() if obtener_colector is not None else None
+            atributos = {"detalle": args[0]} if args and isinstance(args[0], str) else {}
+            with tramo(nombre, colector, **atributos):
+                return fn(*args, **kwargs)
+        return envoltura
+    return decorador
+
+# Tamaño aproximado de cada clave de una sesión (bytes serializados con pickle)
+def estimar_bytes_sesion(estado) -> dict:
+    import pickle
+    import sys
+
+    tamanos = {}
+    for clave in list(estado.keys()):
+        valor = estado[clave]
+        try:
+            tamanos[str(clave)] = len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            tamanos[str(clave)] = sys.getsizeof(valor)
+    return tamanos
@@ -0,0 +1,74 @@
+# ------------------------------------------------------------
+# GENERACIÓN MASIVA DE INFORMES PDF (sin interfaz)
+#
+#   python -m etiquetado.lote_informes AUDITORIAS_DIR SALIDA_DIR [--procesos N] [--evidencia-dir DIR]
+#
+# Cada *.json de AUDITORIAS_DIR es un registro guardado desde la app
+# ("Descargar auditoría (JSON)"). Los PDF se construyen en paralelo en un
+# pool de procesos; un archivo con error no detiene el lote.
+# ------------------------------------------------------------
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .evidencia import AlmacenEvidencia, EVIDENCIA_DIR, EVIDENCIA_CUOTA_MB
+from .informe import generar_pdf
+
+_almacen = None
+
+def _iniciar_proceso(evidencia_dir: str):
+    global _almacen
+    _almacen = AlmacenEvidencia(evidencia_dir, int(EVIDENCIA_CUOTA_MB * 1024 * 1024))
+
+def renderizar_auditoria(ruta_json: str, salida_dir: str) -> str:
+    with open(ruta_json, encoding="utf-8") as fh:
+        registro = json.load(fh)
+    destino = os.path.join(salida_dir, os.path.splitext(os.path.basename(ruta_json))[0] + ".pdf")
+    tmp = destino + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(generar_pdf(registro, _almacen).getvalue())
+    os.replace(tmp, destino)
+    return destino
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m etiquetado.lote_informes",
+        description="Genera los informes PDF de un directorio de auditorías guardadas (JSON)."
+    )
+    parser.add_argument("auditorias_dir")
+    parser.add_argument("salida_dir")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="procesos en paralelo (por defecto: núcleos)")
+    parser.add_argument("--evidencia-dir", default=EVIDENCIA_DIR, help="almacén de evidencia de la app")
+    args = parser.parse_args(argv)
+
+    rutas = sorted(
+        os.path.join(args.auditorias_dir, n) for n in os.listdir(args.auditorias_dir) if n.lower().endswith(".json")
+    )
+    if not rutas:
+        print(f"No hay auditorías (*.json) en {args.auditorias_dir}", file=sys.stderr)
+        return 1
+    os.makedirs(args.salida_dir, exist_ok=True)
+
+    errores = 0
+    with ProcessPoolExecutor(
+        max_workers=max(1, args.procesos),
+        initializer=_iniciar_proceso,
+        initargs=(args.evidencia_dir,),
+    ) as pool:
+        futuros = {pool.submit(renderizar_auditoria, r, args.salida_dir): r for r in rutas}
+        for n, fut in enumerate(as_completed(futuros), start=1):
+            ruta = futuros[fut]
+            try:
+                destino = fut.result()
+                print(f"[{n}/{len(rutas)}] OK    {os.path.basename(ruta)} → {destino}", file=sys.stderr)
+            except Exception as e:
+                errores += 1
+                print(f"[{n}/{len(rutas)}] ERROR {os.path.basename(ruta)}: {e}", file=sys.stderr)
+
+    print(f"Informes generados: {len(rutas) - errores} — con error: {errores}", file=sys.stderr)
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# ------------------------------------------------------------
+# NORMATIVA VERSIONADA — umbrales de sellos, calorías, bromatológico y tamaño por fecha
+# Los valores viven en reglamentos.json (o en REGLAMENTOS_ARCHIVO): una lista
+# de versiones con la fecha en que cada una entra en vigencia. La primera
+# versión es completa; las siguientes declaran solo lo que cambia y heredan
+# el resto de la anterior.
+#
+# El archivo se compila una vez por proceso en arreglos NumPy con una
+# posición por versión. Los motores de reglas eligen la versión de cada fila
+# con una búsqueda binaria sobre las fechas de vigencia y toman los umbrales
+# por indexación: un portafolio con fechas mezcladas se evalúa en una sola
+# llamada y cada veredicto lleva la versión que se le aplicó.
+# ------------------------------------------------------------
+import os
+import json
+import copy
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+REGLAMENTOS_ARCHIVO = os.environ.get(
+    "REGLAMENTOS_ARCHIVO", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reglamentos.json")
+)
+FORMATO_REGLAMENTOS = 1
+
+# Campos numéricos obligatorios de cada versión (ya aplicada la herencia)
+CAMPOS_REGLAMENTO = {
+    "sellos": (
+        "azucares_pct_kcal", "grasas_saturadas_pct_kcal", "grasas_trans_pct_kcal",
+        "sodio_mg_por_kcal", "sodio_mg", "sodio_bebida_sin_kcal_mg",
+    ),
+    "calorias": ("tolerancia_pct",),
+    "bromatologico": ("tolerancia_pct",),
+    "tamano": ("area_min_cm2", "area_max_tabla_cm2", "lado_fijo_cm", "ads_fraccion"),
+}
+CAMPOS_ATWATER = ("carbohidratos_g", "proteinas_g", "grasas_g")
+# aproximacion.cero_menor_que: {clave de nutriente: cantidad}, en la primera unidad del
+# esquema de nutrientes (kcal, g o mg). Por debajo, el valor puede declararse como 0
+# (Art. 8). Un nutriente ausente no tiene umbral.
+
+class ReglamentoInvalido(ValueError):
+    pass
+
+def _heredar(base: dict, cambios: dict) -> dict:
+    res = copy.deepcopy(base)
+    for k, v in cambios.items():
+        res[k] = _heredar(res[k], v) if isinstance(v, dict) and isinstance(res.get(k), dict) else copy.deepcopy(v)
+    return res
+
+def _numero(version: dict, seccion: str, campo: str, valor) -> float:
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or valor < 0:
+        raise ReglamentoInvalido(f"{version.get('version')}: {seccion}.{campo} debe ser un número ≥ 0")
+    return float(valor)
+
+def _validar(version: dict):
+    nombre = version.get("version")
+    for seccion, campos in CAMPOS_REGLAMENTO.items():
+        for campo in campos:
+            if campo not in version.get(seccion, {}):
+                raise ReglamentoInvalido(f"{nombre}: falta {seccion}.{campo}")
+            _numero(version, seccion, campo, version[seccion][campo])
+    factores = version["calorias"].get("factores_atwater", {})
+    for campo in CAMPOS_ATWATER:
+        if campo not in factores:
+            raise ReglamentoInvalido(f"{nombre}: falta calorias.factores_atwater.{campo}")
+        _numero(version, "calorias.factores_atwater", campo, factores[campo])
+    cero = version.get("aproximacion", {}).get("cero_menor_que", {})
+    if not isinstance(cero, dict):
+        raise ReglamentoInvalido(f"{nombre}: aproximacion.cero_menor_que debe ser un objeto {{nutriente: cantidad}}")
+    for clave, valor in cero.items():
+        _numero(version, "aproximacion.cero_menor_que", clave, valor)
+    tamano = version["tamano"]
+    cortes = tamano.get("tabla_18")
+    if not cortes or not all(isinstance(c, (list, tuple)) and len(c) == 2 for c in cortes):
+        raise ReglamentoInvalido(f"{nombre}: tamano.tabla_18 debe ser una lista de pares [área, lado]")
+    areas = [_numero(version, "tamano", "tabla_18", a) for a, _ in cortes]
+    for _, lado in cortes:
+        _numero(version, "tamano", "tabla_18", lado)
+    if any(b <= a for a, b in zip(areas, areas[1:])):
+        raise ReglamentoInvalido(f"{nombre}: las áreas de tamano.tabla_18 deben ser crecientes")
+    if not areas[0] <= tamano["area_min_cm2"] <= tamano["area_max_tabla_cm2"]:
+        raise ReglamentoInvalido(f"{nombre}: se espera tabla_18[0] ≤ area_min_cm2 ≤ area_max_tabla_cm2")
+    if not 0 < tamano["ads_fraccion"] <= 1:
+        raise ReglamentoInvalido(f"{nombre}: tamano.ads_fraccion debe estar en (0, 1]")
+
+def _dia(fecha) -> np.datetime64:
+    return np.datetime64(date.today() if fecha is None else pd.Timestamp(fecha).date(), "D")
+
+class Normativa:
+    # `versiones`: completas (con la herencia aplicada), en orden de vigencia
+    def __init__(self, versiones: list):
+        self.versiones = versiones
+        self.nombres = [v["version"] for v in versiones]
+        self.vigencias = np.array([v["vigente_desde"] for v in versiones], dtype="datetime64[D]")
+        # (sección, campo) -> un valor por versión
+        self._valores = {
+            (seccion, campo): np.array([float(v[seccion][campo]) for v in versiones])
+            for seccion, campos in CAMPOS_REGLAMENTO.items() for campo in campos
+        }
+        for campo in CAMPOS_ATWATER:
+            self._valores[("atwater", campo)] = np.array(
+                [float(v["calorias"]["factores_atwater"][campo]) for v in versiones]
+            )
+        # Umbrales para declarar 0: una fila por versión, una columna por nutriente (0 = sin umbral)
+        ceros = [v.get("aproximacion", {}).get("cero_menor_que", {}) for v in versiones]
+        self._claves_cero = pd.Index(sorted(set().union(*ceros)))
+        self._cero = np.array([[float(c.get(k, 0.0)) for k in self._claves_cero] for c in ceros]).reshape(
+            len(versiones), len(self._claves_cero)
+        )
+        self._tabla_18 = [
+            (np.array([a for a, _ in v["tamano"]["tabla_18"]], dtype=float),
+             np.array([l for _, l in v["tamano"]["tabla_18"]], dtype=float))
+            for v in versiones
+        ]
+
+    def indice(self, fecha=None) -> int:
+        i = int(np.searchsorted(self.vigencias, _dia(fecha), side="right")) - 1
+        if i < 0:
+            raise ValueError(f"No hay normativa vigente antes del {self.vigencias[0]} (fecha pedida: {_dia(fecha)})")
+        return i
+
+    # Índice de versión por fila; `fecha` escalar (o None = hoy) o una fecha por fila (vacías = hoy)
+    def indices(self, fecha=None, n: int = 1) -> np.ndarray:
+        if fecha is None or np.ndim(fecha) == 0:
+            return np.full(n, self.indice(fecha), dtype=np.intp)
+        dias = pd.to_datetime(pd.Series(np.asarray(fecha))).to_numpy(dtype="datetime64[D]")
+        if len(dias) != n:
+            raise ValueError(f"Se esperaban {n} fechas y llegaron {len(dias)}")
+        dias = np.where(np.isnat(dias), _dia(None), dias)
+        idx = np.searchsorted(self.vigencias, dias, side="right") - 1
+        if n and idx.min() < 0:
+            raise ValueError(
+                f"No hay normativa vigente antes del {self.vigencias[0]} (fecha más antigua: {dias.min()})"
+            )
+        return idx
+
+    def vigente(self, fecha=None) -> dict:
+        return copy.deepcopy(self.versiones[self.indice(fecha)])
+
+    def version(self, fecha=None) -> str:
+        return self.nombres[self.indice(fecha)]
+
+    def valor(self, seccion: str, campo: str, idx: np.ndarray) -> np.ndarray:
+        return self._valores[(seccion, campo)][idx]
+
+    # Umbral de declaración en cero por fila (unidad del esquema de nutrientes); 0 si no hay
+    def umbral_cero(self, claves, idx: np.ndarray) -> np.ndarray:
+        pos = self._claves_cero.get_indexer(pd.Index(claves, dtype=object))
+        return np.where(pos >= 0, self._cero[idx, np.maximum(pos, 0)] if len(self._claves_cero) else 0.0, 0.0)
+
+    # Columna `version_reglas` de los veredictos (categórica: un código por fila)
+    def etiquetas(self, idx: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(idx, categories=self.nombres)
+
+    # Lado mínimo de la Tabla 18 de la versión de cada fila; NaN fuera de su rango.
+    # Una búsqueda binaria por versión presente (suelen ser una o dos).
+    def lado_tabla18(self, area: np.ndarray, idx: np.ndarray) -> np.ndarray:
+        lado = np.empty(area.shape, dtype=float)
+        presentes = np.flatnonzero(np.bincount(idx, minlength=len(self.versiones)))
+        for i in presentes:
+            filas = slice(None) if len(presentes) == 1 else idx == i
+            limites, lados = self._tabla_18[i]
+            pos = np.searchsorted(limites, area[filas], side="right") - 1
+            lado[filas] = lados[np.clip(pos, 0, len(lados) - 1)]
+        dentro = (area >= self.valor("tamano", "area_min_cm2", idx)) & (area <= self.valor("tamano", "area_max_tabla_cm2", idx))
+        return np.where(dentro, lado, np.nan)
+
+# datos: contenido de reglamentos.json ya decodificado
+def compilar(datos: dict) -> Normativa:
+    if not isinstance(datos, dict) or datos.get("formato") != FORMATO_REGLAMENTOS:
+        raise ReglamentoInvalido(f"Formato de reglamentos no admitido (se espera formato {FORMATO_REGLAMENTOS})")
+    declaradas = datos.get("versiones") or []
+    if not declaradas:
+        raise ReglamentoInvalido("El archivo no declara ninguna versión")
+    versiones, anterior = [], {}
+    for declarada in declaradas:
+        if not declarada.get("version") or not declarada.get("vigente_desde"):
+            raise ReglamentoInvalido("Cada versión necesita 'version' y 'vigente_desde' (AAAA-MM-DD)")
+        completa = _heredar(anterior, declarada)
+        completa["fuente"] = declarada.get("fuente", "")  # la fuente no se hereda
+        _validar(completa)
+        versiones.append(completa)
+        anterior = completa
+    try:
+        vigencias = [np.datetime64(v["vigente_desde"], "D") for v in versiones]
+    except ValueError as e:
+        raise ReglamentoInvalido(f"Fecha de vigencia inválida: {e}")
+    if any(b <= a for a, b in zip(vigencias, vigencias[1:])):
+        raise ReglamentoInvalido("Las versiones deben ir en orden estricto de vigente_desde")
+    if len({v["version"] for v in versiones}) != len(versiones):
+        raise ReglamentoInvalido("Hay nombres de versión repetidos")
+    return Normativa(versiones)
+
+# Una compilación por archivo y proceso
+@lru_cache(maxsize=None)
+def cargar_normativa(ruta: str = REGLAMENTOS_ARCHIVO) -> Normativa:
+    with open(ruta, encoding="utf-8") as fh:
+        try:
+            datos = json.load(fh)
+        except ValueError as e:
+            raise ReglamentoInvalido(f"{ruta}: JSON inválido ({e})")
+    return compilar(datos)
@@ -0,0 +1,67 @@
+# ------------------------------------------------------------
+# ESQUEMA DE NUTRIENTES — Res. 810/2021 Art. 8
+# Nombre canónico, sinónimos, unidades admitidas y obligatoriedad de cada
+# nutriente de la tabla. Los diccionarios de búsqueda se compilan una vez al
+# importar el módulo; los motores los consultan por nombre distinto, no por fila.
+# ------------------------------------------------------------
+import unicodedata
+
+# Minúsculas, sin tildes ni espacios sobrantes: "Vitamina A " y "vitamina a" son el mismo nutriente
+def normalizar_nombre(nombre) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_tildes.lower().split())
+
+# (clave, nombre en la tabla, sinónimos, unidades admitidas, tipo, obligatorio)
+ESQUEMA_NUTRIENTES = [
+    ("energia", "Calorías", ("calorias", "energia", "valor energetico", "calorias totales"), ("kcal", "kJ"), "macro", True),
+    ("grasa_total", "Grasa total", ("grasas totales", "grasa", "grasas"), ("g",), "macro", True),
+    ("grasa_saturada", "Grasa saturada", ("grasas saturadas",), ("g",), "macro", True),
+    ("grasa_trans", "Grasas trans", ("grasa trans",), ("mg",), "macro", True),
+    ("grasa_monoinsaturada", "Grasa monoinsaturada", ("grasas monoinsaturadas",), ("g",), "macro", False),
+    ("grasa_poliinsaturada", "Grasa poliinsaturada", ("grasas poliinsaturadas",), ("g",), "macro", False),
+    ("colesterol", "Colesterol", (), ("mg",), "macro", False),
+    ("carbohidratos", "Carbohidratos totales", ("carbohidratos", "carbohidrato total", "carbohidratos disponibles"), ("g",), "macro", True),
+    ("fibra", "Fibra dietaria", ("fibra", "fibra dietetica"), ("g",), "macro", True),
+    ("azucares_totales", "Azúcares totales", ("azucares",), ("g",), "macro", True),
+    ("azucares_anadidos", "Azúcares añadidos", ("azucares adicionados",), ("g",), "macro", True),
+    ("proteina", "Proteína", ("proteinas",), ("g",), "macro", True),
+    ("sodio", "Sodio", (), ("mg",), "macro", True),
+    ("vitamina_a", "Vitamina A", (), ("µg ER",), "micro", True),
+    ("vitamina_d", "Vitamina D", (), ("µg",), "micro", True),
+    ("hierro", "Hierro", (), ("mg",), "micro", True),
+    ("calcio", "Calcio", (), ("mg",), "micro", True),
+    ("zinc", "Zinc", ("cinc",), ("mg",), "micro", True),
+    ("vitamina_c", "Vitamina C", (), ("mg",), "micro", False),
+    ("magnesio", "Magnesio", (), ("mg",), "micro", False),
+    ("potasio", "Potasio", (), ("mg",), "micro", False),
+    ("fosforo", "Fósforo", (), ("mg",), "micro", False),
+]
+
+NOMBRE_NUTRIENTE = {clave: nombre for clave, nombre, *_ in ESQUEMA_NUTRIENTES}
+TIPO_NUTRIENTE = {clave: tipo for clave, _, _, _, tipo, _ in ESQUEMA_NUTRIENTES}
+OBLIGATORIOS = [clave for clave, *_, obligatorio in ESQUEMA_NUTRIENTES if obligatorio]
+MICRO_OBLIGATORIOS = [c for c in OBLIGATORIOS if TIPO_NUTRIENTE[c] == "micro"]
+
+# Frase que exime a un micronutriente obligatorio de aparecer en la tabla
+LEYENDA_NO_SIGNIFICATIVA = "fuente no significativa de"
+
+# µ (micro), μ (mu griega) y "mc" se escriben indistintamente en las etiquetas
+def normalizar_unidad(unidad: str) -> str:
+    u = " ".join(str(unidad).replace("µ", "u").replace("μ", "u").lower().replace(".", "").split())
+    return "u" + u[2:] if u.startswith("mcg") else u
+
+# Búsquedas precompiladas: nombre o sinónimo normalizado → clave; clave → unidades normalizadas
+CLAVE_POR_NOMBRE = {}
+for _clave, _nombre, _sinonimos, *_ in ESQUEMA_NUTRIENTES:
+    for _n in (_nombre, _clave.replace("_", " "), *_sinonimos):
+        CLAVE_POR_NOMBRE[normalizar_nombre(_n)] = _clave
+UNIDADES_NUTRIENTE = {clave: unidades for clave, _, _, unidades, _, _ in ESQUEMA_NUTRIENTES}
+# "clave|unidad normalizada" admitidos: una sola comparación vectorizada por tabla
+PARES_UNIDAD = frozenset(
+    f"{clave}|{normalizar_unidad(u)}" for clave, unidades in UNIDADES_NUTRIENTE.items() for u in unidades
+)
+
+# Clave del esquema o None; admite "Sodio (mg)" y "Grasa total, g" en el nombre
+def identificar_nutriente(nombre) -> str:
+    n = normalizar_nombre(nombre).split("(")[0].split(",")[0].strip()
+    return CLAVE_POR_NOMBRE.get(n)
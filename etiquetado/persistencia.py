@@ -0,0 +1,424 @@
+# ------------------------------------------------------------
+# PERSISTENCIA DE AUDITORÍAS (SQLite)
+# Tablas: auditorias, resultados (un registro por ítem) y evidencias
+# (referencias al almacén en disco). Cada cambio de la app escribe solo
+# la fila afectada; las consultas de historial usan los índices.
+# ------------------------------------------------------------
+import os
+import re
+import sqlite3
+import calendar
+import threading
+from datetime import datetime
+
+from .checklist import CATEGORIAS, CATEGORIA_POR_ITEM, REFERENCIA_POR_ITEM
+
+AUDITORIAS_DB = os.environ.get("AUDITORIAS_DB", "auditorias.db")
+
+CAMPOS_AUDITORIA = (
+    "producto", "proveedor", "responsable", "invima_registro", "invima_estado_activo", "invima_url",
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS auditorias (
+    id                   INTEGER PRIMARY KEY,
+    producto             TEXT NOT NULL DEFAULT '',
+    proveedor            TEXT NOT NULL DEFAULT '',
+    responsable          TEXT NOT NULL DEFAULT '',
+    invima_registro      TEXT NOT NULL DEFAULT '',
+    invima_estado_activo INTEGER NOT NULL DEFAULT 0,
+    invima_url           TEXT NOT NULL DEFAULT '',
+    fecha                TEXT NOT NULL,
+    actualizada          TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    auditoria_id INTEGER NOT NULL REFERENCES auditorias(id) ON DELETE CASCADE,
+    titulo       TEXT NOT NULL,
+    categoria    TEXT NOT NULL,
+    referencia   TEXT NOT NULL,
+    estado       TEXT NOT NULL DEFAULT 'none',
+    nota         TEXT NOT NULL DEFAULT '',
+    actualizado  TEXT NOT NULL,
+    PRIMARY KEY (auditoria_id, titulo)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS evidencias (
+    id           INTEGER PRIMARY KEY,
+    auditoria_id INTEGER NOT NULL REFERENCES auditorias(id) ON DELETE CASCADE,
+    titulo       TEXT NOT NULL,
+    sha256       TEXT NOT NULL,
+    nombre       TEXT NOT NULL,
+    tamano       INTEGER NOT NULL,
+    descripcion  TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS agregados (
+    dimension TEXT NOT NULL,
+    clave     TEXT NOT NULL,
+    periodo   TEXT NOT NULL,
+    yes       INTEGER NOT NULL DEFAULT 0,
+    no        INTEGER NOT NULL DEFAULT 0,
+    na        INTEGER NOT NULL DEFAULT 0,
+    none      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, clave, periodo)
+) WITHOUT ROWID;
+-- Instantáneas .zip ya importadas (huella del manifiesto): reabrir la misma no duplica la auditoría
+CREATE TABLE IF NOT EXISTS importaciones (
+    huella       TEXT PRIMARY KEY,
+    auditoria_id INTEGER NOT NULL REFERENCES auditorias(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_auditorias_producto  ON auditorias(producto, fecha);
+CREATE INDEX IF NOT EXISTS ix_auditorias_proveedor ON auditorias(proveedor, fecha);
+CREATE INDEX IF NOT EXISTS ix_auditorias_invima    ON auditorias(invima_registro, fecha);
+CREATE INDEX IF NOT EXISTS ix_auditorias_auditor   ON auditorias(responsable, fecha);
+CREATE INDEX IF NOT EXISTS ix_auditorias_fecha     ON auditorias(fecha);
+CREATE INDEX IF NOT EXISTS ix_resultados_estado    ON resultados(estado, categoria, auditoria_id);
+CREATE INDEX IF NOT EXISTS ix_evidencias_item      ON evidencias(auditoria_id, titulo);
+CREATE INDEX IF NOT EXISTS ix_evidencias_sha256    ON evidencias(sha256);
+"""
+
+# Agregados de cumplimiento por (dimensión, clave, mes), mantenidos en la misma
+# transacción que cada escritura; el tablero de portafolio solo lee esta tabla.
+DIMENSIONES = ("total", "proveedor", "categoria", "articulo")
+ESTADOS = ("yes", "no", "na", "none")
+
+def _articulo(referencia: str) -> str:
+    m = re.search(r"Art\.\s*(\d+)", referencia)
+    return f"Art. {m.group(1)}" if m else referencia
+
+ARTICULO_POR_ITEM = {t: _articulo(ref) for t, ref in REFERENCIA_POR_ITEM.items()}
+
+def _claves(titulo: str, proveedor: str) -> list:
+    return [
+        ("total", ""),
+        ("proveedor", proveedor),
+        ("categoria", CATEGORIA_POR_ITEM.get(titulo, "")),
+        ("articulo", ARTICULO_POR_ITEM.get(titulo, "")),
+    ]
+
+def _ahora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+# Meses como "AAAA-MM" (el periodo de los agregados); fechas como "AAAA-MM-DD"
+def _fin_de_mes(fecha: str) -> str:
+    anio, mes = int(fecha[:4]), int(fecha[5:7])
+    return f"{fecha[:7]}-{calendar.monthrange(anio, mes)[1]:02d}"
+
+def _mes_vecino(periodo: str, paso: int) -> str:
+    anio, mes = divmod(int(periodo[:4]) * 12 + int(periodo[5:7]) - 1 + paso, 12)
+    return f"{anio:04d}-{mes + 1:02d}"
+
+# Una conexión compartida entre hilos (sesiones de Streamlit), serializada con un lock
+class BaseAuditorias:
+    def __init__(self, ruta: str = AUDITORIAS_DB):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+            self._con.execute("PRAGMA foreign_keys=ON")
+            self._con.executescript(ESQUEMA)
+            if (self._con.execute("SELECT 1 FROM resultados LIMIT 1").fetchone()
+                    and not self._con.execute("SELECT 1 FROM agregados LIMIT 1").fetchone()):
+                self._reconstruir_agregados()
+
+    def cerrar(self):
+        self._con.close()
+
+    # ---------------- escritura incremental ----------------
+    def crear_auditoria(self, fecha: str = None, **metadatos) -> int:
+        with self._lock, self._con:
+            return self._crear_auditoria(fecha, metadatos)
+
+    def actualizar_metadatos(self, auditoria_id: int, **metadatos):
+        campos = {c: v for c, v in metadatos.items() if c in CAMPOS_AUDITORIA}
+        if "invima_estado_activo" in campos:
+            campos["invima_estado_activo"] = int(bool(campos["invima_estado_activo"]))
+        if not campos:
+            return
+        with self._lock, self._con:
+            anterior = None
+            if "proveedor" in campos:
+                anterior = self._con.execute(
+                    "SELECT proveedor, fecha FROM auditorias WHERE id = ?", (auditoria_id,)
+                ).fetchone()
+            self._con.execute(
+                f"UPDATE auditorias SET {', '.join(f'{c} = ?' for c in campos)}, actualizada = ? WHERE id = ?",
+                (*campos.values(), _ahora(), auditoria_id),
+            )
+            if anterior is not None and anterior["proveedor"] != campos["proveedor"]:
+                filas = self._con.execute(
+                    "SELECT titulo, estado FROM resultados WHERE auditoria_id = ?", (auditoria_id,)
+                ).fetchall()
+                self._ajustar(anterior["proveedor"], anterior["fecha"], [(f["titulo"], f["estado"], -1) for f in filas])
+                self._ajustar(campos["proveedor"], anterior["fecha"], [(f["titulo"], f["estado"], 1) for f in filas])
+
+    def guardar_resultado(self, auditoria_id: int, titulo: str, estado: str = None, nota: str = None):
+        with self._lock, self._con:
+            self._guardar_resultado(auditoria_id, titulo, estado, nota)
+
+    def agregar_evidencia(self, auditoria_id: int, titulo: str, ev: dict) -> int:
+        with self._lock, self._con:
+            return self._agregar_evidencia(auditoria_id, titulo, ev)
+
+    def quitar_evidencia(self, auditoria_id: int, titulo: str, sha256: str):
+        with self._lock, self._con:
+            self._con.execute(
+                "DELETE FROM evidencias WHERE id = ("
+                "SELECT id FROM evidencias WHERE auditoria_id = ? AND titulo = ? AND sha256 = ? ORDER BY id LIMIT 1)",
+                (auditoria_id, titulo, sha256),
+            )
+
+    # Alta de una auditoría completa (p. ej. desde una instantánea .zip) en una sola
+    # transacción: si algo falla no queda una auditoría a medias. Registro con el formato
+    # de cargar_auditoria(): metadatos, status, notas y evidencia por ítem.
+    # `huella`: identifica la instantánea; si ya se importó, devuelve esa auditoría.
+    def importar_auditoria(self, registro: dict, fecha: str = None, huella: str = None) -> int:
+        with self._lock, self._con:
+            if huella is not None:
+                previa = self._con.execute(
+                    "SELECT auditoria_id FROM importaciones WHERE huella = ?", (huella,)
+                ).fetchone()
+                if previa is not None:
+                    return previa["auditoria_id"]
+            auditoria_id = self._crear_auditoria(fecha, {c: registro.get(c) for c in CAMPOS_AUDITORIA})
+            for titulo in CATEGORIA_POR_ITEM:
+                estado = registro["status"].get(titulo, "none")
+                nota = registro["notas"].get(titulo, "")
+                if estado != "none" or nota:
+                    self._guardar_resultado(auditoria_id, titulo, estado, nota)
+                for ev in registro["evidencia"].get(titulo, []):
+                    self._agregar_evidencia(auditoria_id, titulo, ev)
+            if huella is not None:
+                self._con.execute(
+                    "INSERT INTO importaciones (huella, auditoria_id) VALUES (?, ?)", (huella, auditoria_id)
+                )
+        return auditoria_id
+
+    def auditoria_importada(self, huella: str):
+        with self._lock:
+            fila = self._con.execute("SELECT auditoria_id FROM importaciones WHERE huella = ?", (huella,)).fetchone()
+        return fila["auditoria_id"] if fila else None
+
+    # ---------------- escritura (requieren self._lock y transacción abierta) ----------------
+    def _crear_auditoria(self, fecha: str, metadatos: dict) -> int:
+        fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+        campos = {c: metadatos.get(c) or ("" if c != "invima_estado_activo" else 0) for c in CAMPOS_AUDITORIA}
+        campos["invima_estado_activo"] = int(bool(campos["invima_estado_activo"]))
+        ahora = _ahora()
+        cur = self._con.execute(
+            f"INSERT INTO auditorias ({', '.join(campos)}, fecha, actualizada) "
+            f"VALUES ({', '.join('?' * len(campos))}, ?, ?)",
+            (*campos.values(), fecha, ahora),
+        )
+        auditoria_id = cur.lastrowid
+        self._con.executemany(
+            "INSERT INTO resultados (auditoria_id, titulo, categoria, referencia, actualizado) VALUES (?, ?, ?, ?, ?)",
+            [(auditoria_id, t, CATEGORIA_POR_ITEM[t], REFERENCIA_POR_ITEM[t], ahora) for t in CATEGORIA_POR_ITEM],
+        )
+        self._ajustar(campos["proveedor"], fecha, [(t, "none", 1) for t in CATEGORIA_POR_ITEM])
+        return auditoria_id
+
+    def _guardar_resultado(self, auditoria_id: int, titulo: str, estado: str = None, nota: str = None):
+        cambios = {k: v for k, v in (("estado", estado), ("nota", nota)) if v is not None}
+        if not cambios:
+            return
+        ahora = _ahora()
+        previo = None
+        if "estado" in cambios:
+            previo = self._con.execute(
+                "SELECT r.estado, a.proveedor, a.fecha FROM resultados r JOIN auditorias a ON a.id = r.auditoria_id "
+                "WHERE r.auditoria_id = ? AND r.titulo = ?",
+                (auditoria_id, titulo),
+            ).fetchone()
+        self._con.execute(
+            f"UPDATE resultados SET {', '.join(f'{c} = ?' for c in cambios)}, actualizado = ? "
+            "WHERE auditoria_id = ? AND titulo = ?",
+            (*cambios.values(), ahora, auditoria_id, titulo),
+        )
+        if previo is not None and previo["estado"] != estado:
+            self._ajustar(previo["proveedor"], previo["fecha"], [(titulo, previo["estado"], -1), (titulo, estado, 1)])
+        self._con.execute("UPDATE auditorias SET actualizada = ? WHERE id = ?", (ahora, auditoria_id))
+
+    def _agregar_evidencia(self, auditoria_id: int, titulo: str, ev: dict) -> int:
+        return self._con.execute(
+            "INSERT INTO evidencias (auditoria_id, titulo, sha256, nombre, tamano, descripcion) VALUES (?, ?, ?, ?, ?, ?)",
+            (auditoria_id, titulo, ev["sha256"], ev["name"], ev.get("size", 0), ev.get("caption", "")),
+        ).lastrowid
+
+    # ---------------- agregados (requieren self._lock y transacción abierta) ----------------
+    def _ajustar(self, proveedor: str, fecha: str, deltas: list):
+        acumulado = {}
+        periodo = fecha[:7]
+        for titulo, estado, signo in deltas:
+            for dimension, clave in _claves(titulo, proveedor):
+                fila = acumulado.setdefault((dimension, clave), dict.fromkeys(ESTADOS, 0))
+                fila[estado] += signo
+        self._con.executemany(
+            "INSERT INTO agregados (dimension, clave, periodo, yes, no, na, none) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (dimension, clave, periodo) DO UPDATE SET "
+            "yes = yes + excluded.yes, no = no + excluded.no, na = na + excluded.na, none = none + excluded.none",
+            [(d, c, periodo, *(v[e] for e in ESTADOS)) for (d, c), v in acumulado.items()],
+        )
+
+    def _reconstruir_agregados(self):
+        self._con.execute("DELETE FROM agregados")
+        filas = self._con.execute(
+            "SELECT a.proveedor, a.fecha, r.titulo, r.estado FROM resultados r JOIN auditorias a ON a.id = r.auditoria_id"
+        )
+        for f in filas.fetchall():
+            self._ajustar(f["proveedor"], f["fecha"], [(f["titulo"], f["estado"], 1)])
+
+    # ---------------- lectura ----------------
+    # Cumplimiento por clave de una dimensión (total | proveedor | categoria | articulo);
+    # con por_periodo=True se agrupa además por mes (tendencias). `desde`/`hasta` son
+    # fechas exactas, como en _filtros (hallazgos, exportación): los meses completos
+    # salen de los agregados y un mes de borde cortado a mitad se cuenta desde
+    # resultados, solo con las auditorías dentro del rango.
+    def cumplimiento(self, dimension: str, desde: str = None, hasta: str = None, por_periodo: bool = False) -> list:
+        if dimension not in DIMENSIONES:
+            raise ValueError(f"Dimensión desconocida: {dimension}")
+        desde, hasta = desde or None, hasta or None
+        primer_mes, ultimo_mes = (desde[:7] if desde else None), (hasta[:7] if hasta else None)
+        bordes = []
+        if desde and desde[8:10] != "01":
+            bordes.append((desde, min(hasta, _fin_de_mes(desde)) if hasta else _fin_de_mes(desde)))
+            primer_mes = _mes_vecino(desde[:7], 1)
+        if hasta and hasta != _fin_de_mes(hasta):
+            if not (bordes and bordes[0][0][:7] == hasta[:7]):
+                bordes.append((max(desde or "", f"{hasta[:7]}-01"), hasta))
+            ultimo_mes = _mes_vecino(hasta[:7], -1)
+
+        condiciones, params = ["dimension = ?"], [dimension]
+        if primer_mes:
+            condiciones.append("periodo >= ?")
+            params.append(primer_mes)
+        if ultimo_mes:
+            condiciones.append("periodo <= ?")
+            params.append(ultimo_mes)
+        conteos = {}
+        with self._lock:
+            for f in self._con.execute(
+                f"SELECT clave, periodo, SUM(yes) AS yes, SUM(no) AS no, SUM(na) AS na, SUM(none) AS none "
+                f"FROM agregados WHERE {' AND '.join(condiciones)} GROUP BY clave, periodo",
+                params,
+            ):
+                fila = conteos.setdefault((f["clave"], f["periodo"] if por_periodo else None), dict.fromkeys(ESTADOS, 0))
+                for e in ESTADOS:
+                    fila[e] += f[e]
+            for inicio, fin in bordes:
+                for f in self._con.execute(
+                    "SELECT a.proveedor, a.fecha, r.titulo, r.estado FROM resultados r "
+                    "JOIN auditorias a ON a.id = r.auditoria_id WHERE a.fecha >= ? AND a.fecha <= ?",
+                    (inicio, fin),
+                ):
+                    clave = dict(_claves(f["titulo"], f["proveedor"]))[dimension]
+                    fila = conteos.setdefault((clave, f["fecha"][:7] if por_periodo else None), dict.fromkeys(ESTADOS, 0))
+                    fila[f["estado"]] += 1
+        resultado = []
+        for (clave, periodo), cuenta in sorted(conteos.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+            fila = {"clave": clave, **({"periodo": periodo} if por_periodo else {}), **cuenta}
+            contestados = fila["yes"] + fila["no"]
+            fila["cumplimiento_pct"] = round(fila["yes"] / contestados * 100, 1) if contestados else None
+            resultado.append(fila)
+        return resultado
+
+    def evidencia_persistida(self, sha256: str) -> bool:
+        with self._lock:
+            return self._con.execute("SELECT 1 FROM evidencias WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is not None
+
+    # Devuelve el mismo formato que registro_auditoria() en App.py (sin fecha de emisión ni solo_no)
+    def cargar_auditoria(self, auditoria_id: int) -> dict:
+        with self._lock:
+            fila = self._con.execute("SELECT * FROM auditorias WHERE id = ?", (auditoria_id,)).fetchone()
+            if fila is None:
+                raise KeyError(f"No existe la auditoría {auditoria_id}")
+            resultados = self._con.execute(
+                "SELECT titulo, estado, nota FROM resultados WHERE auditoria_id = ?", (auditoria_id,)
+            ).fetchall()
+            evidencias = self._con.execute(
+                "SELECT titulo, sha256, nombre, tamano, descripcion FROM evidencias WHERE auditoria_id = ? ORDER BY id",
+                (auditoria_id,),
+            ).fetchall()
+        registro = {c: fila[c] for c in CAMPOS_AUDITORIA}
+        registro["invima_estado_activo"] = bool(registro["invima_estado_activo"])
+        registro["id"] = fila["id"]
+        registro["fecha_auditoria"] = fila["fecha"]
+        registro["status"] = {t: "none" for items in CATEGORIAS.values() for (t, _, _) in items}
+        registro["notas"] = {t: "" for t in registro["status"]}
+        registro["evidencia"] = {t: [] for t in registro["status"]}
+        for r in resultados:
+            registro["status"][r["titulo"]] = r["estado"]
+            registro["notas"][r["titulo"]] = r["nota"]
+        for e in evidencias:
+            registro["evidencia"].setdefault(e["titulo"], []).append(
+                {"name": e["nombre"], "sha256": e["sha256"], "size": e["tamano"], "caption": e["descripcion"]}
+            )
+        return registro
+
+    def listar_auditorias(self, limite: int = 50, **filtros) -> list:
+        where, params = self._filtros(filtros)
+        with self._lock:
+            return [dict(r) for r in self._con.execute(
+                f"SELECT * FROM auditorias a {where} ORDER BY a.fecha DESC, a.id DESC LIMIT ?", (*params, limite)
+            )]
+
+    # Hallazgos por ítem; p. ej. los "no cumple" de sellos de un proveedor en un trimestre:
+    #   hallazgos(proveedor="X", desde="2026-07-01", hasta="2026-09-30", categoria="3. Sellos frontales de advertencia")
+    def hallazgos(self, estado: str = "no", categoria: str = None, limite: int = 10000, **filtros) -> list:
+        where, params = self._filtros(filtros)
+        where += (" AND " if where else "WHERE ") + "r.estado = ?"
+        params.append(estado)
+        if categoria:
+            where += " AND r.categoria = ?"
+            params.append(categoria)
+        with self._lock:
+            return [dict(r) for r in self._con.execute(
+                "SELECT a.id AS auditoria_id, a.fecha, a.producto, a.proveedor, a.invima_registro, a.responsable, "
+                "r.titulo, r.categoria, r.referencia, r.estado, r.nota "
+                f"FROM auditorias a JOIN resultados r ON r.auditoria_id = a.id {where} "
+                "ORDER BY a.fecha DESC, a.id DESC LIMIT ?",
+                (*params, limite),
+            )]
+
+    # Resultados por ítem de todas las auditorías filtradas, en páginas de `lote` filas
+    # (paginación por clave sobre (auditoria_id, titulo)): memoria constante y el lock
+    # solo se toma por página, así la app sigue escribiendo durante una exportación larga.
+    def iterar_resultados(self, lote: int = 5000, estado: str = None, categoria: str = None, **filtros):
+        where, params = self._filtros(filtros)
+        if estado:
+            where += (" AND " if where else "WHERE ") + "r.estado = ?"
+            params.append(estado)
+        if categoria:
+            where += (" AND " if where else "WHERE ") + "r.categoria = ?"
+            params.append(categoria)
+        consulta = (
+            "SELECT a.id AS auditoria_id, a.fecha, a.producto, a.proveedor, a.invima_registro, a.responsable, "
+            "r.categoria, r.titulo, r.referencia, r.estado, r.nota "
+            f"FROM auditorias a JOIN resultados r ON r.auditoria_id = a.id {where} "
+            + ("AND" if where else "WHERE") + " (r.auditoria_id, r.titulo) > (?, ?) "
+            "ORDER BY r.auditoria_id, r.titulo LIMIT ?"
+        )
+        ultimo = (0, "")
+        while True:
+            with self._lock:
+                filas = self._con.execute(consulta, (*params, *ultimo, lote)).fetchall()
+            if not filas:
+                return
+            yield from (dict(f) for f in filas)
+            ultimo = (filas[-1]["auditoria_id"], filas[-1]["titulo"])
+
+    @staticmethod
+    def _filtros(filtros: dict):
+        condiciones, params = [], []
+        for campo in ("producto", "proveedor", "invima_registro", "responsable"):
+            if filtros.get(campo):
+                condiciones.append(f"a.{campo} = ?")
+                params.append(filtros[campo])
+        if filtros.get("desde"):
+            condiciones.append("a.fecha >= ?")
+            params.append(filtros["desde"])
+        if filtros.get("hasta"):
+            condiciones.append("a.fecha <= ?")
+            params.append(filtros["hasta"])
+        return ("WHERE " + " AND ".join(condiciones) if condiciones else ""), params
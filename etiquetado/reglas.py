@@ -0,0 +1,856 @@
+# ------------------------------------------------------------
+# REGLAS DE ETIQUETADO — Res. 810/2021, 2492/2022 y 254/2023
+# Motores vectorizados sin dependencia de Streamlit: los usan la app,
+# la evaluación masiva y cualquier proceso por lotes.
+# ------------------------------------------------------------
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .nutrientes import (
+    normalizar_nombre, identificar_nutriente, normalizar_unidad,
+    TIPO_NUTRIENTE, NOMBRE_NUTRIENTE, UNIDADES_NUTRIENTE, PARES_UNIDAD,
+    OBLIGATORIOS, MICRO_OBLIGATORIOS, LEYENDA_NO_SIGNIFICATIVA,
+)
+from .normativa import cargar_normativa
+
+# ------------------------------------------------------------
+# TABLA 17/18 — índice único de cortes (pantalla y cálculo)
+# Los umbrales salen de la normativa versionada (reglamentos.json), compilada
+# una vez al importar. Las constantes de módulo son las de la versión vigente
+# hoy (pantalla); los motores reciben `fecha` y aplican la versión de cada fila.
+# Cada corte: (área mínima de la cara principal en cm², lado mínimo del sello en cm).
+# ------------------------------------------------------------
+NORMATIVA = cargar_normativa()
+_VIGENTE = NORMATIVA.vigente()
+
+TABLA_18_CORTES = [tuple(c) for c in _VIGENTE["tamano"]["tabla_18"]]
+AREA_MIN_SELLO_CM2 = _VIGENTE["tamano"]["area_min_cm2"]          # por debajo: envase secundario o QR
+AREA_MAX_TABLA_CM2 = _VIGENTE["tamano"]["area_max_tabla_cm2"]    # por encima: lado fijo (Res. 2492/2022)
+LADO_FIJO_CM = _VIGENTE["tamano"]["lado_fijo_cm"]
+ADS_FRACCION = _VIGENTE["tamano"]["ads_fraccion"]                # área disponible para sellos con 2 o más sellos
+
+TABLA_18_LIMITES = np.array([a for a, _ in TABLA_18_CORTES], dtype=float)
+TABLA_18_LADOS = np.array([l for _, l in TABLA_18_CORTES], dtype=float)
+
+TABLA_17 = (
+    [(f"< {AREA_MIN_SELLO_CM2} cm²", "Rotular en envase secundario o incluir codigo QR o página para consultar")]
+    + [
+        (f"≥{a} a <{b} cm²", f"{l:.1f}")
+        for (a, l), b in zip(TABLA_18_CORTES, [a for a, _ in TABLA_18_CORTES[1:]] + [AREA_MAX_TABLA_CM2])
+    ]
+    + [(f"> {AREA_MAX_TABLA_CM2} cm²", f"{LADO_FIJO_CM} (fijo, Res. 2492/2022)")]
+)
+df_tabla17 = pd.DataFrame(TABLA_17, columns=["Área de la cara principal", "Lado mínimo del sello (cm)"])
+
+# ------------------------------------------------------------
+# CARGA DE TABLAS (evaluación masiva CSV / Excel)
+# ------------------------------------------------------------
+VALORES_VERDADEROS = {"1", "true", "verdadero", "si", "sí", "s", "x", "yes", "y"}
+
+def _a_bool(serie: pd.Series) -> pd.Series:
+    if serie.dtype == bool:
+        return serie
+    return serie.astype(str).str.strip().str.lower().isin(VALORES_VERDADEROS)
+
+# ------------------------------------------------------------
+# NÚMEROS IMPRESOS — un solo lector para tablas, rótulos y análisis
+# Coma o punto decimal ("12,5", "12.5") y miles en grupos de tres cifras con
+# punto, coma o espacio ("12.345,6", "12,345.6", "1 250"), con unidad opcional
+# al final ("1.050,5 kJ"). Un solo grupo con punto o coma y sin decimales
+# ("1.250", "1,250") es ambiguo: se marca y cada motor decide.
+# ------------------------------------------------------------
+_PATRON_VALOR = r"^\s*(?P<entero>\d+)(?:(?P<separador>[.,])(?P<decimales>\d+))?\s*(?P<unidad>[^\d\s.,].*)?$"
+_RE_VALOR = re.compile(_PATRON_VALOR)
+_PATRON_MILES = (
+    r"^\s*(?P<entero>[1-9]\d{0,2}(?P<miles>[., \u00a0\u202f])\d{3}(?P<grupos>(?:(?P=miles)\d{3})*))"
+    r"(?:(?!(?P=miles))(?P<separador>[.,])(?P<decimales>\d+))?\s*(?P<unidad>[^\d\s.,].*)?$"
+)
+_RE_MILES = re.compile(_PATRON_MILES)
+
+# Una fila por texto: entero (solo cifras; NaN si no se reconoce), separador, decimales,
+# unidad, miles (separador de miles o NaN), agrupado y ambiguo
+def _partes_numero(textos: pd.Series) -> pd.DataFrame:
+    partes = textos.str.extract(_PATRON_VALOR)
+    # Solo pueden llevar miles los textos con tres "decimales" o que el patrón simple no reconoce
+    candidatos = partes["decimales"].str.len().eq(3) | partes["entero"].isna()
+    miles = textos[candidatos].str.extract(_PATRON_MILES).reindex(textos.index)
+    con_miles = miles["entero"].notna()
+    partes["miles"] = miles["miles"]
+    partes["ambiguo"] = con_miles & miles["grupos"].eq("") & miles["separador"].isna() & miles["miles"].isin([".", ","])
+    partes["agrupado"] = con_miles & ~partes["ambiguo"]
+    agrupado = partes["agrupado"]
+    partes.loc[agrupado, ["separador", "decimales", "unidad"]] = miles.loc[agrupado, ["separador", "decimales", "unidad"]]
+    partes.loc[agrupado, "entero"] = miles.loc[agrupado, "entero"].str.replace(r"\D", "", regex=True)
+    return partes
+
+# Valor de cada fila de _partes_numero. El grupo ambiguo se lee como en es-CO:
+# el punto separa miles ("1.250" = 1250) y la coma, decimales ("1,250" = 1,25).
+def _valor_partes(partes: pd.DataFrame) -> np.ndarray:
+    punto_miles = partes["ambiguo"] & partes["miles"].eq(".")
+    entero = partes["entero"].where(~punto_miles, partes["entero"] + partes["decimales"])
+    decimales = partes["decimales"].mask(punto_miles)
+    return pd.to_numeric(entero + "." + decimales.fillna("0"), errors="coerce").to_numpy(dtype=float, copy=True)
+
+# Texto → número, una vez por texto distinto; lo vacío o ilegible queda NaN.
+# `con_unidad=False`: un texto con unidad ("12 mg") también es ilegible.
+def leer_numeros(serie: pd.Series, con_unidad: bool = True) -> np.ndarray:
+    codigos, unicos = pd.factorize(serie.astype("string").str.strip().fillna(""))
+    partes = _partes_numero(pd.Series(unicos, dtype=object))
+    valor = _valor_partes(partes)
+    if not con_unidad:
+        valor[partes["unidad"].notna().to_numpy()] = np.nan
+    return valor[codigos]
+
+# Columna de tabla → números: las celdas ya numéricas pasan tal cual y los textos
+# se leen con leer_numeros (sin unidad). Lo ilegible queda NaN.
+def a_numero(serie: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype(float)
+    es_texto = serie.map(type).eq(str).to_numpy()
+    valor = pd.to_numeric(serie.where(~es_texto), errors="coerce").to_numpy(dtype=float, copy=True)
+    if es_texto.any():
+        valor[es_texto] = leer_numeros(serie[es_texto], con_unidad=False)
+    return pd.Series(valor, index=serie.index)
+
+# Acepta los nombres internos o los rótulos de `columnas`; las banderas ausentes valen False.
+# Las celdas numéricas vacías o ilegibles quedan NaN y se describen en la columna
+# `error` de su fila ("" si la fila está completa): un dato faltante nunca cuenta como 0.
+def normalizar_tabla(df: pd.DataFrame, columnas: dict, banderas: tuple = ()) -> pd.DataFrame:
+    df = df.rename(columns={v: k for k, v in columnas.items()})
+    faltantes = [c for c in columnas if c not in df.columns and c not in banderas]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+    errores = np.full(len(df), "", dtype=object)
+    for c in columnas:
+        if c in banderas:
+            df[c] = _a_bool(df[c]) if c in df.columns else False
+            continue
+        valor = a_numero(df[c]).to_numpy()
+        vacio = df[c].isna().to_numpy()
+        if not pd.api.types.is_numeric_dtype(df[c]):
+            vacio = vacio | df[c].astype("string").str.strip().fillna("").eq("").to_numpy(dtype=bool)
+        ilegible = np.isnan(valor) & ~vacio
+        if vacio.any():
+            errores[vacio] += f"{c}: sin valor; "
+        if ilegible.any():
+            errores[ilegible] += f"{c}: no numérico; "
+        df[c] = np.clip(valor, 0.0, None)
+    df["error"] = [e[:-2] for e in errores] if any(errores) else errores
+    return df
+
+# `como_texto`: conserva los valores tal como están impresos ("2,50" no se vuelve 2.5)
+def leer_tabla(archivo, como_texto: bool = False) -> pd.DataFrame:
+    dtype = str if como_texto else None
+    if archivo.name.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(archivo, dtype=dtype)
+    return pd.read_csv(archivo, sep=None, engine="python", dtype=dtype, keep_default_na=not como_texto)
+
+# ------------------------------------------------------------
+# MOTOR DE SELLOS — Res. 810/2021 Art. 25 y Tabla 3 (mod. Res. 2492/2022)
+# Vectorizado: evalúa una fila (herramienta individual) o un portafolio completo.
+# ------------------------------------------------------------
+COLUMNAS_SELLOS = {
+    "kcal": "Calorías totales (kcal)",
+    "azucares_libres_g": "Azúcares libres (g)",
+    "grasas_saturadas_g": "Grasas saturadas (g)",
+    "grasas_trans_mg": "Grasas trans (mg)",
+    "sodio_mg": "Sodio (mg)",
+    "edulcorante": "Contiene edulcorante",
+    "bebida_sin_kcal": "Bebida sin aporte energético",
+}
+COLUMNAS_SELLOS_BANDERA = ("edulcorante", "bebida_sin_kcal")
+
+SELLOS = [
+    ("sello_azucares", "EXCESO EN AZÚCARES"),
+    ("sello_grasas_saturadas", "EXCESO EN GRASAS SATURADAS"),
+    ("sello_grasas_trans", "EXCESO EN GRASAS TRANS"),
+    ("sello_sodio", "EXCESO EN SODIO"),
+    ("sello_edulcorante", "CONTIENE EDULCORANTE"),
+]
+
+def _pct_kcal(kcal: np.ndarray, aporte_kcal: np.ndarray) -> np.ndarray:
+    # % de kcal totales; 0 cuando no hay calorías declaradas (igual que la herramienta individual)
+    return np.divide(aporte_kcal * 100.0, kcal, out=np.zeros_like(kcal), where=kcal > 0)
+
+# Una fila por producto, nutrientes por 100 g / 100 mL.
+# `fecha`: normativa vigente ese día (None = hoy) o una fecha por fila.
+# Las filas con `error` (nutriente vacío o ilegible) no se evalúan: sus sellos
+# de nutrientes y `num_sellos` quedan vacíos (NA), nunca "sin sello".
+def determinar_sellos(df: pd.DataFrame, fecha=None) -> pd.DataFrame:
+    df = normalizar_tabla(df.copy(), COLUMNAS_SELLOS, COLUMNAS_SELLOS_BANDERA)
+    idx = NORMATIVA.indices(fecha, len(df))
+    def umbral(campo):
+        return NORMATIVA.valor("sellos", campo, idx)
+    kcal = df["kcal"].to_numpy(dtype=float)
+    sodio = df["sodio_mg"].to_numpy(dtype=float)
+    bebida = df["bebida_sin_kcal"].to_numpy(dtype=bool)
+    factor_carb = NORMATIVA.valor("atwater", "carbohidratos_g", idx)
+    factor_grasa = NORMATIVA.valor("atwater", "grasas_g", idx)
+
+    df["pct_kcal_azucares"] = _pct_kcal(kcal, df["azucares_libres_g"].to_numpy(dtype=float) * factor_carb)
+    df["pct_kcal_grasas_saturadas"] = _pct_kcal(kcal, df["grasas_saturadas_g"].to_numpy(dtype=float) * factor_grasa)
+    df["pct_kcal_grasas_trans"] = _pct_kcal(kcal, df["grasas_trans_mg"].to_numpy(dtype=float) / 1000 * factor_grasa)
+    df["sodio_mg_por_kcal"] = np.divide(sodio, kcal, out=np.zeros_like(kcal), where=kcal > 0)
+
+    df["sello_azucares"] = df["pct_kcal_azucares"].to_numpy() >= umbral("azucares_pct_kcal")
+    df["sello_grasas_saturadas"] = df["pct_kcal_grasas_saturadas"].to_numpy() >= umbral("grasas_saturadas_pct_kcal")
+    df["sello_grasas_trans"] = df["pct_kcal_grasas_trans"].to_numpy() >= umbral("grasas_trans_pct_kcal")
+    df["sello_sodio"] = np.where(
+        bebida,
+        sodio >= umbral("sodio_bebida_sin_kcal_mg"),
+        (df["sodio_mg_por_kcal"].to_numpy() >= umbral("sodio_mg_por_kcal")) | (sodio >= umbral("sodio_mg")),
+    )
+    df["sello_edulcorante"] = df["edulcorante"]
+
+    # Texto resumen: concatenación vectorizada por columna de sello
+    texto = pd.Series("", index=df.index)
+    for col, nombre in SELLOS:
+        texto = texto.where(~df[col], texto + nombre + "; ")
+    df["sellos"] = texto.str.rstrip("; ")
+    invalida = df["error"].ne("").to_numpy()
+    ninguna = np.zeros(len(df), dtype=bool)
+    num = np.zeros(len(df), dtype=np.int64)
+    for col, _ in SELLOS:
+        valores = df[col].to_numpy(dtype=bool)
+        num += valores
+        df[col] = pd.arrays.BooleanArray(valores, ninguna if col == "sello_edulcorante" else invalida.copy())
+    df["num_sellos"] = pd.arrays.IntegerArray(num, invalida.copy())
+    if invalida.any():
+        df.loc[invalida, ["pct_kcal_azucares", "pct_kcal_grasas_saturadas", "pct_kcal_grasas_trans", "sodio_mg_por_kcal"]] = np.nan
+        df.loc[invalida, "sellos"] = ""
+    df["version_reglas"] = NORMATIVA.etiquetas(idx)
+    return df
+
+# Rótulos para la herramienta individual (con % kcal cuando aplica)
+def describir_sellos(fila: pd.Series) -> list:
+    pct = {
+        "sello_azucares": fila["pct_kcal_azucares"],
+        "sello_grasas_saturadas": fila["pct_kcal_grasas_saturadas"],
+        "sello_grasas_trans": fila["pct_kcal_grasas_trans"],
+    }
+    rotulos = []
+    for col, nombre in SELLOS:
+        if not fila[col]:
+            continue
+        if col in pct:
+            rotulos.append(f"❗ {nombre} ({pct[col]:.1f}% kcal)")
+        elif col == "sello_edulcorante":
+            rotulos.append(f"⚠️ {nombre}")
+        else:
+            rotulos.append(f"❗ {nombre}")
+    return rotulos
+
+# ------------------------------------------------------------
+# MOTOR DE CALORÍAS — Res. 810/2021 Art. 17 (tolerancia ±20%)
+# ------------------------------------------------------------
+COLUMNAS_CALORIAS = {
+    "kcal_declaradas": "Calorías declaradas (kcal)",
+    "carbohidratos_g": "Carbohidratos (g)",
+    "proteinas_g": "Proteínas (g)",
+    "grasas_g": "Grasas (g)",
+}
+FACTORES_ATWATER = dict(_VIGENTE["calorias"]["factores_atwater"])
+TOLERANCIA_CALORIAS_PCT = float(_VIGENTE["calorias"]["tolerancia_pct"])
+
+# Una fila por producto (por 100 g o 100 mL); `cumple` queda vacío si no hay kcal declaradas
+# o si algún dato de la fila está vacío o es ilegible (ver `error`).
+# `fecha`: como en determinar_sellos.
+def verificar_calorias(df: pd.DataFrame, fecha=None) -> pd.DataFrame:
+    df = normalizar_tabla(df.copy(), COLUMNAS_CALORIAS)
+    idx = NORMATIVA.indices(fecha, len(df))
+    calc = sum(df[c].to_numpy(dtype=float) * NORMATIVA.valor("atwater", c, idx) for c in FACTORES_ATWATER)
+    decl = df["kcal_declaradas"].to_numpy(dtype=float)
+    diff = calc - decl
+    pct = np.divide(diff, decl, out=np.full_like(decl, np.nan), where=decl > 0) * 100.0
+
+    df["kcal_calculadas"] = calc
+    df["diferencia_kcal"] = diff
+    df["diferencia_abs_kcal"] = np.abs(diff)
+    df["diferencia_pct"] = pct
+    # Sin veredicto (NA) sin kcal declaradas o con macronutrientes vacíos / ilegibles (`error`):
+    # nunca se compara contra 0 kcal calculadas
+    sin_veredicto = ~(decl > 0) | df["error"].ne("").to_numpy()
+    df["cumple"] = pd.arrays.BooleanArray(
+        np.abs(pct) <= NORMATIVA.valor("calorias", "tolerancia_pct", idx), sin_veredicto
+    )
+    df["version_reglas"] = NORMATIVA.etiquetas(idx)
+    return df
+
+# ------------------------------------------------------------
+# MOTOR DE TAMAÑO DE SELLOS — Res. 810/2021 Art. 27, Tablas 17/18 (mod. Res. 2492/2022)
+# ------------------------------------------------------------
+COLUMNAS_TAMANO = {
+    "area_cara_cm2": "Área de la cara principal (cm²)",
+    "num_sellos": "Número de sellos requeridos",
+    "lado_real_cm": "Tamaño real del sello en el arte (cm)",
+}
+
+# Lado mínimo por búsqueda binaria sobre los cortes; NaN fuera del rango de la Tabla 18
+def lado_minimo_tabla18(area_cara_cm2, fecha=None) -> np.ndarray:
+    area = np.asarray(area_cara_cm2, dtype=float)
+    plano = np.atleast_1d(area).ravel()
+    idx = NORMATIVA.indices(fecha, len(plano))
+    return NORMATIVA.lado_tabla18(plano, idx).reshape(area.shape)
+
+# Evalúa un arreglo de caras principales en una sola llamada.
+# `regla`: tabla_18 | envase_secundario | fijo | ads (2 o más sellos)
+# `fecha`: como en determinar_sellos.
+def evaluar_tamano_sellos(area_cara_cm2, num_sellos=1, lado_real_cm=0.0, fecha=None) -> pd.DataFrame:
+    area, num, lado = np.broadcast_arrays(
+        np.asarray(area_cara_cm2, dtype=float),
+        np.asarray(num_sellos, dtype=int),
+        np.asarray(lado_real_cm, dtype=float),
+    )
+    area, num, lado = np.atleast_1d(area, num, lado)
+    idx = NORMATIVA.indices(fecha, len(area))
+    uno = num <= 1
+    grande = area > NORMATIVA.valor("tamano", "area_max_tabla_cm2", idx)
+    chico = area < NORMATIVA.valor("tamano", "area_min_cm2", idx)
+
+    lado_min = np.where(grande, NORMATIVA.valor("tamano", "lado_fijo_cm", idx), NORMATIVA.lado_tabla18(area, idx))
+    lado_min = np.where(uno | grande, lado_min, np.nan)
+    ads = np.where(~uno & ~grande, NORMATIVA.valor("tamano", "ads_fraccion", idx) * area, np.nan)
+    area_total = lado ** 2 * num
+
+    regla = np.select(
+        [uno & chico, uno & ~grande, grande],
+        ["envase_secundario", "tabla_18", "fijo"],
+        default="ads",
+    )
+    cumple = np.select(
+        [uno & chico, regla == "ads"],
+        [False, area_total <= ads],
+        default=lado >= lado_min,
+    )
+    return pd.DataFrame({
+        "area_cara_cm2": area,
+        "num_sellos": num,
+        "lado_real_cm": lado,
+        "regla": regla,
+        "lado_min_cm": lado_min,
+        "ads_cm2": ads,
+        "area_total_sellos_cm2": area_total,
+        "cumple": cumple.astype(bool),
+        "version_reglas": NORMATIVA.etiquetas(idx),
+    })
+
+# ------------------------------------------------------------
+# APROXIMACIÓN DE VALORES — Res. 810/2021 Art. 8
+# Valida el valor tal como está impreso (texto) en la tabla nutricional:
+#   ≥10 entero | ≥1 y <10 una decimal | <1 dos decimales (vitaminas y minerales) o una (resto)
+# ------------------------------------------------------------
+COLUMNAS_APROXIMACION = {
+    "nutriente": "Nutriente",
+    "valor": "Valor declarado",
+}
+NUTRIENTES_TABLA = [NOMBRE_NUTRIENTE[c] for c in OBLIGATORIOS]
+# Prefijos (normalizados) de vitaminas y minerales fuera del esquema;
+# el sodio se declara con los macronutrientes
+MICRONUTRIENTES = (
+    "vitamina", "acido folico", "folato", "niacina", "riboflavina", "tiamina", "biotina",
+    "acido pantotenico", "calcio", "hierro", "zinc", "magnesio", "fosforo", "potasio",
+    "yodo", "selenio", "cobre", "manganeso", "cromo", "molibdeno", "fluor",
+)
+_RE_UNIDAD_NOMBRE = re.compile(r"\(([^)]*)\)\s*$")
+
+def _decimales_exigidos(valor: np.ndarray, micro: np.ndarray) -> np.ndarray:
+    return np.select([valor >= 10, valor >= 1, micro], [0, 1, 2], default=1)
+
+# Redondeo comercial (mitad hacia arriba), no el redondeo al par de NumPy
+def _redondear(valor: np.ndarray, decimales: np.ndarray) -> np.ndarray:
+    escala = 10.0 ** decimales
+    return np.floor(valor * escala + 0.5 + 1e-9) / escala
+
+def _es_micronutriente(nombres: pd.Series) -> np.ndarray:
+    # Una normalización por nombre distinto, no por fila
+    unicos = pd.unique(nombres.astype(str))
+    micro = {}
+    for n in unicos:
+        clave = identificar_nutriente(n)
+        micro[n] = TIPO_NUTRIENTE[clave] == "micro" if clave else normalizar_nombre(n).startswith(MICRONUTRIENTES)
+    return nombres.astype(str).map(micro).to_numpy(dtype=bool)
+
+# Formato largo: una fila por (producto, nutriente). `valor` debe llegar como texto.
+# La columna opcional `micronutriente` (sí/no) prevalece sobre la detección por nombre.
+def validar_aproximacion(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns={v: k for k, v in COLUMNAS_APROXIMACION.items()}).copy()
+    faltantes = [c for c in COLUMNAS_APROXIMACION if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+
+    # Las tablas repiten mucho los mismos textos: se analiza cada texto distinto una vez
+    codigos, unicos = pd.factorize(df["valor"].fillna("").astype(str).str.strip())
+    unicos = pd.Series(unicos, dtype=object)
+    partes = _partes_numero(unicos)
+    # Aquí el grupo ambiguo ("1.250") no se adivina: se rechaza
+    partes.loc[partes["ambiguo"], "entero"] = np.nan
+    ambiguo = partes["ambiguo"].to_numpy(dtype=bool)[codigos]
+    vacio = (unicos == "").to_numpy(dtype=bool)[codigos]
+    reconocido = partes["entero"].notna().to_numpy()[codigos]
+    entero = partes["entero"].fillna("")
+    decimales = partes["decimales"].fillna("").str.len().to_numpy(dtype=int)[codigos]
+    valor = _valor_partes(partes)[codigos]
+    cero_izquierda = ((entero.str.len() > 1) & entero.str.startswith("0")).to_numpy(dtype=bool)[codigos]
+    separador = partes["separador"].fillna(",").to_numpy(dtype=object)[codigos]
+
+    micro = (
+        _a_bool(df["micronutriente"]).to_numpy(dtype=bool)
+        if "micronutriente" in df.columns
+        else _es_micronutriente(df["nutriente"])
+    )
+    exigidos = _decimales_exigidos(valor, micro)
+    # "0" sin decimales se acepta: es la forma usual de declarar un aporte no significativo
+    cero_entero = (valor == 0) & (decimales == 0)
+    cumple = reconocido & ~cero_izquierda & ((decimales == exigidos) | cero_entero)
+
+    # Expresión correcta: se redondea y se vuelve a aplicar el rango (9,96 → 10,0 → "10")
+    redondeado = _redondear(valor, exigidos)
+    exigidos_finales = _decimales_exigidos(redondeado, micro)
+    redondeado = _redondear(redondeado, exigidos_finales)
+    # Se formatea una vez por combinación (texto, micronutriente) con falla
+    _, primera, inversa = np.unique(codigos * 2 + micro, return_index=True, return_inverse=True)
+    # (sin agrupar miles: "1250" lo acepta el validador; "1.250" sería ambiguo)
+    por_combinacion = np.array([
+        f"{redondeado[i]:.{exigidos_finales[i]}f}".replace(".", separador[i])
+        if reconocido[i] and not cumple[i] else ""
+        for i in primera
+    ], dtype=object)
+    esperado = por_combinacion[inversa]
+
+    df["valor_num"] = valor
+    df["micronutriente"] = micro
+    df["decimales"] = np.where(reconocido, decimales, -1)
+    df["decimales_exigidos"] = exigidos
+    df["valor_esperado"] = esperado
+    df["motivo"] = np.select(
+        [ambiguo, ~reconocido, cero_izquierda, ~cumple],
+        ["separador ambiguo (¿miles o decimales?); p. ej. escriba 1250 o 1,25", "formato no reconocido",
+         "cero a la izquierda", "cantidad de decimales incorrecta"],
+        default="",
+    )
+    df["cumple"] = pd.array(cumple, dtype="boolean")
+    df.loc[vacio, ["cumple", "motivo"]] = [pd.NA, "sin valor"]
+    return df
+
+# Tablas anchas (una fila por producto, una columna por nutriente) → formato largo.
+# La primera columna identifica el producto; "Sodio (mg)" aporta también la unidad.
+def a_formato_largo(df: pd.DataFrame) -> pd.DataFrame:
+    if "nutriente" in df.columns or COLUMNAS_APROXIMACION["nutriente"] in df.columns:
+        return df
+    id_col = df.columns[0]
+    largo = df.melt(id_vars=[id_col], var_name="nutriente", value_name="valor")
+    encabezado = largo["nutriente"].astype(str).str.extract(r"^(?P<nombre>.*?)\s*\((?P<unidad>[^)]*)\)\s*$")
+    con_unidad = encabezado["nombre"].notna()
+    largo.loc[con_unidad, "nutriente"] = encabezado.loc[con_unidad, "nombre"]
+    largo["unidad"] = encabezado["unidad"]
+    return largo.rename(columns={id_col: "producto"})
+
+# Resumen para la observación del ítem: "Sodio: 12,5 → 13; ..."
+def describir_aproximacion(res: pd.DataFrame) -> str:
+    fallas = res[res["cumple"].eq(False)]
+    return "; ".join(
+        f"{f.nutriente}: {f.valor} → {f.valor_esperado or f.motivo}"
+        for f in fallas.itertuples()
+    )
+
+# ------------------------------------------------------------
+# UNIDADES Y NUTRIENTES OBLIGATORIOS — Res. 810/2021 Art. 8 y 8.1.1
+# Misma tabla en formato largo que la aproximación (producto, nutriente, valor,
+# unidad); la unidad puede venir en su columna, pegada al valor ("12 mg") o
+# en el nombre ("Sodio (mg)").
+# Una fila "Fuente no significativa de vitamina D y zinc" exime a esos
+# micronutrientes obligatorios de aparecer en la tabla.
+# ------------------------------------------------------------
+def _por_texto_distinto(serie: pd.Series, funcion) -> pd.Series:
+    codigos, unicos = pd.factorize(serie.fillna("").astype(str))
+    resultados = np.empty(len(unicos), dtype=object)
+    resultados[:] = [funcion(u) for u in unicos]
+    return pd.Series(resultados[codigos], index=serie.index)
+
+def _es_leyenda(nombre: str) -> bool:
+    return normalizar_nombre(nombre).startswith(LEYENDA_NO_SIGNIFICATIVA)
+
+def _nutrientes_de_leyenda(texto: str) -> tuple:
+    resto = normalizar_nombre(texto).split(LEYENDA_NO_SIGNIFICATIVA, 1)[-1]
+    partes = pd.Series(resto).str.split(r",|;|\by\b|\be\b", regex=True).iloc[0]
+    return tuple(c for c in (identificar_nutriente(p) for p in partes if p.strip()) if c)
+
+def _columna_texto(df: pd.DataFrame, columna: str) -> pd.Series:
+    if columna in df.columns:
+        return df[columna].fillna("").astype(str).str.strip()
+    return pd.Series("", index=df.index)
+
+def _preparar_tabla(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns={v: k for k, v in COLUMNAS_APROXIMACION.items()}).copy()
+    if "producto" not in df.columns and "sku" in df.columns:
+        df = df.rename(columns={"sku": "producto"})
+    if "nutriente" not in df.columns:
+        raise ValueError("Faltan columnas obligatorias: nutriente")
+    if "producto" not in df.columns:
+        df["producto"] = ""
+    df["producto"] = df["producto"].fillna("").astype(str)
+    df["clave"] = _por_texto_distinto(df["nutriente"], identificar_nutriente)
+    df["leyenda"] = _por_texto_distinto(df["nutriente"], _es_leyenda).astype(bool)
+    return df
+
+def _unidad_en_texto(texto: str) -> str:
+    valor = _RE_VALOR.match(texto) or _RE_MILES.match(texto)
+    if valor and valor.group("unidad"):
+        return valor.group("unidad").strip()
+    nombre = _RE_UNIDAD_NOMBRE.search(texto)
+    return nombre.group(1).strip() if nombre else ""
+
+# Prioridad: columna unidad, unidad pegada al valor, unidad en el nombre
+def _unidad_declarada(df: pd.DataFrame) -> pd.Series:
+    unidad = _columna_texto(df, "unidad")
+    sin_columna = unidad == ""
+    unidad[sin_columna] = _por_texto_distinto(_columna_texto(df, "valor")[sin_columna], _unidad_en_texto)
+    sin_valor = unidad == ""
+    unidad[sin_valor] = _por_texto_distinto(df["nutriente"][sin_valor], _unidad_en_texto)
+    return unidad
+
+def verificar_unidades(df: pd.DataFrame) -> pd.DataFrame:
+    df = _preparar_tabla(df)
+    unidad = _unidad_declarada(df)
+    df["unidad_declarada"] = unidad
+    normalizada = _por_texto_distinto(unidad, normalizar_unidad)
+
+    conocido = (df["clave"].notna() & ~df["leyenda"]).to_numpy()
+    admitida = (df["clave"].fillna("").astype(str) + "|" + normalizada.astype(str)).isin(PARES_UNIDAD).to_numpy()
+    # Mismo (producto, nutriente, unidad) repetido; energía en kcal y en kJ no es duplicado
+    llave = pd.Series(
+        pd.factorize(df["producto"])[0].astype(np.int64) * 1_000_000
+        + pd.factorize(df["clave"])[0] * 1_000
+        + pd.factorize(normalizada)[0]
+    )
+    duplicado = conocido & llave.duplicated().to_numpy()
+    df["unidades_admitidas"] = df["clave"].map({c: " / ".join(u) for c, u in UNIDADES_NUTRIENTE.items()}).fillna("")
+    df["estado_unidad"] = np.select(
+        [df["leyenda"].to_numpy(), ~conocido, (unidad == "").to_numpy(), ~admitida, duplicado],
+        ["leyenda", "no incluido en el esquema", "sin unidad", "unidad incorrecta", "duplicado"],
+        default="ok",
+    )
+    cumple = pd.array(df["estado_unidad"].to_numpy() == "ok", dtype="boolean")
+    cumple[~conocido] = pd.NA
+    df["cumple"] = cumple
+    return df
+
+COLUMNA_OBLIGATORIO = {c: i for i, c in enumerate(OBLIGATORIOS)}
+_PESOS_OBLIGATORIOS = 1 << np.arange(len(OBLIGATORIOS), dtype=np.int64)
+
+def _lista_por_mascara(mascaras: np.ndarray) -> np.ndarray:
+    # Un texto por combinación distinta de nutrientes, no por producto
+    unicas, inversa = np.unique(mascaras, return_inverse=True)
+    textos = np.array([
+        ", ".join(NOMBRE_NUTRIENTE[c] for i, c in enumerate(OBLIGATORIOS) if m >> i & 1)
+        for m in unicas
+    ], dtype=object)
+    return textos[inversa]
+
+# Una fila por producto con los obligatorios faltantes y los declarados como no significativos.
+# Matriz booleana producto × obligatorio construida por índices, sin tablas cruzadas.
+def verificar_obligatorios(df: pd.DataFrame) -> pd.DataFrame:
+    df = _preparar_tabla(df)
+    cod_producto, productos = pd.factorize(df["producto"])
+    columna = df["clave"].map(COLUMNA_OBLIGATORIO).fillna(-1).to_numpy(dtype=int)
+
+    presentes = np.zeros((len(productos), len(OBLIGATORIOS)), dtype=bool)
+    declarado = (columna >= 0) & ~df["leyenda"].to_numpy()
+    presentes[cod_producto[declarado], columna[declarado]] = True
+
+    leyendas = df[df["leyenda"]]
+    texto_leyenda = leyendas["nutriente"].astype(str) + " " + _columna_texto(leyendas, "valor")
+    exentos_largo = pd.DataFrame({
+        "producto": cod_producto[df["leyenda"].to_numpy()],
+        "clave": _por_texto_distinto(texto_leyenda, _nutrientes_de_leyenda).to_numpy(),
+    }).explode("clave")
+    exentos_largo = exentos_largo[exentos_largo["clave"].isin(MICRO_OBLIGATORIOS)]
+    exentos = np.zeros_like(presentes)
+    exentos[
+        exentos_largo["producto"].to_numpy(dtype=int),
+        exentos_largo["clave"].map(COLUMNA_OBLIGATORIO).to_numpy(dtype=int),
+    ] = True
+    exentos &= ~presentes
+    faltan = ~presentes & ~exentos
+
+    return pd.DataFrame({
+        "producto": productos,
+        "faltantes": _lista_por_mascara(faltan @ _PESOS_OBLIGATORIOS),
+        "no_significativos": _lista_por_mascara(exentos @ _PESOS_OBLIGATORIOS),
+        "num_faltantes": faltan.sum(axis=1),
+        "cumple": ~faltan.any(axis=1),
+    })
+
+# Resúmenes para la observación del ítem
+def describir_unidades(res: pd.DataFrame) -> str:
+    fallas = res[res["cumple"].eq(False)]
+    return "; ".join(
+        f"{f.nutriente}: {f.unidad_declarada or 'sin unidad'} ({f.estado_unidad}; se admite {f.unidades_admitidas})"
+        for f in fallas.itertuples()
+    )
+
+def describir_obligatorios(res: pd.DataFrame) -> str:
+    return "; ".join(
+        (f"{f.producto}: " if f.producto else "") + f"faltan {f.faltantes}"
+        for f in res[~res["cumple"]].itertuples()
+    )
+
+# ------------------------------------------------------------
+# CONSISTENCIA CON ANÁLISIS BROMATOLÓGICO — Res. 810/2021 (tolerancia ±20%; cero según Art. 8)
+# Declarado y laboratorio en formato largo; se unen por (producto, nutriente)
+# con un merge por hash y la desviación se calcula en una sola pasada.
+# ------------------------------------------------------------
+TOLERANCIA_BROMATOLOGICO_PCT = float(_VIGENTE["bromatologico"]["tolerancia_pct"])
+# Factor a la unidad base de cada dimensión (g para masa, kcal para energía)
+FACTORES_UNIDAD = {
+    "g": ("masa", 1.0),
+    "mg": ("masa", 1e-3),
+    "ug": ("masa", 1e-6),
+    "ug er": ("masa", 1e-6),
+    "kcal": ("energia", 1.0),
+    "kj": ("energia", 1 / 4.184),
+}
+# Factor de la unidad del esquema de cada nutriente (en la que se dan los umbrales de cero)
+FACTOR_UNIDAD_ESQUEMA = {
+    clave: FACTORES_UNIDAD[normalizar_unidad(unidades[0])][1]
+    for clave, unidades in UNIDADES_NUTRIENTE.items() if normalizar_unidad(unidades[0]) in FACTORES_UNIDAD
+}
+
+# (producto, clave, nutriente, valor, ilegible, unidad, factor a la base, dimensión); los nutrientes
+# fuera del esquema se unen por su nombre normalizado. Las filas sin valor se descartan; las de
+# valor ilegible se conservan marcadas. Duplicados (p. ej. kcal y kJ) → primera fila legible.
+def _tabla_para_cruce(df: pd.DataFrame) -> pd.DataFrame:
+    df = _preparar_tabla(df)
+    df = df[~df["leyenda"]]
+    unidad = _unidad_declarada(df)
+    normalizada = _por_texto_distinto(unidad, normalizar_unidad)
+    texto = _columna_texto(df, "valor")
+    valor = leer_numeros(texto)
+    tabla = pd.DataFrame({
+        "producto": df["producto"],
+        "clave": df["clave"].fillna(_por_texto_distinto(df["nutriente"], normalizar_nombre)),
+        "nutriente": df["nutriente"],
+        "valor": valor,
+        "ilegible": np.isnan(valor),
+        "unidad": unidad,
+        "factor": normalizada.map({u: f for u, (_, f) in FACTORES_UNIDAD.items()}).fillna(1.0).astype(float),
+        "dimension": normalizada.map({u: d for u, (d, _) in FACTORES_UNIDAD.items()}).fillna(""),
+    })
+    tabla = tabla[(texto != "").to_numpy()]
+    return tabla.sort_values("ilegible", kind="stable").drop_duplicates(["producto", "clave"])
+
+# Una fila por (producto, nutriente); el valor de laboratorio se expresa en la unidad declarada
+# `fecha`: la del análisis, para elegir la tolerancia vigente (None = hoy)
+def consistencia_bromatologica(declarado: pd.DataFrame, laboratorio: pd.DataFrame, fecha=None) -> pd.DataFrame:
+    decl = _tabla_para_cruce(declarado)
+    lab = _tabla_para_cruce(laboratorio)
+    res = decl.merge(
+        lab.drop(columns="nutriente"),
+        on=["producto", "clave"], how="outer", suffixes=("_declarado", "_laboratorio"), indicator=True,
+    )
+    res["nutriente"] = res["nutriente"].fillna(res["clave"].map(NOMBRE_NUTRIENTE)).fillna(res["clave"])
+    res["unidad"] = res["unidad_declarado"].fillna(res["unidad_laboratorio"])
+
+    dim_d = res["dimension_declarado"].fillna("").to_numpy(dtype=str)
+    dim_l = res["dimension_laboratorio"].fillna("").to_numpy(dtype=str)
+    sin_analisis = (res["_merge"] == "left_only").to_numpy()
+    no_declarado = (res["_merge"] == "right_only").to_numpy()
+    ilegible = (
+        res["ilegible_declarado"].fillna(False).to_numpy(dtype=bool)
+        | res["ilegible_laboratorio"].fillna(False).to_numpy(dtype=bool)
+    )
+    incompatibles = (dim_d != dim_l) & (dim_d != "") & (dim_l != "")
+    f_d = res["factor_declarado"].fillna(1.0).to_numpy(dtype=float)
+    f_l = res["factor_laboratorio"].fillna(1.0).to_numpy(dtype=float)
+    convertible = ~(sin_analisis | no_declarado | incompatibles | ilegible)
+    res["valor_laboratorio"] = np.where(
+        convertible, res["valor_laboratorio"].to_numpy(dtype=float) * f_l / f_d, res["valor_laboratorio"]
+    )
+
+    d = res["valor_declarado"].to_numpy(dtype=float)
+    l = res["valor_laboratorio"].to_numpy(dtype=float)
+    idx = NORMATIVA.indices(fecha, len(res))
+    tolerancia = NORMATIVA.valor("bromatologico", "tolerancia_pct", idx)
+    # Art. 8: bajo el umbral de cero del nutriente (llevado a la unidad declarada) el valor
+    # puede declararse 0; si declarado y laboratorio quedan ambos por debajo, se acepta
+    # antes de aplicar la tolerancia (0 declarado frente a 0,2 g medido no es una falla).
+    umbral = (
+        NORMATIVA.umbral_cero(res["clave"].to_numpy(dtype=object), idx)
+        * res["clave"].map(FACTOR_UNIDAD_ESQUEMA).fillna(1.0).to_numpy(dtype=float) / f_d
+    )
+    bajo_umbral = convertible & (d < umbral) & (l < umbral)
+    sin_base = (d == 0) & (l != 0) & convertible & ~bajo_umbral
+
+    desviacion = np.divide(l - d, d, out=np.zeros_like(d), where=d != 0) * 100.0
+    evaluable = convertible & ~sin_base
+    desviacion[~evaluable | (bajo_umbral & (d == 0) & (l != 0))] = np.nan
+    res["desviacion_pct"] = desviacion
+    res["estado"] = np.select(
+        [ilegible, sin_analisis, no_declarado, incompatibles, bajo_umbral & (d != l), sin_base,
+         np.abs(desviacion) > tolerancia],
+        ["valor ilegible", "sin análisis", "no declarado", "unidades incompatibles", "bajo el umbral para declarar 0 (Art. 8)",
+         "declarado 0 con valor en laboratorio", "fuera de tolerancia"],
+        default="dentro de tolerancia",
+    )
+    cumple = pd.array(np.abs(desviacion) <= tolerancia, dtype="boolean")
+    cumple[~evaluable] = pd.NA
+    cumple[bajo_umbral] = True
+    cumple[sin_base] = False
+    res["cumple"] = cumple
+    res["version_reglas"] = NORMATIVA.etiquetas(idx)
+    return res[[
+        "producto", "clave", "nutriente", "unidad", "valor_declarado", "valor_laboratorio",
+        "desviacion_pct", "estado", "cumple", "version_reglas",
+    ]]
+
+# Resumen para la observación del ítem: "Sodio: declarado 120, laboratorio 160 (+33,3%)"
+def describir_bromatologico(res: pd.DataFrame) -> str:
+    fallas = res[res["cumple"].eq(False)]
+    return "; ".join(
+        (f"{f.producto} — " if f.producto else "")
+        + f"{f.nutriente}: declarado {f.valor_declarado:g}, laboratorio {f.valor_laboratorio:g} {f.unidad}".rstrip()
+        + (f" ({f.desviacion_pct:+.1f}%)" if not pd.isna(f.desviacion_pct) else f" ({f.estado})")
+        for f in fallas.itertuples()
+    )
+
+# ------------------------------------------------------------
+# PORCIONES — Res. 810/2021 (número de porciones y medida casera)
+# porciones = contenido neto / tamaño de porción, con redondeo configurable;
+# la medida casera se convierte con una tabla de equivalencias memorizada.
+# ------------------------------------------------------------
+COLUMNAS_PORCIONES = {
+    "contenido_neto": "Contenido neto",
+    "porcion": "Tamaño de porción",
+    "porciones_declaradas": "Porciones por envase",
+}
+# Paso de redondeo del número de porciones calculado
+REDONDEO_PORCIONES = {"entero": 1.0, "medio": 0.5, "decimal": 0.1}
+# Medidas del Sistema Internacional → (dimensión, factor a g o mL)
+UNIDADES_CONTENIDO = {
+    "g": ("masa", 1.0), "kg": ("masa", 1000.0), "mg": ("masa", 1e-3),
+    "ml": ("volumen", 1.0), "cc": ("volumen", 1.0), "cm3": ("volumen", 1.0), "l": ("volumen", 1000.0),
+}
+# Medidas caseras (nombre normalizado, singular) → (dimensión, equivalencia en g o mL)
+MEDIDAS_CASERAS = {
+    "oz": ("masa", 28.0), "onza": ("masa", 28.0),
+    "oz fl": ("volumen", 30.0), "onza liquida": ("volumen", 30.0), "fl oz": ("volumen", 30.0),
+    "taza": ("volumen", 240.0), "vaso": ("volumen", 240.0),
+    "cucharada": ("volumen", 15.0), "cda": ("volumen", 15.0),
+    "cucharadita": ("volumen", 5.0), "cdta": ("volumen", 5.0),
+}
+# Criterio de revisión: diferencia admitida entre la medida casera y la porción declarada
+TOLERANCIA_MEDIDA_CASERA_PCT = 10.0
+
+def _singular(unidad: str) -> str:
+    return " ".join(p[:-1] if len(p) > 3 and p.endswith("s") else p for p in unidad.split())
+
+# "150 g", "1,5 L", "30" → (dimensión, factor); sin unidad reconocida la dimensión queda vacía
+@lru_cache(maxsize=4096)
+def _unidad_cantidad(texto: str) -> tuple:
+    return UNIDADES_CONTENIDO.get(normalizar_unidad(_unidad_en_texto(texto)), ("", 1.0))
+
+# "1 oz", "2 cucharadas", "1/2 taza", "1 1/2 tazas" → (dimensión, equivalente en g o mL);
+# ("", nan) si no se reconoce
+@lru_cache(maxsize=4096)
+def convertir_medida_casera(texto: str) -> tuple:
+    t = normalizar_nombre(texto).replace(".", "")
+    fraccion = re.match(r"^(?:(\d+)\s+)?(\d+)\s*/\s*(\d+)\s*(.*)$", t)
+    if fraccion and int(fraccion.group(3)):
+        entero, numerador, denominador = int(fraccion.group(1) or 0), int(fraccion.group(2)), int(fraccion.group(3))
+        cantidad, unidad = entero + numerador / denominador, fraccion.group(4)
+    else:
+        cantidad, unidad = leer_numeros(pd.Series([t]))[0], normalizar_unidad(_unidad_en_texto(t))
+    unidad = _singular(unidad.split("(")[0].strip())
+    if np.isnan(cantidad) or unidad not in MEDIDAS_CASERAS:
+        return "", np.nan
+    dimension, equivalencia = MEDIDAS_CASERAS[unidad]
+    return dimension, cantidad * equivalencia
+
+# Cantidad en g o mL ("1.000 g" = 1000) y dimensión de cada fila
+def _cantidades(serie: pd.Series) -> tuple:
+    texto = serie.fillna("").astype(str).str.strip()
+    partes = _por_texto_distinto(texto, _unidad_cantidad)
+    dimension = np.array([p[0] for p in partes], dtype=object)
+    factor = np.array([p[1] for p in partes], dtype=float)
+    return leer_numeros(texto) * factor, dimension
+
+# Una fila por producto; `medida_casera` es opcional. Cantidades como texto con unidad
+# ("150 g") o números en la misma unidad para contenido y porción.
+def verificar_porciones(df: pd.DataFrame, redondeo: str = "entero") -> pd.DataFrame:
+    df = df.rename(columns={v: k for k, v in COLUMNAS_PORCIONES.items()}).copy()
+    faltantes = [c for c in COLUMNAS_PORCIONES if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+    if redondeo not in REDONDEO_PORCIONES:
+        raise ValueError(f"Redondeo no soportado: {redondeo}")
+    paso = REDONDEO_PORCIONES[redondeo]
+
+    neto, dim_neto = _cantidades(df["contenido_neto"])
+    porcion, dim_porcion = _cantidades(df["porcion"])
+    declaradas = leer_numeros(df["porciones_declaradas"])
+    incompatibles = (dim_neto != dim_porcion) & (dim_neto != "") & (dim_porcion != "")
+    calculables = ~incompatibles & (porcion > 0) & ~np.isnan(neto)
+
+    calculadas = np.divide(neto, porcion, out=np.full_like(neto, np.nan), where=calculables)
+    redondeadas = np.floor(calculadas / paso + 0.5 + 1e-9) * paso
+    cumple_porciones = np.isclose(redondeadas, declaradas)
+
+    if "medida_casera" in df.columns:
+        medidas = _por_texto_distinto(df["medida_casera"].fillna("").astype(str), convertir_medida_casera)
+        dim_medida = np.array([m[0] for m in medidas], dtype=object)
+        equivalente = np.array([m[1] for m in medidas], dtype=float)
+    else:
+        dim_medida = np.full(len(df), "", dtype=object)
+        equivalente = np.full(len(df), np.nan)
+    # Una porción sin unidad ("30") no se compara con la medida casera: se informa la unidad faltante
+    sin_unidad = (dim_medida != "") & (dim_porcion == "") & (porcion > 0)
+    comparable = (dim_medida != "") & (dim_medida == dim_porcion) & (porcion > 0)
+    desviacion = np.divide(equivalente - porcion, porcion, out=np.full_like(porcion, np.nan), where=comparable) * 100.0
+
+    df["contenido_neto_base"] = neto
+    df["porcion_base"] = porcion
+    df["porciones_calculadas"] = calculadas
+    df["porciones_redondeadas"] = redondeadas
+    df["medida_casera_equivalente"] = equivalente
+    df["desviacion_medida_pct"] = desviacion
+    df["porcion_sin_unidad"] = sin_unidad
+
+    cumple_p = pd.array(cumple_porciones, dtype="boolean")
+    cumple_p[~calculables | np.isnan(declaradas)] = pd.NA
+    cumple_m = pd.array(np.abs(desviacion) <= TOLERANCIA_MEDIDA_CASERA_PCT, dtype="boolean")
+    cumple_m[~comparable] = pd.NA
+    df["cumple_porciones"] = cumple_p
+    df["cumple_medida_casera"] = cumple_m
+    # Falla si alguna verificación falla; sin dato solo si ninguna se pudo evaluar
+    df["cumple"] = df["cumple_porciones"] & df["cumple_medida_casera"].fillna(True)
+    df["motivo"] = np.select(
+        [incompatibles, ~calculables,
+         ~cumple_p.fillna(True).to_numpy(dtype=bool), ~cumple_m.fillna(True).to_numpy(dtype=bool), sin_unidad],
+        ["contenido y porción en dimensiones distintas", "contenido o porción sin valor",
+         "porciones por envase no coinciden", "medida casera no equivale a la porción",
+         "unidad no declarada en la porción"],
+        default="",
+    )
+    return df
+
+# Resumen para la observación del ítem
+def describir_porciones(res: pd.DataFrame) -> str:
+    partes = []
+    for f in res[res["cumple"].eq(False)].itertuples():
+        fallas = []
+        if f.cumple_porciones is not pd.NA and not f.cumple_porciones:
+            fallas.append(
+                f"{f.contenido_neto} / {f.porcion} = {f.porciones_calculadas:.2f} porciones "
+                f"(se declaran {f.porciones_declaradas}, se esperan {f.porciones_redondeadas:g})"
+            )
+        if f.cumple_medida_casera is not pd.NA and not f.cumple_medida_casera:
+            fallas.append(
+                f"medida casera «{f.medida_casera}» ≈ {f.medida_casera_equivalente:g} "
+                f"frente a porción {f.porcion} ({f.desviacion_medida_pct:+.0f}%)"
+            )
+        producto = getattr(f, "producto", "")
+        partes.append((f"{producto}: " if producto else "") + "; ".join(fallas))
+    return "; ".join(partes)
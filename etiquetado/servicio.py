@@ -0,0 +1,244 @@
+# ------------------------------------------------------------
+# SERVICIO HTTP/JSON DE REGLAS (sin interfaz)
+#
+#   python -m etiquetado.servicio [--host 127.0.0.1] [--puerto 8810] [--procesos N]
+#
+# Expone los mismos motores que la app para sistemas PIM / de artes:
+#   POST /sellos          filas con COLUMNAS_SELLOS
+#   POST /calorias        filas con COLUMNAS_CALORIAS
+#   POST /tamano-sellos   filas con area_cara_cm2 [, num_sellos, lado_real_cm]
+#   GET  /salud
+# El cuerpo es una lista de filas o {"productos": [...], "fecha": "AAAA-MM-DD"};
+# la respuesta es {"resultados": [...]} en el mismo orden. Con "fecha" se
+# aplica la normativa vigente ese día (por defecto, la de hoy); cada resultado
+# trae la versión aplicada en `version_reglas`. HTTP/1.1 con keep-alive; cada lote
+# se evalúa en un pool de procesos acotado, así el bucle de eventos solo
+# atiende E/S. Solo biblioteca estándar (asyncio), sin dependencias nuevas.
+# ------------------------------------------------------------
+import os
+import re
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .reglas import (
+    determinar_sellos, verificar_calorias, evaluar_tamano_sellos, normalizar_tabla, COLUMNAS_TAMANO, NORMATIVA,
+)
+
+MAX_CUERPO_BYTES = 16 * 1024 * 1024
+# Tope de cada línea (petición o cabecera) y del número de cabeceras
+MAX_LINEA_BYTES = 8 * 1024
+MAX_CABECERAS = 100
+KEEPALIVE_S = 15.0
+# Lotes en espera por proceso antes de aplicar contrapresión a los clientes
+PENDIENTES_POR_PROCESO = 4
+
+ESTADOS_HTTP = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 414: "URI Too Long", 422: "Unprocessable Entity",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error",
+}
+
+class LineaDemasiadoLarga(Exception):
+    pass
+
+# Una línea terminada en \n; LineaDemasiadoLarga si supera MAX_LINEA_BYTES (o el búfer del lector)
+async def _leer_linea(reader: asyncio.StreamReader) -> bytes:
+    try:
+        linea = await reader.readuntil(b"\n")
+    except asyncio.LimitOverrunError:
+        raise LineaDemasiadoLarga()
+    if len(linea) > MAX_LINEA_BYTES:
+        raise LineaDemasiadoLarga()
+    return linea
+
+# Campos opcionales de /tamano-sellos y su valor cuando faltan o llegan vacíos
+OPCIONALES_TAMANO = {"num_sellos": 1, "lado_real_cm": 0.0}
+
+# Como la evaluación masiva de la app: las filas con `area_cara_cm2` vacía quedan
+# sin veredicto (regla y cumple nulos) en lugar de evaluarse contra 0.
+def _tamano_sellos(df: pd.DataFrame, fecha=None) -> pd.DataFrame:
+    df = df.rename(columns={v: k for k, v in COLUMNAS_TAMANO.items()})
+    if "area_cara_cm2" not in df.columns:
+        raise ValueError("Faltan columnas obligatorias: area_cara_cm2")
+    for c, defecto in OPCIONALES_TAMANO.items():
+        if c not in df.columns:
+            df[c] = defecto
+        else:
+            vacio = df[c].isna() | df[c].astype("string").str.strip().eq("").fillna(False)
+            df[c] = df[c].astype(object).where(~vacio, defecto)
+    df = normalizar_tabla(df, COLUMNAS_TAMANO)
+    validas = df[df["error"].eq("")]
+    res = evaluar_tamano_sellos(
+        validas["area_cara_cm2"], validas["num_sellos"], validas["lado_real_cm"], fecha=fecha
+    )
+    res.index = validas.index
+    # Columnas propias del cliente (sku, id...) y `error` se devuelven tal cual
+    res = df.drop(columns=list(COLUMNAS_TAMANO)).join(res).reset_index(drop=True)
+    res["num_sellos"] = res["num_sellos"].astype("Int64")
+    return res
+
+def _error(mensaje: str) -> str:
+    return json.dumps({"error": mensaje}, ensure_ascii=False)
+
+MOTORES = {
+    "/sellos": determinar_sellos,
+    "/calorias": verificar_calorias,
+    "/tamano-sellos": _tamano_sellos,
+}
+
+# Campos con texto que no es un número, por fila, a partir de la columna `error`
+def _ilegibles(res: pd.DataFrame) -> list:
+    if "error" not in res.columns:
+        return []
+    campos = res["error"].str.findall(r"(\w+): no numérico")
+    return [f"fila {i}: {', '.join(c)}" for i, c in campos.items() if c]
+
+# Se ejecuta en los procesos del pool: recibe y devuelve texto JSON para no
+# serializar DataFrames entre procesos. Un campo numérico ilegible rechaza el
+# lote (422); uno vacío deja la fila sin veredicto y lo explica en `error`.
+def evaluar_lote(ruta: str, filas: list, fecha: str = None) -> str:
+    res = MOTORES[ruta](pd.DataFrame(filas), fecha=fecha)
+    ilegibles = _ilegibles(res)
+    if ilegibles:
+        raise ValueError(f"Campos numéricos no válidos: {'; '.join(ilegibles)}")
+    return '{"resultados":' + res.to_json(orient="records", force_ascii=False) + "}"
+
+class ServicioReglas:
+    def __init__(self, procesos: int = None):
+        self.procesos = max(1, procesos or os.cpu_count() or 1)
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos)
+        self.cupo = asyncio.Semaphore(self.procesos * PENDIENTES_POR_PROCESO)
+
+    async def despachar(self, metodo: str, ruta: str, cuerpo: bytes) -> tuple:
+        if ruta == "/salud":
+            return 200, json.dumps({"estado": "ok", "procesos": self.procesos, "normativa": NORMATIVA.version()})
+        if ruta not in MOTORES:
+            return 404, _error(f"Ruta desconocida: {ruta}")
+        if metodo != "POST":
+            return 405, _error("Use POST con un cuerpo JSON")
+        try:
+            datos = json.loads(cuerpo or b"[]")
+        except ValueError as e:
+            return 400, _error(f"JSON inválido: {e}")
+        filas = datos.get("productos") if isinstance(datos, dict) else datos
+        fecha = datos.get("fecha") if isinstance(datos, dict) else None
+        if not isinstance(filas, list) or not all(isinstance(f, dict) for f in filas):
+            return 400, _error("Se espera una lista de objetos o {\"productos\": [...]}")
+        if fecha is not None and not isinstance(fecha, str):
+            return 400, _error("\"fecha\" debe ser texto AAAA-MM-DD")
+        if not filas:
+            return 200, '{"resultados":[]}'
+        async with self.cupo:
+            try:
+                return 200, await asyncio.get_running_loop().run_in_executor(self.pool, evaluar_lote, ruta, filas, fecha)
+            except ValueError as e:
+                return 422, _error(str(e))
+
+    async def atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    linea = await asyncio.wait_for(_leer_linea(reader), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    break
+                except LineaDemasiadoLarga:
+                    await self._responder(writer, 414, _error("Línea de petición demasiado larga"), False)
+                    break
+                try:
+                    metodo, ruta, version = linea.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(writer, 400, _error("Línea de petición inválida"), False)
+                    break
+                cabeceras, n, excedidas = {}, 0, False
+                while True:
+                    try:
+                        h = await _leer_linea(reader)
+                    except LineaDemasiadoLarga:
+                        excedidas = True
+                        break
+                    if h in (b"\r\n", b"\n"):
+                        break
+                    n += 1
+                    if n > MAX_CABECERAS:
+                        excedidas = True
+                        break
+                    nombre, _, valor = h.decode("latin-1").partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                if excedidas:
+                    await self._responder(writer, 431, _error("Cabeceras demasiado largas o numerosas"), False)
+                    break
+
+                conexion = cabeceras.get("connection", "").lower()
+                mantener = conexion != "close" if version == "HTTP/1.1" else conexion == "keep-alive"
+                if "chunked" in cabeceras.get("transfer-encoding", "").lower():
+                    await self._responder(writer, 411, _error("Envíe Content-Length"), False)
+                    break
+                texto_largo = cabeceras.get("content-length", "") or "0"
+                if not re.fullmatch(r"[0-9]+", texto_largo):
+                    await self._responder(writer, 400, _error(f"Content-Length inválido: {texto_largo!r}"), False)
+                    break
+                largo = int(texto_largo)
+                if largo > MAX_CUERPO_BYTES:
+                    await self._responder(writer, 413, _error("Cuerpo demasiado grande"), False)
+                    break
+                cuerpo = await reader.readexactly(largo) if largo else b""
+
+                try:
+                    estado, respuesta = await self.despachar(metodo.upper(), ruta.split("?")[0], cuerpo)
+                except Exception as e:
+                    estado, respuesta = 500, _error(f"{type(e).__name__}: {e}")
+                await self._responder(writer, estado, respuesta, mantener)
+                if not mantener:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer: asyncio.StreamWriter, estado: int, cuerpo: str, mantener: bool):
+        datos = cuerpo.encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(datos)}\r\n"
+                f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n"
+            ).encode("latin-1") + datos
+        )
+        await writer.drain()
+
+    def cerrar(self):
+        self.pool.shutdown(cancel_futures=True)
+
+async def servir(host: str, puerto: int, procesos: int = None):
+    servicio = ServicioReglas(procesos)
+    servidor = await asyncio.start_server(servicio.atender, host, puerto)
+    print(f"Servicio de reglas en http://{host}:{puerto} ({servicio.procesos} procesos)", file=sys.stderr)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servicio.cerrar()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m etiquetado.servicio",
+        description="Servicio HTTP/JSON con los motores de sellos, calorías y tamaño de sellos."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8810)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="procesos del pool (por defecto: núcleos)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.host, args.puerto, args.procesos))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
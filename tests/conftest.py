@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Las pruebas importan `etiquetado` desde la raíz del repositorio (como la app y los benchmarks)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
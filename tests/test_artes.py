@@ -0,0 +1,88 @@
+import io
+import math
+
+import pandas as pd
+import pytest
+from PIL import Image, ImageDraw
+
+from etiquetado.artes import analizar_arte, evaluar_tamano_artes, main
+
+DPI = 200
+CM = DPI / 2.54
+
+def _octagono(lado_px: float, cx: float, cy: float) -> list:
+    r, s = lado_px / 2, lado_px / (1 + math.sqrt(2)) / 2
+    return [(cx - s, cy - r), (cx + s, cy - r), (cx + r, cy - s), (cx + r, cy + s),
+            (cx + s, cy + r), (cx - s, cy + r), (cx - r, cy + s), (cx - r, cy - s)]
+
+def _escalar(puntos: list, k: float, cx: float, cy: float) -> list:
+    return [(cx + (x - cx) * k, cy + (y - cy) * k) for x, y in puntos]
+
+# Cara de 10 × 15 cm; cada sello es (centro x, centro y, lado) en cm. Con `anidado`
+# el sello lleva un filete blanco y un octágono negro macizo dentro, como los reales.
+def _arte(sellos, anidado: bool = False) -> bytes:
+    img = Image.new("RGB", (round(10 * CM), round(15 * CM)), "white")
+    d = ImageDraw.Draw(img)
+    for x, y, lado in sellos:
+        cx, cy = x * CM, y * CM
+        puntos = _octagono(lado * CM, cx, cy)
+        d.polygon(puntos, fill="black")
+        if anidado:
+            d.polygon(_escalar(puntos, 0.9, cx, cy), fill="white")
+            d.polygon(_escalar(puntos, 0.85, cx, cy), fill="black")
+        d.text((cx - lado * CM * 0.3, cy), "EXCESO EN SODIO", fill="white")
+    d.text((20, round(14 * CM)), "Ingredientes: harina de trigo, azúcar, sal", fill="black")
+    salida = io.BytesIO()
+    img.save(salida, "PNG", dpi=(DPI, DPI))
+    return salida.getvalue()
+
+def test_detecta_cuenta_y_mide_sellos():
+    res = analizar_arte(_arte([(7.5, 2.0, 2.0), (5.0, 2.0, 1.8)]))
+    assert res["num_sellos"] == 2
+    assert res["area_cara_cm2"] == pytest.approx(150, abs=0.5)
+    assert res["lado_real_cm"] == pytest.approx(1.8, abs=0.05)
+    assert res["sellos"]["tercio_vertical"].eq("superior").all()
+    assert sorted(res["sellos"]["tercio_horizontal"]) == ["central", "derecho"]
+    assert not res["ubicacion_correcta"]
+
+def test_octagono_anidado_no_es_otro_sello():
+    res = analizar_arte(_arte([(7.5, 2.0, 2.0)], anidado=True))
+    assert res["num_sellos"] == 1
+    assert res["lado_real_cm"] == pytest.approx(2.0, abs=0.05)
+    assert res["ubicacion_correcta"]
+
+def test_escala_por_dimensiones_fisicas():
+    res = analizar_arte(_arte([(7.5, 2.0, 2.0)]), ancho_cm=20)
+    assert res["alto_cm"] == pytest.approx(30, abs=0.1)
+    assert res["lado_real_cm"] == pytest.approx(4.0, abs=0.1)
+
+def test_formas_que_no_son_octagonos():
+    img = Image.new("RGB", (round(10 * CM), round(15 * CM)), "white")
+    d = ImageDraw.Draw(img)
+    d.ellipse((100, 100, 400, 400), fill="black")
+    d.rectangle((500, 100, 700, 300), fill="black")
+    salida = io.BytesIO()
+    img.save(salida, "PNG", dpi=(DPI, DPI))
+    res = analizar_arte(salida.getvalue())
+    assert res["num_sellos"] == 0 and res["sellos"].empty and not res["ubicacion_correcta"]
+
+def test_sin_dpi_ni_dimensiones():
+    salida = io.BytesIO()
+    Image.new("RGB", (100, 100), "white").save(salida, "PNG")
+    with pytest.raises(ValueError, match="DPI"):
+        analizar_arte(salida.getvalue())
+
+# ---------------- veredicto de tamaño ----------------
+def test_arte_sin_sellos_queda_sin_veredicto():
+    tabla = pd.DataFrame({"area_cara_cm2": [150.0, 150.0], "num_sellos": [0, 1], "lado_real_cm": [0.0, 4.0]})
+    res = evaluar_tamano_artes(tabla)
+    assert pd.isna(res["regla"].iloc[0]) and res["cumple"].iloc[0] is pd.NA
+    assert res["regla"].iloc[1] == "tabla_18" and bool(res["cumple"].iloc[1])
+
+def test_cli_arte_sin_sellos(tmp_path):
+    ruta = tmp_path / "blanco.png"
+    Image.new("RGB", (400, 600), "white").save(ruta, dpi=(DPI, DPI))
+    salida = tmp_path / "res.csv"
+    assert main([str(ruta), "--procesos", "1", "--salida", str(salida)]) == 0
+    fila = pd.read_csv(salida).iloc[0]
+    assert fila["num_sellos"] == 0 and pd.isna(fila["regla"]) and pd.isna(fila["cumple_tamano"])
@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+import pytest
+
+from etiquetado.checklist import CATEGORIA_POR_ITEM
+from etiquetado.espacio import EspacioTrabajo, compactar, expandir
+from etiquetado.estado import EstadoEnMemoria, EscrituraDiferida
+
+TITULOS = list(CATEGORIA_POR_ITEM)
+
+def _producto(nombre: str, sha: str) -> dict:
+    return {
+        "auditoria_id": None,
+        "meta": {"producto": nombre, "proveedor": "P0"},
+        "meta_guardada": {},
+        "status": {t: ("no" if i == 0 else "yes" if i == 1 else "none") for i, t in enumerate(TITULOS)},
+        "notas": {t: ("sello ilegible" if i == 0 else "") for i, t in enumerate(TITULOS)},
+        "evidencia": {t: ([{"name": "cara.png", "sha256": sha, "size": 10}] if i == 0 else []) for i, t in enumerate(TITULOS)},
+        "entradas": {"porcion_g": 30, "tabla_sellos": pd.DataFrame({"kcal": [120.5], "sku": ["A1"]})},
+    }
+
+def _igual(leido: dict, original: dict):
+    pd.testing.assert_frame_equal(leido["entradas"].pop("tabla_sellos"), original["entradas"]["tabla_sellos"])
+    assert leido == {**original, "entradas": {"porcion_g": 30}}
+
+@pytest.fixture
+def estado():
+    diferida = EscrituraDiferida(EstadoEnMemoria(), intervalo_s=60)
+    yield diferida
+    diferida.cerrar()
+
+def test_compactar_solo_guarda_lo_no_vacio():
+    compacto = compactar(_producto("Galletas", "a" * 64))
+    assert compacto["estados"] == "ny" + "-" * (len(TITULOS) - 2)
+    assert list(compacto["notas"]) == [0] and list(compacto["evidencia"]) == [0]
+    _igual(expandir(compacto), _producto("Galletas", "a" * 64))
+
+def test_memoria_disco_y_vuelta(tmp_path):
+    espacio = EspacioTrabajo(str(tmp_path), en_memoria=1)
+    a, b = espacio.nueva_clave("A"), espacio.nueva_clave("B")
+    espacio.guardar(a, _producto("A", "a" * 64), "A")
+    espacio.guardar(b, _producto("B", "b" * 64), "B")
+    # Solo el más reciente queda en memoria; el otro se vuelca a disco
+    assert os.path.exists(espacio._ruta(a)) and not os.path.exists(espacio._ruta(b))
+    assert espacio.en_disco() == 1
+    _igual(espacio.tomar(a), _producto("A", "a" * 64))
+    assert not os.path.exists(espacio._ruta(a))
+    _igual(espacio.tomar(b), _producto("B", "b" * 64))
+    with pytest.raises(KeyError):
+        espacio.tomar(a)
+    espacio.cerrar()
+    assert not os.path.exists(espacio.directorio)
+
+def test_otra_replica_lee_del_estado_compartido(tmp_path, estado):
+    origen = EspacioTrabajo(str(tmp_path / "r1"), en_memoria=0, estado=estado, sesion="s1")
+    a = origen.nueva_clave("A")
+    origen.guardar(a, _producto("A", "a" * 64), "A")
+    # La réplica nueva no tiene el producto ni en memoria ni en su disco
+    replica = EspacioTrabajo(str(tmp_path / "r2"), estado=estado, sesion="s1")
+    replica.restaurar_resumen(origen.resumen())
+    assert replica.etiquetas == {a: "A"}
+    _igual(replica.tomar(a), _producto("A", "a" * 64))
+    # Al activarlo deja de estar respaldado como inactivo
+    assert estado.leer("s1", f"producto:{a}") is None
+
+def test_descartar_devuelve_la_evidencia(tmp_path, estado):
+    espacio = EspacioTrabajo(str(tmp_path), en_memoria=1, estado=estado, sesion="s1")
+    a, b = espacio.nueva_clave("A"), espacio.nueva_clave("B")
+    espacio.guardar(a, _producto("A", "a" * 64), "A")
+    espacio.guardar(b, _producto("B", "b" * 64), "B")
+    assert espacio.descartar(a) == ["a" * 64]   # desde disco
+    assert espacio.descartar(b) == ["b" * 64]   # desde memoria
+    assert espacio.descartar(b) == [] and espacio.etiquetas == {}
+    assert estado.leer("s1") == {}
@@ -0,0 +1,119 @@
+import time
+import logging
+
+import pytest
+
+from etiquetado.estado import (
+    EstadoEnMemoria, EstadoSQLite, EscrituraDiferida, EstadoNoDisponible, verificar_despliegue,
+)
+from etiquetado import evidencia
+from etiquetado.evidencia import AlmacenEvidencia, ReferenciasSQLite
+
+# ---------------- despliegue con estado compartido ----------------
+def test_memoria_no_exige_almacenes_compartidos():
+    verificar_despliegue("memoria", {})
+
+def test_backend_compartido_exige_rutas_absolutas():
+    with pytest.raises(ValueError, match="AUDITORIAS_DB y EVIDENCIA_DIR"):
+        verificar_despliegue("sqlite:/compartido/estado.db", {})
+    with pytest.raises(ValueError, match="AUDITORIAS_DB"):
+        verificar_despliegue("sqlite:/compartido/estado.db", {"AUDITORIAS_DB": "auditorias.db", "EVIDENCIA_DIR": "/c/ev"})
+    verificar_despliegue("sqlite:/c/estado.db", {"AUDITORIAS_DB": "/c/auditorias.db", "EVIDENCIA_DIR": "/c/ev"})
+
+# ---------------- backends y escritura diferida ----------------
+@pytest.mark.parametrize("crear", [lambda tmp: EstadoEnMemoria(), lambda tmp: EstadoSQLite(str(tmp / "estado.db"))])
+def test_backend_lee_escribe_y_purga(tmp_path, crear):
+    backend = crear(tmp_path)
+    backend.escribir_lote({("s1", "a"): {"x": 1}, ("s1", "b"): [1, 2], ("s2", "a"): "z"})
+    assert backend.leer("s1") == {"a": {"x": 1}, "b": [1, 2]}
+    backend.escribir_lote({("s1", "b"): None})
+    assert backend.leer("s1", "b") is None
+    backend.purgar(dias=-1)  # todo cuenta como vencido
+    assert backend.leer("s1") == {} and backend.leer("s2") == {}
+    backend.cerrar()
+
+def test_escritura_diferida_agrupa_y_lee_pendientes():
+    destino = EstadoEnMemoria()
+    diferida = EscrituraDiferida(destino, intervalo_s=60, lote=1000)
+    diferida.escribir("s", {"a": 1, "b": 2})
+    diferida.escribir("s", {"a": 3, "b": None})
+    assert diferida.leer("s") == {"a": 3}
+    assert destino.leer("s") == {}
+    diferida.vaciar()
+    assert destino.leer("s") == {"a": 3}
+    diferida.cerrar()
+
+def test_escritura_diferida_purga_periodicamente():
+    class Contador(EstadoEnMemoria):
+        purgas = 0
+        def purgar(self, dias=14):
+            Contador.purgas += 1
+    diferida = EscrituraDiferida(Contador(), intervalo_s=0.01, purga_s=0.0)
+    time.sleep(0.2)
+    diferida.cerrar()
+    assert Contador.purgas >= 2
+
+class Caido(EstadoEnMemoria):
+    caido = True
+    def escribir_lote(self, cambios):
+        if self.caido:
+            raise OSError("disco lleno")
+        super().escribir_lote(cambios)
+    def purgar(self, dias=14):
+        raise OSError("base bloqueada")
+
+def test_escritura_diferida_registra_fallos_y_los_reintenta(caplog):
+    destino = Caido()
+    diferida = EscrituraDiferida(destino, intervalo_s=0.01, purga_s=0.0)
+    with caplog.at_level(logging.WARNING, logger="etiquetado.estado"):
+        diferida.escribir("s", {"a": 1})
+        time.sleep(0.2)
+        mensajes = [r.getMessage() for r in caplog.records]
+        # Un registro al empezar el fallo, no uno por reintento; la purga fallida también queda registrada
+        assert mensajes.count("No se pudo volcar el estado diferido; se reintentará") == 1
+        assert "No se pudo purgar el estado compartido" in mensajes
+        assert diferida.leer("s") == {"a": 1} and destino.leer("s") == {}
+        destino.caido = False
+        time.sleep(0.2)
+        assert destino.leer("s") == {"a": 1}
+        assert "Estado diferido volcado de nuevo tras un fallo" in [r.getMessage() for r in caplog.records]
+    diferida.cerrar()
+
+def test_escritura_diferida_limita_lo_pendiente_mientras_falla():
+    destino = Caido()
+    diferida = EscrituraDiferida(destino, intervalo_s=60, max_pendientes=2)
+    diferida.escribir("s", {"a": 1, "b": 2, "c": 3})  # sin fallo previo no hay límite
+    with pytest.raises(OSError):
+        diferida.vaciar()
+    diferida.escribir("s", {"a": 4})                  # reemplaza un pendiente: no crece
+    with pytest.raises(EstadoNoDisponible, match="disco lleno"):
+        diferida.escribir("s", {"d": 5})
+    assert diferida.leer("s") == {"a": 4, "b": 2, "c": 3}
+    destino.caido = False
+    diferida.vaciar()
+    diferida.escribir("s", {"d": 5})
+    diferida.vaciar()
+    assert destino.leer("s") == {"a": 4, "b": 2, "c": 3, "d": 5}
+    destino.purgar = lambda dias=14: None
+    diferida.cerrar()
+
+# ---------------- referencias de evidencia compartidas ----------------
+def test_replica_no_desaloja_blob_citado_en_otra(tmp_path, monkeypatch):
+    monkeypatch.setattr(evidencia, "EVIDENCIA_RECUENTO_S", 0.0)
+    raiz = str(tmp_path / "evidencia")
+    refs = str(tmp_path / "referencias.db")
+    replica_a = AlmacenEvidencia(raiz, 10 * 1024, referencias=ReferenciasSQLite(refs))
+    replica_b = AlmacenEvidencia(raiz, 10 * 1024, referencias=ReferenciasSQLite(refs))
+
+    citado = replica_a.guardar(b"a" * 6000)   # sigue citado por una sesión de la réplica A
+    huerfano = replica_b.guardar(b"b" * 6000)
+    replica_b.liberar(huerfano)                # la réplica B supera la cuota y desaloja
+
+    assert replica_b.disponible(citado)
+    assert not replica_b.disponible(huerfano)
+
+def test_referencias_vencidas_no_retienen(tmp_path):
+    refs = ReferenciasSQLite(str(tmp_path / "referencias.db"), dias=-1)
+    refs.sumar("abc", 1)
+    assert refs.vivas() == set()
+    assert refs.sumar("abc", -1) == 0
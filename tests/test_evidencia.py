@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import subprocess
+
+import pytest
+from PIL import Image
+
+from etiquetado import evidencia
+from etiquetado.evidencia import AlmacenEvidencia, EvidenciaInvalida, VARIANTES_EVIDENCIA
+
+def _png(color, lado=600) -> bytes:
+    salida = io.BytesIO()
+    Image.new("RGB", (lado, lado), color).save(salida, "PNG")
+    return salida.getvalue()
+
+def _en_disco(almacen) -> int:
+    return sum(os.path.getsize(p) for p in (*almacen._blobs(), *almacen._derivados()))
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenEvidencia(str(tmp_path / "evidencia"), cuota_bytes=10 * 1024 * 1024)
+
+# ---------------- ubicación ----------------
+def test_directorio_por_defecto_junto_a_la_base(tmp_path):
+    entorno = {k: v for k, v in os.environ.items() if k != "EVIDENCIA_DIR"}
+    entorno["AUDITORIAS_DB"] = str(tmp_path / "datos" / "auditorias.db")
+    salida = subprocess.run(
+        [sys.executable, "-c", "from etiquetado.evidencia import EVIDENCIA_DIR; print(EVIDENCIA_DIR)"],
+        env=entorno, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True,
+    )
+    assert salida.stdout.strip() == str(tmp_path / "datos" / "evidencia")
+
+# ---------------- ingesta ----------------
+def test_ingerir_deduplica_y_genera_derivados(almacen):
+    datos = _png("red")
+    a = almacen.ingerir("frente.png", datos)
+    b = almacen.ingerir("copia.png", datos)
+    assert a["sha256"] == b["sha256"] and a["size"] == len(datos)
+    assert len(list(almacen._blobs())) == 1
+    assert almacen.referencias.sumar(a["sha256"], 0) == 2
+    for variante, (caja, _) in VARIANTES_EVIDENCIA.items():
+        with Image.open(almacen.ruta_derivado(a["sha256"], variante)) as img:
+            assert img.format == "JPEG" and max(img.size) <= max(caja)
+    assert almacen._total == _en_disco(almacen)
+
+def test_ingerir_rechaza_lo_que_no_es_imagen(almacen):
+    with pytest.raises(EvidenciaInvalida, match="JPG/PNG"):
+        almacen.ingerir("nota.txt", b"no es una imagen")
+    assert list(almacen._blobs()) == []
+
+def test_ingesta_fallida_no_deja_rastro(almacen, monkeypatch):
+    def falla(self, sha256, variante):
+        raise OSError("decodificación truncada")
+    monkeypatch.setattr(AlmacenEvidencia, "_generar_derivado", falla)
+    with pytest.raises(EvidenciaInvalida, match="dañada"):
+        almacen.ingerir("rota.png", _png("blue"))
+    assert list(almacen._blobs()) == [] and list(almacen._derivados()) == []
+    assert almacen._total == 0
+
+def test_ingesta_fallida_conserva_blob_citado(almacen, monkeypatch):
+    sha = almacen.guardar(_png("blue"))   # ya citado por otra sesión
+    monkeypatch.setattr(AlmacenEvidencia, "_generar_derivado", lambda self, sha256, variante: 1 / 0)
+    with pytest.raises(EvidenciaInvalida):
+        almacen.ingerir("otra.png", _png("blue"))
+    assert almacen.disponible(sha) and almacen.referencias.sumar(sha, 0) == 1
+
+def test_ingerir_en_paralelo_reporta_por_archivo(almacen):
+    archivos = [("a.png", _png("red")), ("roto.png", b"\x89PNG\r\n\x1a\nbasura"), ("b.png", _png("green")),
+                ("a2.png", _png("red"))]
+    resultados = sorted(almacen.ingerir_en_paralelo(archivos, hilos=4))
+    assert [i for i, *_ in resultados] == [0, 1, 2, 3]
+    refs = {nombre: ref for _, nombre, ref, _ in resultados}
+    errores = {nombre: error for _, nombre, _, error in resultados if error}
+    assert list(errores) == ["roto.png"] and refs["roto.png"] is None
+    assert refs["a.png"]["sha256"] == refs["a2.png"]["sha256"] != refs["b.png"]["sha256"]
+    assert len(list(almacen._blobs())) == 2
+    assert almacen._total == _en_disco(almacen)
+
+# ---------------- cuota ----------------
+def test_cuota_cuenta_derivados_y_desaloja_huerfanos(tmp_path, monkeypatch):
+    monkeypatch.setattr(evidencia, "EVIDENCIA_RECUENTO_S", 0.0)
+    almacen = AlmacenEvidencia(str(tmp_path / "evidencia"), cuota_bytes=1024 * 1024)
+    viejo_png, nuevo_png = _png("red"), _png("green")
+    viejo = almacen.ingerir("viejo.png", viejo_png)["sha256"]
+    almacen.liberar(viejo)
+    # Los dos originales caben; con sus derivados, no
+    almacen.cuota_bytes = len(viejo_png) + len(nuevo_png)
+    nuevo = almacen.ingerir("nuevo.png", nuevo_png)["sha256"]
+    assert not almacen.disponible(viejo)
+    assert not any(os.path.exists(almacen.ruta_derivado(viejo, v)) for v in VARIANTES_EVIDENCIA)
+    assert almacen.disponible(nuevo)
+    assert almacen._total == _en_disco(almacen)
+
+def test_cuota_respeta_blobs_persistidos(tmp_path):
+    almacen = AlmacenEvidencia(str(tmp_path / "evidencia"), cuota_bytes=1, es_persistido=lambda sha: True)
+    sha = almacen.ingerir("guardada.png", _png("red"))["sha256"]
+    almacen.liberar(sha)
+    assert almacen.disponible(sha)
@@ -0,0 +1,45 @@
+import io
+import csv
+
+import pytest
+
+from etiquetado.checklist import CATEGORIA_POR_ITEM
+from etiquetado.persistencia import BaseAuditorias
+from etiquetado.exportacion import exportar_resultados, COLUMNAS_EXPORTACION
+
+TITULO = next(iter(CATEGORIA_POR_ITEM))
+
+@pytest.fixture
+def db(tmp_path):
+    base = BaseAuditorias(str(tmp_path / "auditorias.db"))
+    a = base.crear_auditoria(fecha="2026-03-10", producto="=HYPERLINK(\"http://x\")", proveedor="@Proveedor")
+    base.guardar_resultado(a, TITULO, estado="no", nota="-2 g de diferencia")
+    base.crear_auditoria(fecha="2026-04-02", producto="Galletas", proveedor="Otro")
+    yield base
+    base.cerrar()
+
+def test_csv_escapa_formulas_y_filtra(db):
+    destino = io.BytesIO()
+    n = exportar_resultados(db, destino, "csv", estado="no")
+    filas = list(csv.reader(io.StringIO(destino.getvalue().decode("utf-8-sig"))))
+    assert n == 1 and filas[0] == list(COLUMNAS_EXPORTACION.values())
+    fila = dict(zip(COLUMNAS_EXPORTACION, filas[1]))
+    assert fila["producto"] == "'=HYPERLINK(\"http://x\")"
+    assert fila["proveedor"] == "'@Proveedor"
+    assert fila["nota"] == "'-2 g de diferencia"
+    assert fila["estado"] == "No cumple"
+
+def test_xlsx_escapa_formulas(db, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    ruta = tmp_path / "resultados.xlsx"
+    n = exportar_resultados(db, str(ruta), "xlsx")
+    hoja = openpyxl.load_workbook(ruta).active
+    filas = list(hoja.iter_rows(min_row=2, values_only=True))
+    assert n == len(filas) == 2 * len(CATEGORIA_POR_ITEM)
+    productos = {f[2] for f in filas}
+    assert productos == {"'=HYPERLINK(\"http://x\")", "Galletas"}
+    assert all(c.data_type != "f" for fila in hoja.iter_rows() for c in fila)
+
+def test_formato_desconocido(db):
+    with pytest.raises(ValueError):
+        exportar_resultados(db, io.BytesIO(), "ods")
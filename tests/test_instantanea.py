@@ -0,0 +1,121 @@
+import zipfile
+import functools
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from etiquetado.checklist import CATEGORIA_POR_ITEM
+from etiquetado.persistencia import BaseAuditorias
+from etiquetado.evidencia import AlmacenEvidencia
+from etiquetado.instantanea import (
+    exportar_instantanea, leer_instantanea, abrir_miembro, InstantaneaInvalida, MANIFIESTO,
+)
+
+TITULOS = list(CATEGORIA_POR_ITEM)
+FOTO = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+SHA_DESALOJADO = "0" * 64
+
+@pytest.fixture
+def db(tmp_path):
+    base = BaseAuditorias(str(tmp_path / "auditorias.db"))
+    yield base
+    base.cerrar()
+
+@pytest.fixture
+def origen(tmp_path, db):
+    almacen = AlmacenEvidencia(str(tmp_path / "evidencia"), cuota_bytes=10 * 1024 * 1024)
+    sha = almacen.guardar(FOTO)
+    a = db.crear_auditoria(fecha="2026-05-04", producto="Galletas", proveedor="P0")
+    db.guardar_resultado(a, TITULOS[0], estado="no", nota="sello ilegible")
+    db.guardar_resultado(a, TITULOS[1], estado="na")
+    db.agregar_evidencia(a, TITULOS[0], {"name": "cara.png", "sha256": sha, "size": len(FOTO), "caption": "frente"})
+    db.agregar_evidencia(a, TITULOS[1], {"name": "vieja.jpg", "sha256": SHA_DESALOJADO, "size": 10})
+    return almacen, sha, db.cargar_auditoria(a)
+
+ENTRADAS = {
+    "tabla_sellos": pd.DataFrame({"kcal": [120.5, 80.0], "sku": ["A1", "B2"]}),
+    "fecha_lote": date(2026, 5, 1),
+    "porcion_g": 30,
+}
+
+def test_ida_y_vuelta(tmp_path, origen):
+    almacen, sha, registro = origen
+    ruta = tmp_path / "auditoria.zip"
+    exportar_instantanea(str(ruta), registro, ENTRADAS, almacen)
+    leida = leer_instantanea(str(ruta))
+    assert leida["registro"] == registro
+    pd.testing.assert_frame_equal(leida["entradas"]["tabla_sellos"], ENTRADAS["tabla_sellos"])
+    assert leida["entradas"]["fecha_lote"] == "2026-05-01"
+    assert leida["entradas"]["porcion_g"] == 30
+    # El blob desalojado viaja solo como referencia
+    assert list(leida["evidencia"]) == [sha]
+    assert leida["faltantes"] == [SHA_DESALOJADO]
+
+def test_evidencia_se_materializa_bajo_demanda(tmp_path, origen):
+    almacen, sha, registro = origen
+    ruta = str(tmp_path / "auditoria.zip")
+    exportar_instantanea(ruta, registro, {}, almacen)
+    miembros = leer_instantanea(ruta)["evidencia"]
+    destino = AlmacenEvidencia(str(tmp_path / "otra"), cuota_bytes=10 * 1024 * 1024)
+    destino.registrar_pendiente(sha, functools.partial(abrir_miembro, ruta, miembros[sha]))
+    assert destino.disponible(sha)
+    with open(destino.abrir(sha), "rb") as fh:
+        assert fh.read() == FOTO
+
+def test_blob_alterado_se_descarta(tmp_path, origen):
+    almacen, sha, registro = origen
+    ruta = str(tmp_path / "auditoria.zip")
+    exportar_instantanea(ruta, registro, {}, almacen)
+    destino = AlmacenEvidencia(str(tmp_path / "otra"), cuota_bytes=10 * 1024 * 1024)
+    destino.registrar_pendiente(sha, functools.partial(abrir_miembro, ruta, MANIFIESTO))
+    destino.abrir(sha)
+    assert not destino.disponible(sha)
+
+def test_importar_reproduce_la_auditoria(tmp_path, db, origen):
+    almacen, _, registro = origen
+    ruta = str(tmp_path / "auditoria.zip")
+    exportar_instantanea(ruta, registro, {}, almacen)
+    manifiesto = leer_instantanea(ruta)
+    assert manifiesto["fecha_auditoria"] == "2026-05-04"
+    copia = db.cargar_auditoria(db.importar_auditoria(manifiesto["registro"], fecha=manifiesto["fecha_auditoria"]))
+    for campo in ("producto", "proveedor", "fecha_auditoria", "status", "notas", "evidencia"):
+        assert copia[campo] == registro[campo]
+
+def test_reabrir_la_misma_instantanea_no_duplica(tmp_path, db, origen):
+    almacen, _, registro = origen
+    ruta = str(tmp_path / "auditoria.zip")
+    exportar_instantanea(ruta, registro, {}, almacen)
+    ids = set()
+    for _ in range(2):
+        manifiesto = leer_instantanea(ruta)
+        ids.add(db.importar_auditoria(manifiesto["registro"], fecha=manifiesto["fecha_auditoria"],
+                                      huella=manifiesto["huella"]))
+    assert len(ids) == 1 and db.auditoria_importada(manifiesto["huella"]) in ids
+    assert len(db.listar_auditorias()) == 2   # la original y una sola copia
+    assert db.cumplimiento("total", desde="2026-05-01", hasta="2026-05-31")[0]["no"] == 2
+    # Una instantánea con otro contenido se importa aparte
+    exportar_instantanea(ruta, {**registro, "producto": "Galletas 2"}, {}, almacen)
+    assert db.auditoria_importada(leer_instantanea(ruta)["huella"]) is None
+
+def test_fecha_de_instantanea_anterior(tmp_path, origen):
+    almacen, _, registro = origen
+    ruta = str(tmp_path / "auditoria.zip")
+    exportar_instantanea(ruta, {**registro, "fecha_auditoria": None, "fecha": "2026-05-10"}, {}, almacen)
+    assert leer_instantanea(ruta)["fecha_auditoria"] == "2026-05-10"
+    exportar_instantanea(ruta, {**registro, "fecha_auditoria": "ayer", "fecha": None}, {}, almacen)
+    assert leer_instantanea(ruta)["fecha_auditoria"] is None
+
+def test_zip_invalido(tmp_path):
+    ruta = tmp_path / "roto.zip"
+    ruta.write_bytes(b"no es un zip")
+    with pytest.raises(InstantaneaInvalida):
+        leer_instantanea(str(ruta))
+    with zipfile.ZipFile(ruta, "w") as zf:
+        zf.writestr(MANIFIESTO, '{"formato": 99}')
+    with pytest.raises(InstantaneaInvalida, match="formato"):
+        leer_instantanea(str(ruta))
+    with zipfile.ZipFile(ruta, "w") as zf:
+        zf.writestr("otro.txt", "x")
+    with pytest.raises(InstantaneaInvalida):
+        leer_instantanea(str(ruta))
@@ -0,0 +1,81 @@
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etiquetado import reglas
+from etiquetado.normativa import compilar, cargar_normativa, ReglamentoInvalido, REGLAMENTOS_ARCHIVO
+
+# Archivo vigente + una versión hipotética que desde 2027 endurece sodio y tolerancias
+def _datos_dos_versiones() -> dict:
+    with open(REGLAMENTOS_ARCHIVO, encoding="utf-8") as fh:
+        datos = json.load(fh)
+    datos["versiones"].append({
+        "version": "prueba-2027",
+        "vigente_desde": "2027-01-01",
+        "sellos": {"sodio_mg": 250},
+        "calorias": {"tolerancia_pct": 10},
+        "bromatologico": {"tolerancia_pct": 10},
+    })
+    return datos
+
+@pytest.fixture
+def normativa():
+    return compilar(_datos_dos_versiones())
+
+def test_archivo_incluido_carga():
+    n = cargar_normativa()
+    assert n.vigente("2024-01-01")["bromatologico"]["tolerancia_pct"] == 20
+    assert n.vigente("2024-01-01")["calorias"]["tolerancia_pct"] == 20
+
+def test_cambio_por_fecha_de_vigencia(normativa):
+    assert normativa.version("2026-12-31") == "810-2021+2492-2022"
+    assert normativa.version("2027-01-01") == "prueba-2027"
+    idx = normativa.indices(["2026-12-31", "2027-01-01", None], 3)
+    assert normativa.valor("sellos", "sodio_mg", idx[:2]).tolist() == [300.0, 250.0]
+    assert normativa.valor("bromatologico", "tolerancia_pct", idx[:2]).tolist() == [20.0, 10.0]
+    # lo no declarado se hereda de la versión anterior
+    assert normativa.valor("sellos", "azucares_pct_kcal", idx[:2]).tolist() == [10.0, 10.0]
+    assert list(normativa.etiquetas(idx[:2])) == ["810-2021+2492-2022", "prueba-2027"]
+    assert normativa.umbral_cero(["sodio", "vitamina_d", "x"], idx).tolist() == [5.0, 0.0, 0.0]
+
+def test_fecha_anterior_a_la_primera_version(normativa):
+    with pytest.raises(ValueError):
+        normativa.indice("2020-01-01")
+    with pytest.raises(ValueError):
+        normativa.indices(["2024-01-01", "2020-01-01"], 2)
+
+@pytest.mark.parametrize("cambio, mensaje", [
+    (lambda d: d["versiones"][0]["bromatologico"].pop("tolerancia_pct"), "falta bromatologico.tolerancia_pct"),
+    (lambda d: d["versiones"][0]["sellos"].update(sodio_mg=-1), "debe ser un número"),
+    (lambda d: d["versiones"][1].update(vigente_desde="2020-01-01"), "orden estricto"),
+    (lambda d: d.update(formato=99), "Formato"),
+    (lambda d: d["versiones"][0]["aproximacion"]["cero_menor_que"].update(sodio="5 mg"), "cero_menor_que.sodio"),
+])
+def test_reglamento_invalido(cambio, mensaje):
+    datos = _datos_dos_versiones()
+    cambio(datos)
+    with pytest.raises(ReglamentoInvalido, match=mensaje):
+        compilar(copy.deepcopy(datos))
+
+def test_motores_aplican_la_version_de_la_fecha(normativa, monkeypatch):
+    monkeypatch.setattr(reglas, "NORMATIVA", normativa)
+    sellos = reglas.determinar_sellos(
+        pd.DataFrame({c: [0] * 2 for c in reglas.COLUMNAS_SELLOS} | {"kcal": [500, 500], "sodio_mg": [280, 280]}),
+        fecha=["2026-06-01", "2027-06-01"],
+    )
+    assert sellos["sello_sodio"].tolist() == [False, True]
+    calorias = reglas.verificar_calorias(
+        pd.DataFrame({"kcal_declaradas": [100], "carbohidratos_g": [28.75], "proteinas_g": [0], "grasas_g": [0]}),
+        fecha="2027-06-01",
+    )
+    assert not calorias.loc[0, "cumple"]  # +15% sobre ±10%
+    declarado = pd.DataFrame({"producto": ["A"], "nutriente": ["Sodio"], "valor": ["100"], "unidad": ["mg"]})
+    laboratorio = pd.DataFrame({"producto": ["A"], "nutriente": ["Sodio"], "valor": ["115"], "unidad": ["mg"]})
+    antes = reglas.consistencia_bromatologica(declarado, laboratorio, fecha="2026-06-01")
+    despues = reglas.consistencia_bromatologica(declarado, laboratorio, fecha="2027-06-01")
+    assert bool(antes.loc[0, "cumple"]) and not bool(despues.loc[0, "cumple"])
+    assert despues.loc[0, "version_reglas"] == "prueba-2027"
+    assert np.isclose(despues.loc[0, "desviacion_pct"], 15.0)
@@ -0,0 +1,89 @@
+from collections import Counter
+
+import pytest
+
+from etiquetado.checklist import CATEGORIA_POR_ITEM
+from etiquetado.persistencia import BaseAuditorias, ESTADOS
+
+TITULOS = list(CATEGORIA_POR_ITEM)
+
+@pytest.fixture
+def db(tmp_path):
+    base = BaseAuditorias(str(tmp_path / "auditorias.db"))
+    # Una auditoría por fecha, con estados distintos para distinguir qué entra en cada rango
+    for i, fecha in enumerate(["2026-01-31", "2026-02-01", "2026-02-14", "2026-02-28", "2026-03-15", "2026-03-31"]):
+        a = base.crear_auditoria(fecha=fecha, proveedor=f"P{i % 2}")
+        for j, titulo in enumerate(TITULOS[: i + 1]):
+            base.guardar_resultado(a, titulo, estado=ESTADOS[j % 3])
+    yield base
+    base.cerrar()
+
+# Conteos por estado contados fila por fila con los mismos filtros de la exportación
+def _esperado(db, **rango) -> dict:
+    return Counter(f["estado"] for f in db.iterar_resultados(**rango))
+
+@pytest.mark.parametrize("desde, hasta", [
+    (None, None),
+    ("2026-02-01", "2026-02-28"),   # mes completo: solo agregados
+    ("2026-02-10", None),           # borde inicial a mitad de mes
+    (None, "2026-02-20"),           # borde final a mitad de mes
+    ("2026-02-10", "2026-02-20"),   # ambos bordes en el mismo mes
+    ("2026-01-31", "2026-03-15"),   # bordes en meses distintos y un mes completo entre ellos
+    ("2026-03-01", "2026-03-31"),
+])
+def test_cumplimiento_usa_fechas_exactas(db, desde, hasta):
+    total = db.cumplimiento("total", desde=desde, hasta=hasta)
+    esperado = _esperado(db, desde=desde, hasta=hasta)
+    obtenido = {e: total[0][e] for e in ESTADOS} if total else {}
+    assert {e: n for e, n in obtenido.items() if n} == dict(esperado)
+
+def test_cumplimiento_por_periodo_y_dimension(db):
+    por_mes = db.cumplimiento("total", desde="2026-02-14", hasta="2026-03-20", por_periodo=True)
+    assert [f["periodo"] for f in por_mes] == ["2026-02", "2026-03"]
+    assert sum(f["yes"] + f["no"] + f["na"] + f["none"] for f in por_mes) == 3 * len(TITULOS)
+    proveedores = db.cumplimiento("proveedor", desde="2026-02-14", hasta="2026-02-28")
+    assert [f["clave"] for f in proveedores] == ["P0", "P1"]
+    assert sum(f["yes"] for f in db.cumplimiento("categoria", desde="2026-02-14")) == \
+        _esperado(db, desde="2026-02-14")["yes"]
+
+# ---------------- agregados: mantenimiento incremental frente a reconstrucción ----------------
+def _agregados(db) -> set:
+    with db._lock:
+        filas = db._con.execute("SELECT dimension, clave, periodo, yes, no, na, none FROM agregados").fetchall()
+    return {tuple(f) for f in filas if any(f[e] for e in ESTADOS)}
+
+def test_agregados_incrementales_igual_a_reconstruidos(db):
+    a = db.crear_auditoria(fecha="2026-02-20", proveedor="P0")
+    db.guardar_resultado(a, TITULOS[0], estado="yes")
+    db.guardar_resultado(a, TITULOS[0], estado="no")       # cambio de estado: -1 / +1
+    db.guardar_resultado(a, TITULOS[1], nota="solo nota")  # sin efecto en agregados
+    db.actualizar_metadatos(a, proveedor="P9")              # mueve todos sus ítems de proveedor
+    registro = db.cargar_auditoria(a)
+    db.importar_auditoria(registro, fecha="2026-04-01")
+    incrementales = _agregados(db)
+    with db._lock, db._con:
+        db._reconstruir_agregados()
+    assert _agregados(db) == incrementales
+    claves = {(d, c) for d, c, *_ in incrementales if d == "proveedor"}
+    assert ("proveedor", "P9") in claves
+
+def test_reconstruye_agregados_al_abrir_una_base_sin_ellos(db):
+    esperados = _agregados(db)
+    with db._lock, db._con:
+        db._con.execute("DELETE FROM agregados")
+    ruta = db.ruta
+    db.cerrar()
+    reabierta = BaseAuditorias(ruta)
+    try:
+        assert _agregados(reabierta) == esperados
+    finally:
+        reabierta.cerrar()
+
+def test_importar_auditoria_es_atomica(db):
+    antes, auditorias = _agregados(db), len(db.listar_auditorias())
+    registro = db.cargar_auditoria(db.listar_auditorias(limite=1)[0]["id"])
+    registro["evidencia"][TITULOS[-1]] = [{"sha256": "0" * 64}]   # sin "name": falla al final
+    with pytest.raises(KeyError):
+        db.importar_auditoria(registro, huella="x")
+    assert len(db.listar_auditorias()) == auditorias
+    assert _agregados(db) == antes and db.auditoria_importada("x") is None
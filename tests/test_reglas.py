@@ -0,0 +1,334 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etiquetado.reglas import (
+    a_numero, leer_tabla, normalizar_tabla, determinar_sellos, verificar_calorias, COLUMNAS_SELLOS,
+    convertir_medida_casera, verificar_porciones, validar_aproximacion, consistencia_bromatologica,
+    evaluar_tamano_sellos, lado_minimo_tabla18, verificar_unidades, verificar_obligatorios,
+)
+from etiquetado.nutrientes import OBLIGATORIOS, MICRO_OBLIGATORIOS, NOMBRE_NUTRIENTE
+
+def _csv(texto: str, nombre: str = "portafolio.csv"):
+    archivo = io.BytesIO(texto.encode("utf-8"))
+    archivo.name = nombre
+    return archivo
+
+# ---------------- números con coma decimal ----------------
+@pytest.mark.parametrize("texto, esperado", [
+    ("12,5", 12.5),
+    ("12.5", 12.5),
+    ("1.234,5", 1234.5),
+    ("1,234.5", 1234.5),
+    (" 7 ", 7.0),
+    ("0,05", 0.05),
+    ("1.250", 1250.0),      # es-CO: un solo grupo con punto es de miles
+    ("1.050,5", 1050.5),
+    ("1 250", 1250.0),
+])
+def test_a_numero_coma_y_punto(texto, esperado):
+    assert a_numero(pd.Series([texto])).iloc[0] == pytest.approx(esperado)
+
+def test_a_numero_ilegible_queda_nan():
+    assert np.isnan(a_numero(pd.Series(["abc"])).iloc[0])
+
+def test_normalizar_tabla_reporta_vacios_e_ilegibles():
+    df = pd.DataFrame({"kcal": ["100", "", "x"], "sodio_mg": ["1,5", "2", "3"]})
+    res = normalizar_tabla(df, {"kcal": "Kcal", "sodio_mg": "Sodio"})
+    assert res["sodio_mg"].tolist() == [1.5, 2.0, 3.0]
+    assert res["error"].tolist() == ["", "kcal: sin valor", "kcal: no numérico"]
+    assert np.isnan(res.loc[1, "kcal"]) and np.isnan(res.loc[2, "kcal"])
+
+# ---------------- motor de sellos ----------------
+def test_sellos_csv_punto_y_coma_con_coma_decimal():
+    archivo = _csv(
+        "kcal;azucares_libres_g;grasas_saturadas_g;grasas_trans_mg;sodio_mg\n"
+        "100;12,5;0;0;10\n"
+    )
+    res = determinar_sellos(leer_tabla(archivo))
+    assert res.loc[0, "azucares_libres_g"] == 12.5
+    assert bool(res.loc[0, "sello_azucares"])
+    assert res.loc[0, "sellos"] == "EXCESO EN AZÚCARES"
+    assert res.loc[0, "error"] == ""
+
+def test_sellos_dato_faltante_no_cuenta_como_sin_sello():
+    df = pd.DataFrame([
+        {"kcal": 100, "azucares_libres_g": None, "grasas_saturadas_g": 0, "grasas_trans_mg": 0, "sodio_mg": 10},
+        {"kcal": 100, "azucares_libres_g": 1, "grasas_saturadas_g": 0, "grasas_trans_mg": 0, "sodio_mg": 10},
+    ])
+    res = determinar_sellos(df)
+    assert res.loc[0, "error"] == "azucares_libres_g: sin valor"
+    assert pd.isna(res.loc[0, "sello_azucares"]) and pd.isna(res.loc[0, "num_sellos"])
+    assert res.loc[1, "error"] == "" and res.loc[1, "num_sellos"] == 0
+
+def test_sellos_umbrales():
+    df = pd.DataFrame([
+        # 10 % de kcal desde azúcares libres: justo en el umbral
+        {"kcal": 400, "azucares_libres_g": 10, "grasas_saturadas_g": 0, "grasas_trans_mg": 0, "sodio_mg": 0},
+        # sodio ≥ 300 mg aunque < 1 mg/kcal
+        {"kcal": 400, "azucares_libres_g": 0, "grasas_saturadas_g": 0, "grasas_trans_mg": 0, "sodio_mg": 300},
+        # bebida sin calorías: umbral de 40 mg
+        {"kcal": 0, "azucares_libres_g": 0, "grasas_saturadas_g": 0, "grasas_trans_mg": 0, "sodio_mg": 40,
+         "bebida_sin_kcal": "sí"},
+    ])
+    res = determinar_sellos(df)
+    assert res["sello_azucares"].tolist() == [True, False, False]
+    assert res["sello_sodio"].tolist() == [False, True, True]
+
+def test_sellos_acepta_rotulos_de_columnas():
+    fila = {COLUMNAS_SELLOS[c]: 0 for c in ("kcal", "azucares_libres_g", "grasas_saturadas_g", "grasas_trans_mg", "sodio_mg")}
+    res = determinar_sellos(pd.DataFrame([fila]))
+    assert res.loc[0, "num_sellos"] == 0
+
+# ---------------- motor de calorías ----------------
+def test_calorias_coma_decimal_no_se_vuelve_cero():
+    archivo = _csv(
+        "kcal_declaradas;carbohidratos_g;proteinas_g;grasas_g\n"
+        "103;12,5;2,5;5,0\n"
+    )
+    res = verificar_calorias(leer_tabla(archivo))
+    assert res.loc[0, "kcal_calculadas"] == pytest.approx(12.5 * 4 + 2.5 * 4 + 5.0 * 9)
+    assert bool(res.loc[0, "cumple"])
+
+def test_calorias_macros_ilegibles_quedan_sin_veredicto():
+    df = pd.DataFrame({
+        "kcal_declaradas": ["200", "200", "0"],
+        "carbohidratos_g": ["n.d.", "20", "20"],
+        "proteinas_g": ["5", "5", "5"],
+        "grasas_g": ["7", "7", "7"],
+    })
+    res = verificar_calorias(df)
+    assert res.loc[0, "error"] == "carbohidratos_g: no numérico"
+    assert pd.isna(res.loc[0, "cumple"]) and np.isnan(res.loc[0, "kcal_calculadas"])
+    assert bool(res.loc[1, "cumple"])
+    assert pd.isna(res.loc[2, "cumple"]) and res.loc[2, "error"] == ""
+
+def test_calorias_tolerancia():
+    df = pd.DataFrame({
+        "kcal_declaradas": [100, 100],
+        "carbohidratos_g": [30, 31],   # 120 y 124 kcal calculadas
+        "proteinas_g": [0, 0],
+        "grasas_g": [0, 0],
+    })
+    assert verificar_calorias(df)["cumple"].tolist() == [True, False]
+
+# ---------------- tamaño de sellos: Tabla 18 y ADS ----------------
+# Cadena if/elif de la herramienta original (Res. 810/2021 Tabla 18, Res. 2492/2022): (lado mínimo, cumple)
+def _tamano_original(area: float, num: int, lado: float) -> tuple:
+    if num == 1:
+        if area < 30:
+            return None, False
+        if area <= 300:
+            for limite, minimo in ((35, 1.7), (40, 1.8), (50, 2.0), (60, 2.2), (80, 2.5), (100, 2.8),
+                                   (125, 3.1), (150, 3.4), (200, 3.9), (250, 4.4)):
+                if area < limite:
+                    break
+            else:
+                minimo = 4.8
+        else:
+            minimo = 3.9
+        return minimo, lado >= minimo
+    if area <= 300:
+        return None, lado ** 2 * num <= 0.65 * area
+    return None, lado >= 3.9
+
+AREAS_BORDE = [0, 29.99, 30, 34.99, 35, 39.99, 40, 49.99, 50, 59.99, 60, 79.99, 80, 99.99, 100, 124.99,
+               125, 149.99, 150, 199.99, 200, 249.99, 250, 299.99, 300, 300.01, 1000]
+
+def test_tamano_igual_a_la_cadena_original():
+    combinaciones = [(a, n, l) for a in AREAS_BORDE for n in (1, 2, 3) for l in (0, 1.7, 2.79, 2.8, 3.9, 4.4, 4.8, 6)]
+    area, num, lado = (np.array(c, dtype=float) for c in zip(*combinaciones))
+    res = evaluar_tamano_sellos(area, num.astype(int), lado, fecha="2026-01-01")
+    for (a, n, l), f in zip(combinaciones, res.itertuples()):
+        minimo, cumple = _tamano_original(a, n, l)
+        assert bool(f.cumple) is cumple, (a, n, l)
+        if minimo is not None:
+            assert f.lado_min_cm == minimo, (a, n, l)
+
+def test_lado_minimo_tabla18_bordes():
+    dentro = [a for a in AREAS_BORDE if 30 <= a <= 300]
+    assert lado_minimo_tabla18(dentro).tolist() == [_tamano_original(a, 1, 0)[0] for a in dentro]
+    assert np.isnan(lado_minimo_tabla18([29.99, 300.01])).all()
+    assert lado_minimo_tabla18(35.0) == 1.8   # escalar → escalar
+
+def test_tamano_regla_aplicada():
+    res = evaluar_tamano_sellos([20, 20, 120, 400, 120], [1, 2, 1, 3, 3], [2, 1, 3.1, 3.9, 3])
+    assert res["regla"].tolist() == ["envase_secundario", "ads", "tabla_18", "fijo", "ads"]
+    assert res["ads_cm2"].iloc[4] == pytest.approx(0.65 * 120) and res["area_total_sellos_cm2"].iloc[4] == 27
+
+# ---------------- porciones y medida casera ----------------
+@pytest.mark.parametrize("texto, esperado", [
+    ("1 taza", 240.0),
+    ("1/2 taza", 120.0),
+    ("1 1/2 tazas", 360.0),
+    ("2 1/2 cucharadas", 37.5),
+    ("1,5 tazas", 360.0),
+    ("2 cdas.", 30.0),
+])
+def test_medida_casera(texto, esperado):
+    assert convertir_medida_casera(texto) == ("volumen", esperado)
+
+def test_medida_casera_no_reconocida():
+    dimension, equivalente = convertir_medida_casera("1 puñado")
+    assert dimension == "" and np.isnan(equivalente)
+
+def test_porcion_sin_unidad_no_se_compara_con_la_medida_casera():
+    res = verificar_porciones(pd.DataFrame([
+        {"contenido_neto": "150", "porcion": "30", "porciones_declaradas": "5", "medida_casera": "1 taza"},
+        {"contenido_neto": "720 mL", "porcion": "360 mL", "porciones_declaradas": "2", "medida_casera": "1 1/2 tazas"},
+        {"contenido_neto": "150 g", "porcion": "30 g", "porciones_declaradas": "5", "medida_casera": "1 taza"},
+    ]))
+    assert bool(res.loc[0, "porcion_sin_unidad"]) and pd.isna(res.loc[0, "cumple_medida_casera"])
+    assert np.isnan(res.loc[0, "desviacion_medida_pct"])
+    assert res.loc[0, "motivo"] == "unidad no declarada en la porción"
+    assert bool(res.loc[0, "cumple_porciones"])
+    assert bool(res.loc[1, "cumple"]) and res.loc[1, "desviacion_medida_pct"] == 0
+    # masa frente a volumen: no comparable, pero tampoco se reporta como unidad faltante
+    assert pd.isna(res.loc[2, "cumple_medida_casera"]) and not res.loc[2, "porcion_sin_unidad"]
+
+# ---------------- aproximación: separador de miles ----------------
+def _aproximar(*valores, nutriente="Sodio"):
+    return validar_aproximacion(pd.DataFrame({"nutriente": [nutriente] * len(valores), "valor": list(valores)}))
+
+@pytest.mark.parametrize("valor", ["1.250", "1,250", "12.345", "1.250 mg"])
+def test_miles_ambiguo_se_rechaza(valor):
+    f = _aproximar(valor).iloc[0]
+    assert f["cumple"] == False  # noqa: E712 (BooleanArray)
+    assert f["motivo"].startswith("separador ambiguo")
+    assert np.isnan(f["valor_num"]) and f["valor_esperado"] == ""
+
+@pytest.mark.parametrize("valor, numero, cumple, esperado", [
+    ("1.234.567", 1234567.0, True, ""),
+    ("2.000,0", 2000.0, False, "2000"),
+    ("1.250,5", 1250.5, False, "1251"),
+    ("1,250.5", 1250.5, False, "1251"),
+    ("1 250", 1250.0, True, ""),
+])
+def test_miles_agrupados(valor, numero, cumple, esperado):
+    f = _aproximar(valor).iloc[0]
+    assert f["valor_num"] == numero and bool(f["cumple"]) is cumple and f["valor_esperado"] == esperado
+
+# Toda expresión sugerida debe pasar el mismo validador
+@pytest.mark.parametrize("nutriente", ["Sodio", "Vitamina D"])
+def test_sugerencia_cumple_el_validador(nutriente):
+    valores = ["1.250,0", "12.345,67", "1,250.5", "9,96", "0,996", "0,125", "1,25", "01,5", "3.5", "0,05", "999,5"]
+    res = _aproximar(*valores, nutriente=nutriente)
+    sugeridas = res.loc[res["valor_esperado"] != "", "valor_esperado"].tolist()
+    assert len(sugeridas) >= 8
+    assert _aproximar(*sugeridas, nutriente=nutriente)["cumple"].all()
+
+def test_aproximacion_decimal_sin_miles():
+    res = _aproximar("12,5", "1,25", "0,125", "125")
+    assert res["valor_num"].tolist() == [12.5, 1.25, 0.125, 125.0]
+    assert res["valor_esperado"].tolist() == ["13", "1,3", "0,1", ""]
+
+# ---------------- bromatológico: umbral de cero (Art. 8) antes de la tolerancia ----------------
+def _bromatologico(declarado: dict, laboratorio: dict, unidades: dict):
+    def tabla(valores):
+        return pd.DataFrame({
+            "producto": "A", "nutriente": list(valores), "valor": list(valores.values()),
+            "unidad": [unidades[n] for n in valores],
+        })
+    return consistencia_bromatologica(tabla(declarado), tabla(laboratorio)).set_index("nutriente")
+
+def test_cero_declarado_bajo_umbral_cumple():
+    unidades = {"Grasa saturada": "g", "Sodio": "mg", "Calorías": "kJ", "Proteína": "g"}
+    res = _bromatologico(
+        {"Grasa saturada": "0", "Sodio": "0", "Calorías": "0", "Proteína": "0,3"},
+        {"Grasa saturada": "0,2", "Sodio": "7", "Calorías": "12", "Proteína": "0,1"},
+        unidades,
+    )
+    assert bool(res.loc["Grasa saturada", "cumple"])
+    assert res.loc["Grasa saturada", "estado"] == "bajo el umbral para declarar 0 (Art. 8)"
+    assert bool(res.loc["Calorías", "cumple"])       # 12 kJ < 5 kcal (20,9 kJ)
+    assert bool(res.loc["Proteína", "cumple"])       # 0,3 y 0,1 g: ambos bajo 0,5 g
+    assert not res.loc["Sodio", "cumple"]            # 7 mg supera el umbral de 5 mg
+    assert res.loc["Sodio", "estado"] == "declarado 0 con valor en laboratorio"
+
+def test_sobre_el_umbral_aplica_la_tolerancia():
+    unidades = {"Grasa total": "g", "Vitamina D": "µg"}
+    res = _bromatologico({"Grasa total": "2", "Vitamina D": "0"}, {"Grasa total": "2,6", "Vitamina D": "0,5"}, unidades)
+    assert not res.loc["Grasa total", "cumple"] and res.loc["Grasa total", "estado"] == "fuera de tolerancia"
+    assert not res.loc["Vitamina D", "cumple"]      # sin umbral de cero para micronutrientes
+
+@pytest.mark.parametrize("declarado, laboratorio", [
+    ("1.250 mg", "1250"),
+    ("1.050,5", "1050,5"),
+    ("1 250", "1250"),
+])
+def test_bromatologico_lee_miles(declarado, laboratorio):
+    res = _bromatologico({"Sodio": declarado}, {"Sodio": laboratorio}, {"Sodio": "mg"})
+    assert res.loc["Sodio", "valor_declarado"] == res.loc["Sodio", "valor_laboratorio"]
+    assert bool(res.loc["Sodio", "cumple"]) and res.loc["Sodio", "desviacion_pct"] == 0
+
+def test_bromatologico_unidad_tras_miles():
+    declarado = pd.DataFrame({"producto": "A", "nutriente": ["Calorías"], "valor": ["1.050,5 kJ"]})
+    laboratorio = pd.DataFrame({"producto": "A", "nutriente": ["Calorías"], "valor": ["251,1 kcal"]})
+    f = consistencia_bromatologica(declarado, laboratorio).iloc[0]
+    assert f["unidad"] == "kJ" and bool(f["cumple"])
+
+def test_bromatologico_valor_ilegible_no_se_descarta():
+    res = _bromatologico({"Sodio": "n.d.", "Proteína": "3"}, {"Sodio": "120", "Proteína": "3"}, {"Sodio": "mg", "Proteína": "g"})
+    assert res.loc["Sodio", "estado"] == "valor ilegible" and pd.isna(res.loc["Sodio", "cumple"])
+    assert bool(res.loc["Proteína", "cumple"])
+
+@pytest.mark.parametrize("neto, porcion, declaradas", [
+    ("1.000 g", "40 g", "25"),
+    ("2.500 ml", "250 mL", "10"),
+    ("1 000 g", "40 g", "25"),
+    ("2.500", "250", "10"),
+    ("12.000 g", "30 g", "400"),
+    ("12.000 g", "30 g", "400,0"),
+])
+def test_porciones_con_miles(neto, porcion, declaradas):
+    f = verificar_porciones(pd.DataFrame([
+        {"contenido_neto": neto, "porcion": porcion, "porciones_declaradas": declaradas},
+    ])).iloc[0]
+    assert f["porciones_calculadas"] == float(declaradas.replace(",", "."))
+    assert bool(f["cumple"]) and f["motivo"] == ""
+
+# ---------------- unidades y nutrientes obligatorios ----------------
+def test_unidades_estados():
+    res = verificar_unidades(pd.DataFrame({
+        "producto": "A",
+        "nutriente": ["Sodio", "Proteína", "Grasa total", "Vitamina A", "Calorías", "Calorías", "Sodio",
+                      "Fuente no significativa de hierro", "Cafeína"],
+        "valor": ["120 mg", "3", "2 mg", "50 mcg ER", "120 kcal", "502 kJ", "120 mg", "", "40 mg"],
+    }))
+    assert res["estado_unidad"].tolist() == [
+        "ok", "sin unidad", "unidad incorrecta", "ok", "ok", "ok", "duplicado", "leyenda", "no incluido en el esquema",
+    ]
+    assert res["cumple"].tolist()[:7] == [True, False, False, True, True, True, False]
+    assert res["cumple"].iloc[8] is pd.NA
+    assert res["unidad_declarada"].iloc[3] == "mcg ER"
+
+def test_unidades_prioridad_columna_y_nombre():
+    res = verificar_unidades(pd.DataFrame({
+        "nutriente": ["Sodio", "Sodio (mg)", "Proteína (g)"],
+        "valor": ["120 g", "120", "3"],
+        "unidad": ["mg", "", ""],
+        "producto": ["A", "B", "B"],
+    }))
+    assert res["unidad_declarada"].tolist() == ["mg", "mg", "g"]
+    assert res["estado_unidad"].eq("ok").all()
+
+def test_obligatorios_faltantes_por_producto():
+    completo = [NOMBRE_NUTRIENTE[c] for c in OBLIGATORIOS]
+    sin_sodio = [n for n in completo if n != "Sodio"]
+    res = verificar_obligatorios(pd.DataFrame({
+        "producto": ["A"] * len(completo) + ["B"] * len(sin_sodio),
+        "nutriente": completo + sin_sodio,
+    })).set_index("producto")
+    assert bool(res.loc["A", "cumple"]) and res.loc["A", "faltantes"] == ""
+    assert not res.loc["B", "cumple"] and res.loc["B", "faltantes"] == "Sodio"
+    assert res.loc["B", "num_faltantes"] == 1
+
+def test_obligatorios_leyenda_exime_solo_micronutrientes():
+    sin_micro = [NOMBRE_NUTRIENTE[c] for c in OBLIGATORIOS if c not in MICRO_OBLIGATORIOS and c != "fibra"]
+    leyenda = "Fuente no significativa de vitamina A, vitamina D, hierro, calcio, zinc y fibra"
+    res = verificar_obligatorios(pd.DataFrame({"nutriente": sin_micro + [leyenda]})).iloc[0]
+    # La fibra no es micronutriente: la leyenda no la exime
+    assert res["faltantes"] == "Fibra dietaria" and not res["cumple"]
+    assert res["no_significativos"] == ", ".join(NOMBRE_NUTRIENTE[c] for c in MICRO_OBLIGATORIOS)
@@ -0,0 +1,89 @@
+import json
+import asyncio
+
+import pytest
+
+from etiquetado.servicio import ServicioReglas, evaluar_lote, MAX_CUERPO_BYTES, MAX_CABECERAS, MAX_LINEA_BYTES
+
+# Levanta el servicio en un puerto libre, envía `peticion` tal cual y devuelve (estado, cuerpo JSON)
+def _peticion(peticion: bytes) -> tuple:
+    async def ida_y_vuelta():
+        servicio = ServicioReglas(procesos=1)
+        servidor = await asyncio.start_server(servicio.atender, "127.0.0.1", 0)
+        try:
+            puerto = servidor.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", puerto)
+            writer.write(peticion)
+            await writer.drain()
+            cabecera = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 30)
+            largo = int(cabecera.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            cuerpo = await asyncio.wait_for(reader.readexactly(largo), 30)
+            writer.close()
+        finally:
+            servidor.close()
+            servicio.cerrar()
+        return int(cabecera.split()[1]), json.loads(cuerpo)
+    return asyncio.run(ida_y_vuelta())
+
+def _post(ruta: str, cuerpo, largo=None) -> tuple:
+    datos = json.dumps(cuerpo).encode("utf-8")
+    largo = len(datos) if largo is None else largo
+    return _peticion(
+        f"POST {ruta} HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: {largo}\r\n\r\n".encode("latin-1")
+        + datos
+    )
+
+@pytest.mark.parametrize("largo", ["abc", "-5", "1_0", "12.5"])
+def test_content_length_invalido_es_400(largo):
+    estado, cuerpo = _post("/sellos", [], largo=largo)
+    assert estado == 400
+    assert "Content-Length" in cuerpo["error"]
+
+def test_cuerpo_demasiado_grande_es_413():
+    estado, _ = _post("/sellos", [], largo=MAX_CUERPO_BYTES + 1)
+    assert estado == 413
+
+# Host y Connection cuentan dentro de MAX_CABECERAS
+@pytest.mark.parametrize("cabeceras, estado", [
+    ("".join(f"X-{i}: a\r\n" for i in range(MAX_CABECERAS - 1)), 431),
+    ("X-Largo: " + "a" * MAX_LINEA_BYTES + "\r\n", 431),
+    ("X-Enorme: " + "a" * (80 * 1024) + "\r\n", 431),   # más que el búfer del lector
+    ("".join(f"X-{i}: a\r\n" for i in range(MAX_CABECERAS - 2)), 200),
+], ids=["demasiadas", "larga", "mayor-que-el-bufer", "en-el-limite"])
+def test_limites_de_cabeceras(cabeceras, estado):
+    peticion = f"GET /salud HTTP/1.1\r\nHost: x\r\nConnection: close\r\n{cabeceras}\r\n"
+    assert _peticion(peticion.encode("latin-1"))[0] == estado
+
+def test_linea_de_peticion_demasiado_larga():
+    peticion = f"GET /{'a' * MAX_LINEA_BYTES} HTTP/1.1\r\nHost: x\r\n\r\n"
+    assert _peticion(peticion.encode("latin-1"))[0] == 414
+
+def test_campo_numerico_ilegible_es_422_con_el_campo():
+    filas = [
+        {"kcal": 100, "azucares_libres_g": 1, "grasas_saturadas_g": 1, "grasas_trans_mg": 0, "sodio_mg": 50},
+        {"kcal": "cien", "azucares_libres_g": 1, "grasas_saturadas_g": 1, "grasas_trans_mg": 0, "sodio_mg": "x"},
+    ]
+    estado, cuerpo = _post("/sellos", {"productos": filas})
+    assert estado == 422
+    assert "fila 1: kcal, sodio_mg" in cuerpo["error"]
+
+def test_campo_vacio_queda_sin_veredicto():
+    filas = [{"kcal_declaradas": 120, "carbohidratos_g": None, "proteinas_g": "2,5", "grasas_g": 1}]
+    res = json.loads(evaluar_lote("/calorias", filas))["resultados"][0]
+    assert res["cumple"] is None
+    assert res["error"] == "carbohidratos_g: sin valor"
+
+def test_tamano_sellos_area_vacia_queda_sin_veredicto():
+    filas = [{"area_cara_cm2": None, "sku": "A"}, {"area_cara_cm2": "", "num_sellos": 2}, {"area_cara_cm2": 80}]
+    res = json.loads(evaluar_lote("/tamano-sellos", filas))["resultados"]
+    for fila in res[:2]:
+        assert fila["error"] == "area_cara_cm2: sin valor"
+        assert fila["cumple"] is None and fila["regla"] is None
+    # num_sellos y lado_real_cm ausentes toman su valor por defecto sin reportar error
+    assert res[2]["error"] == "" and res[2]["num_sellos"] == 1 and res[2]["regla"] == "tabla_18"
+
+def test_tamano_sellos_rechaza_texto():
+    with pytest.raises(ValueError, match="fila 0: lado_real_cm"):
+        evaluar_lote("/tamano-sellos", [{"area_cara_cm2": 80, "lado_real_cm": "grande"}])
+    res = json.loads(evaluar_lote("/tamano-sellos", [{"area_cara_cm2": "80,0", "sku": "A1"}]))["resultados"][0]
+    assert res["sku"] == "A1" and res["error"] == ""